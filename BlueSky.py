@@ -32,6 +32,12 @@ def main():
     try:
         # Parse command-line arguments
         args = cmdargs.parse()
+        # A node zygote initialises itself, and then starts forked nodes
+        if args['mode'] == 'zygote':
+            from bluesky.network import zygote
+            zygote.run(args.get('configfile'))
+            return
+
         # Initialize bluesky modules. Pass command-line arguments parsed by cmdargs
         bs.init(**args)
 
@@ -56,6 +56,8 @@ def init(mode='sim', configfile=None, scenfile=None, discoverable=False,
     if mode == 'server':
         global server
         from bluesky.network.server import Server
+        if settings.server_async:
+            from bluesky.network.aioserver import AsyncServer as Server
         server = Server(discoverable, configfile, scenfile)
 
     # The remaining objects are only instantiated in the sim nodes
@@ -31,6 +31,8 @@ def parse():
                     nargs=0, help="Start only one simulation node.")
     mode.add_argument("--detached", dest="mode", action=setmodegui("sim", detached=True),
                     nargs=0, help="Start only one simulation node, without networking.")
+    mode.add_argument("--zygote", dest="mode", action=setmodegui("zygote"),
+                    nargs=0, help="Start a node zygote, which forks new simulation nodes on request of the server.")
 
 
     parser.add_argument("--configfile", dest="configfile",
@@ -0,0 +1,169 @@
+''' Wall-time profiler for the subsystems of the simulation step.
+
+    Code sections are measured with
+
+        with profiler.section('name'):
+            ...
+
+    Sections can be nested; each measured section is stored under its path
+    in the section hierarchy, e.g., 'traffic/asas/cd' for conflict detection
+    within the traffic update, or 'stack' for stack processing. When profiling
+    is off, entering and leaving a section only costs a few list operations.
+'''
+import os
+import time
+from datetime import datetime
+from bluesky import settings
+
+
+# Register settings defaults
+settings.set_variable_defaults(log_path='output')
+
+# Flag indicating whether profiling is on
+active = False
+
+# Wall time at which profiling was started and stopped, and at which the
+# last interval of rolling statistics was started
+tstart = tstop = 0.0
+tinterval = 0.0
+
+# Statistics per section path
+stats = dict()
+
+# Stack of (path, start time) of the currently entered sections
+_stack = [('', None)]
+# Stack entry of sections entered while profiling is off
+_off = ('', None)
+
+# Section objects per name
+_sections = dict()
+
+
+class Stat:
+    ''' Timing statistics of a profiled section. '''
+    __slots__ = ('ncalls', 'total', 'tmax', 'incalls', 'intotal', 'inmax')
+
+    def __init__(self):
+        self.ncalls = self.incalls = 0
+        self.total = self.tmax = self.intotal = self.inmax = 0.0
+
+    def add(self, dt):
+        ''' Add one measurement of dt seconds. '''
+        self.ncalls += 1
+        self.incalls += 1
+        self.total += dt
+        self.intotal += dt
+        self.tmax = max(self.tmax, dt)
+        self.inmax = max(self.inmax, dt)
+
+
+class Section:
+    ''' Context manager that measures the wall time of a named section. '''
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if active:
+            parent = _stack[-1][0]
+            _stack.append((f'{parent}/{self.name}' if parent else self.name,
+                           time.perf_counter()))
+        else:
+            _stack.append(_off)
+
+    def __exit__(self, *exc):
+        path, t0 = _stack.pop()
+        if t0 is not None and active:
+            dt = time.perf_counter() - t0
+            stat = stats.get(path)
+            if stat is None:
+                stat = stats[path] = Stat()
+            stat.add(dt)
+
+
+def section(name):
+    ''' Return the profiler section with the given name. '''
+    sec = _sections.get(name)
+    if sec is None:
+        sec = _sections[name] = Section(name)
+    return sec
+
+
+def start():
+    ''' Clear all statistics and start profiling. '''
+    global active, tstart, tinterval
+    stats.clear()
+    tstart = tinterval = time.perf_counter()
+    active = True
+
+
+def stop():
+    ''' Stop profiling, keeping the statistics. '''
+    global active, tstop
+    active = False
+    tstop = time.perf_counter()
+
+
+def rollingstats():
+    ''' Return the statistics of the interval since the previous call as a
+        dict with per section path the number of calls, and the total and
+        maximum time [s], and start a new interval. Also returns the
+        duration [s] of the interval. '''
+    global tinterval
+    t = time.perf_counter()
+    interval = {path: (stat.incalls, stat.intotal, stat.inmax)
+                for path, stat in stats.items() if stat.incalls}
+    for stat in stats.values():
+        stat.incalls, stat.intotal, stat.inmax = 0, 0.0, 0.0
+    dt, tinterval = t - tinterval, t
+    return interval, dt
+
+
+def report(maxdepth=2):
+    ''' Return a text report of the sections up to maxdepth levels deep. '''
+    twall = max(1e-9, (time.perf_counter() if active else tstop) - tstart)
+    lines = [f'{"section":<32} {"calls":>8} {"mean [ms]":>10} {"max [ms]":>10} {"wall [%]":>9}']
+    for path in sorted(stats):
+        if path.count('/') >= maxdepth:
+            continue
+        stat = stats[path]
+        name = '  ' * path.count('/') + path.rsplit('/', 1)[-1]
+        lines.append(f'{name:<32} {stat.ncalls:8d} {stat.total / stat.ncalls * 1e3:10.3f} '
+                     f'{stat.tmax * 1e3:10.3f} {stat.total / twall * 100:9.1f}')
+    return '\n'.join(lines)
+
+
+def dump(fname=''):
+    ''' Write the statistics of all sections to a CSV file. '''
+    if not os.path.isdir(settings.log_path):
+        os.makedirs(settings.log_path)
+    fname = os.path.join(settings.log_path, fname or
+                         datetime.now().strftime('PROFILE_%Y%m%d_%H-%M-%S.csv'))
+    with open(fname, 'w') as f:
+        f.write('# section,calls,total [s],mean [ms],max [ms]\n')
+        for path in sorted(stats):
+            stat = stats[path]
+            f.write(f'{path},{stat.ncalls},{stat.total:.6f},'
+                    f'{stat.total / stat.ncalls * 1e3:.6f},{stat.tmax * 1e3:.6f}\n')
+    return fname
+
+
+def profile(cmd='', fname=''):
+    ''' PROFILE ON/OFF/DUMP [filename]: Profile the wall time spent in the
+        subsystems of the simulation step. '''
+    cmd = cmd.upper()
+    if cmd == 'ON':
+        start()
+        return True, 'Profiling started'
+    if cmd == 'OFF':
+        stop()
+        return True, 'Profiling stopped\n' + report()
+    if cmd == 'DUMP':
+        if not stats:
+            return False, 'PROFILE: no profiling data available'
+        return True, f'Profile written to {dump(fname)}'
+    if cmd:
+        return False, 'PROFILE ON/OFF/DUMP [filename]'
+    return True, 'Profiling is ' + ('ON' if active else 'OFF') + \
+        ('\n' + report() if stats else '')
@@ -5,6 +5,7 @@ from inspect import signature
 from types import SimpleNamespace
 from decimal import Decimal
 from bluesky import settings
+from bluesky.core import profiler
 
 
 # Register settings defaults
@@ -64,13 +65,15 @@ def step(recovery_time=0):
 def preupdate():
     ''' Update function executed before traffic update.'''
     for fun in preupdate_funs.values():
-        fun.trigger()
+        with profiler.section(fun.name):
+            fun.trigger()
 
 
 def update():
     ''' Update function executed after traffic update.'''
     for fun in update_funs.values():
-        fun.trigger()
+        with profiler.section(fun.name):
+            fun.trigger()
 
 
 def reset():
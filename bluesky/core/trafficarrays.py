@@ -1,5 +1,14 @@
 """ Classes that derive from TrafficArrays (like Traffic) get automated create,
-    delete, and reset functionality for all registered child arrays."""
+    delete, and reset functionality for all registered child arrays.
+
+    Registered numpy arrays are views onto preallocated buffers, which grow
+    by doubling their capacity. Creating aircraft one by one therefore takes
+    amortised constant time per array, instead of copying each array on
+    every creation. Deletion compacts the buffer in place, preserving the
+    order of the remaining aircraft. Code that reads or updates the arrays
+    in place, or replaces them with a new array of the same length, is
+    unaffected. Note that, after a delete, an old reference to a traffic
+    array can show the compacted data; use a copy to keep a snapshot."""
 # -*- coding: utf-8 -*-
 try:
     from collections.abc import Collection
@@ -51,6 +60,9 @@ class TrafficArrays:
         self._children = []
         self._ArrVars  = []
         self._LstVars  = []
+        # Preallocated storage of the numpy arrays:
+        # name -> (buffer, view, default value)
+        self._ArrBufs  = dict()
 
     def reparent(self, newparent):
         ''' Give TrafficArrays object a new parent. '''
@@ -87,9 +99,23 @@ class TrafficArrays:
             lst.extend([defaults.get(vartype)] * n)
 
         for v in self._ArrVars:  # Numpy array
-            # Get type without byte length
-            vartype = ''.join(c for c in str(self.__dict__[v].dtype) if c.isalpha())
-            self.__dict__[v] = np.append(self.__dict__[v], [defaults.get(vartype, 0)] * n)
+            arr = self.__dict__[v]
+            nold = len(arr)
+            buf, view, default = self._ArrBufs.get(v, (None, None, None))
+            if arr is not view or nold + n > len(buf):
+                # The array was replaced since the last create/delete, or
+                # the buffer is full: copy to a new buffer of double size
+                # Get type without byte length
+                vartype = ''.join(c for c in str(arr.dtype) if c.isalpha())
+                default = defaults.get(vartype, 0)
+                # Use the same dtype promotion as np.append (e.g., to fit
+                # longer strings in string arrays)
+                buf = np.empty(max(nold + n, 2 * nold),
+                               dtype=np.append(arr[:0], default).dtype)
+                buf[:nold] = arr
+            buf[nold:nold + n] = default
+            self.__dict__[v] = view = buf[:nold + n]
+            self._ArrBufs[v] = (buf, view, default)
 
     def istrafarray(self, name):
         ''' Returns true if parameter 'name' is a traffic array. '''
@@ -107,8 +133,30 @@ class TrafficArrays:
         for child in self._children:
             child.delete(idx)
 
+        # Arrays that were replaced since the last create/delete can be views
+        # onto the buffer of another array. Copy these before compacting the
+        # buffers in place.
+        owned = []
         for v in self._ArrVars:
-            self.__dict__[v] = np.delete(self.__dict__[v], idx)
+            arr = self.__dict__[v]
+            buf, view, default = self._ArrBufs.get(v, (None, None, None))
+            if arr is view:
+                owned.append((v, buf, view, default))
+            else:
+                self.__dict__[v] = np.delete(arr, idx)
+                self._ArrBufs.pop(v, None)
+
+        if owned:
+            # Only the elements after the first deleted element move
+            keep = np.ones(len(owned[0][2]), dtype=bool)
+            keep[idx] = False
+            first = np.argmin(keep) if len(keep) else 0
+            keep = keep[first:]
+            nnew = first + np.count_nonzero(keep)
+            for v, buf, view, default in owned:
+                buf[first:nnew] = view[first:][keep]
+                self.__dict__[v] = view = buf[:nnew]
+                self._ArrBufs[v] = (buf, view, default)
 
         if self._LstVars:
             if isinstance(idx, Collection):
@@ -126,6 +174,7 @@ class TrafficArrays:
 
         for v in self._ArrVars:
             self.__dict__[v] = np.array([], dtype=self.__dict__[v].dtype)
+        self._ArrBufs.clear()
 
         for v in self._LstVars:
             self.__dict__[v] = []
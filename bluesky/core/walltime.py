@@ -16,11 +16,21 @@ class Timer:
         self.t_next   = 0.0
 
     def start(self, interval):
-        ''' Start this timer. '''
-        Timer.timers.append(self)
+        ''' Start this timer, or restart it with a new interval [ms]. '''
+        if self not in Timer.timers:
+            Timer.timers.append(self)
         self.interval = float(interval) * 1e-3
         self.t_next   = time.time() + self.interval
 
+    def stop(self):
+        ''' Stop this timer. '''
+        if self in Timer.timers:
+            Timer.timers.remove(self)
+
+    def isactive(self):
+        ''' Returns True if this timer is running. '''
+        return self in Timer.timers
+
     @classmethod
     def update_timers(cls):
         ''' Update all timers. '''
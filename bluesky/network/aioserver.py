@@ -0,0 +1,266 @@
+''' Asyncio implementation of the BlueSky simulation server.
+
+    Event routing and stream forwarding run as separate tasks in one asyncio
+    event loop. Stream messages from the sim nodes are buffered before they
+    are forwarded to the clients: for coalesced topics (e.g., ACDATA) only
+    the most recent message per topic and node is kept, other topics are
+    queued up to a maximum size, above which the oldest messages are dropped.
+    Delta frames of a delta-encoded stream (ACDELTA) are never coalesced,
+    because they can only be decoded after all previous frames.
+    This way a slow client, or a burst of stream data, never delays the
+    routing of events. Message and byte counters of all connections can be
+    requested by clients with a SERVERSTATS event.
+
+    Event handling is shared with the synchronous server, and sends events
+    without awaiting them. The sockets of this server therefore report the
+    errors of sends that nobody awaits.
+'''
+import asyncio
+from collections import defaultdict, deque
+import time
+import zmq
+import zmq.asyncio
+import msgpack
+
+# Local imports
+import bluesky as bs
+from .server import Server
+
+
+# Register settings defaults
+bs.settings.set_variable_defaults(server_coalesce=['ACDATA', 'SIMINFO', 'ROUTEDATA'],
+                                  server_streambuffer=1000)
+
+
+def iskeyframe(msg):
+    ''' Return True when a stream message doesn't depend on the previous
+        messages of its topic, i.e., when it is not a delta frame. '''
+    if len(msg) < 2:
+        return True
+    header = msgpack.unpackb(msg[1].bytes if isinstance(msg[1], zmq.Frame) else msg[1])
+    delta = header.get('delta') if isinstance(header, dict) else None
+    return delta is None or delta['key']
+
+
+class StreamBuffer:
+    ''' Buffer of stream messages waiting to be forwarded to the clients.
+
+        Arguments:
+        - coalesce: Topic prefixes of which only the latest message is kept
+        - maxsize: Maximum number of buffered messages
+    '''
+    def __init__(self, coalesce=(), maxsize=1000):
+        self.coalesce = tuple(coalesce)
+        self.maxsize = maxsize
+        # Buffered [topic, message] entries in order of arrival, and the
+        # entries of coalesced topics of which the message can be replaced
+        self.queue = deque()
+        self.latest = dict()
+        self.depth = defaultdict(int)
+        self.ncoalesced = 0
+        self.ndropped = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def put(self, topic, msg):
+        ''' Add a stream message to the buffer. Topics end with the node id. '''
+        entry = [topic, msg]
+        if topic.startswith(self.coalesce):
+            if not iskeyframe(msg):
+                # Delta frames are queued, and later frames of this topic
+                # can't replace the frames before them anymore
+                self.latest.pop(topic, None)
+            elif topic in self.latest:
+                # Replace the not yet forwarded previous message of this topic
+                self.latest[topic][1] = msg
+                self.ncoalesced += 1
+                return
+            else:
+                self.latest[topic] = entry
+        self.queue.append(entry)
+        self.depth[topic[-5:]] += 1
+        while len(self.queue) > self.maxsize:
+            self.pop()
+            self.ndropped += 1
+
+    def pop(self):
+        ''' Remove and return the oldest buffered message. '''
+        entry = self.queue.popleft()
+        topic, msg = entry
+        self.depth[topic[-5:]] -= 1
+        if self.latest.get(topic) is entry:
+            del self.latest[topic]
+        return msg
+
+
+class Meter:
+    ''' Message and byte counter of a connection. '''
+    def __init__(self):
+        self.msgs = 0
+        self.nbytes = 0
+        self.msgrate = 0.0
+        self.byterate = 0.0
+        self.prev = (0, 0)
+
+    def count(self, msg):
+        ''' Count one multipart message. '''
+        self.msgs += 1
+        self.nbytes += sum(len(frame) for frame in msg)
+
+    def update(self, dt):
+        ''' Update the message and byte rates over the last dt seconds. '''
+        self.msgrate = (self.msgs - self.prev[0]) / dt
+        self.byterate = (self.nbytes - self.prev[1]) / dt
+        self.prev = (self.msgs, self.nbytes)
+
+    def stats(self):
+        ''' Return the counters and rates as a dict. '''
+        return dict(msgs=self.msgs, bytes=self.nbytes,
+                    msgrate=self.msgrate, byterate=self.byterate)
+
+
+def reportsenderror(future):
+    ''' Print the error of a failed send. '''
+    if not future.cancelled() and future.exception() is not None:
+        print(f'Server: failed to send message: {future.exception()!r}')
+
+
+class Socket(zmq.asyncio.Socket):
+    ''' Asyncio socket that reports the errors of all its sends. '''
+    def send_multipart(self, *args, **kwargs):
+        future = super().send_multipart(*args, **kwargs)
+        future.add_done_callback(reportsenderror)
+        return future
+
+
+class Context(zmq.asyncio.Context):
+    ''' Asyncio context that creates error-reporting sockets. '''
+    _socket_class = Socket
+
+
+class AsyncServer(Server):
+    ''' BlueSky simulation server with an asyncio event loop. '''
+
+    def __init__(self, discovery, altconfig=None, startscn=None):
+        super().__init__(discovery, altconfig, startscn)
+        self.buffer = StreamBuffer([prefix.encode() for prefix in bs.settings.server_coalesce],
+                                   bs.settings.server_streambuffer)
+        # Counters of received events per connection, received stream data
+        # per node, and forwarded stream data
+        self.events_in = defaultdict(Meter)
+        self.streams_in = defaultdict(Meter)
+        self.streams_out = Meter()
+        self.pending = None
+        self.stopped = None
+
+    def run(self):
+        ''' Run the event loop of this server until it is stopped. '''
+        asyncio.run(self.main())
+
+        # Wait for all nodes to finish
+        self.waitnodes()
+
+    async def main(self):
+        ''' The main coroutine of this server. '''
+        self.pending = asyncio.Event()
+        self.stopped = asyncio.Event()
+        self.bind(Context())
+
+        if self.discovery:
+            asyncio.get_running_loop().add_reader(self.discovery.handle.fileno(), self.discover)
+        print(f'Discovery is {"en" if self.discovery else "dis"}abled')
+
+        tasks = [asyncio.create_task(coro) for coro in (
+            self.read_events(self.fe_event, True),
+            self.read_events(self.be_event, False),
+            self.read_streams(),
+            self.write_streams(),
+            self.read_subscriptions(),
+            self.update_rates(),
+            self.check_batch())]
+
+        # Start the first simulation node
+        self.addnodes(startscn=self.startscn)
+
+        await self.stopped.wait()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.discovery:
+            asyncio.get_running_loop().remove_reader(self.discovery.handle.fileno())
+
+    async def read_events(self, sock, srcisclient):
+        ''' Receive and process events from clients or sim nodes. '''
+        while self.running:
+            msg = await sock.recv_multipart()
+            if msg:
+                self.events_in[msg[0]].count(msg)
+                self.process_event(msg, srcisclient)
+        self.stopped.set()
+
+    async def read_streams(self):
+        ''' Receive stream data from the sim nodes, and add it to the buffer. '''
+        while True:
+            msg = await self.be_stream.recv_multipart(copy=False)
+            topic = msg[0].bytes
+            self.streams_in[topic[-5:]].count(msg)
+            self.buffer.put(topic, msg)
+            self.pending.set()
+
+    async def write_streams(self):
+        ''' Forward buffered stream data to the clients. '''
+        while True:
+            await self.pending.wait()
+            while self.buffer:
+                msg = self.buffer.pop()
+                self.streams_out.count(msg)
+                await self.fe_stream.send_multipart(msg, copy=False)
+                # Let the readers run between messages, so that stream data
+                # that arrives in the meantime can be coalesced
+                await asyncio.sleep(0)
+            self.pending.clear()
+
+    async def read_subscriptions(self):
+        ''' Forward (un)subscriptions of clients to the sim nodes. '''
+        while True:
+            msg = await self.fe_stream.recv_multipart()
+            await self.be_stream.send_multipart(msg)
+
+    async def update_rates(self):
+        ''' Update the message and byte rates once per second. '''
+        tprev = time.perf_counter()
+        while True:
+            await asyncio.sleep(1.0)
+            t = time.perf_counter()
+            for meter in (self.streams_out, *self.events_in.values(), *self.streams_in.values()):
+                meter.update(t - tprev)
+            tprev = t
+
+    async def check_batch(self):
+        ''' During a batch run, periodically check the state of the nodes. '''
+        while True:
+            await asyncio.sleep(1.0)
+            if self.batch:
+                self.checkbatch()
+
+    def stats(self):
+        ''' Return the counters of this server. '''
+        return dict(
+            events_in={connid.hex(): meter.stats() for connid, meter in self.events_in.items()},
+            streams_in={nodeid.hex(): meter.stats() for nodeid, meter in self.streams_in.items()},
+            streams_out=self.streams_out.stats(),
+            buffer=dict(depth=len(self.buffer),
+                        nodes={nodeid.hex(): n for nodeid, n in self.buffer.depth.items()},
+                        coalesced=self.buffer.ncoalesced,
+                        dropped=self.buffer.ndropped))
+
+    def process_event(self, msg, srcisclient):
+        ''' Reply to SERVERSTATS requests, and process all other events
+            like the synchronous server. '''
+        if msg[-2] == b'SERVERSTATS':
+            src = self.fe_event if srcisclient else self.be_event
+            data = msgpack.packb(self.stats(), use_bin_type=True)
+            src.send_multipart([msg[0], self.host_id, b'SERVERSTATS', data])
+            return
+        super().process_event(msg, srcisclient)
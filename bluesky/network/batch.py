@@ -0,0 +1,129 @@
+''' Scheduling of batch scenarios over simulation nodes. '''
+import os
+import re
+import time
+from datetime import datetime
+import bluesky as bs
+from bluesky.tools.misc import txt2tim
+
+
+# Register settings defaults
+bs.settings.set_variable_defaults(log_path='output', batch_timeout=0.0, batch_retries=1)
+
+
+def split_scenarios(scentime, scencmd):
+    ''' Split the contents of a batch file into individual scenarios. '''
+    start = 0
+    for i in range(1, len(scencmd) + 1):
+        if i == len(scencmd) or scencmd[i][:4] == 'SCEN':
+            scenname = scencmd[start].split()[1].strip()
+            yield dict(name=scenname, scentime=scentime[start:i], scencmd=scencmd[start:i])
+            start = i
+
+
+def estimate_cost(scen):
+    ''' Estimate the cost of a scenario as its duration in simulation time,
+        times the number of aircraft it creates. '''
+    ntraf = 0
+    duration = 0.0
+    for t, cmd in zip(scen['scentime'], scen['scencmd']):
+        args = re.split(r'[\s,]+', cmd.strip(), maxsplit=2)
+        name = args[0].upper()
+        duration = max(duration, t)
+        if name == 'MCRE' and len(args) > 1 and args[1].isdigit():
+            ntraf += int(args[1])
+        elif name.startswith('CRE'):
+            ntraf += 1
+        elif name in ('SCHEDULE', 'DELAY') and len(args) > 1:
+            # Commands scheduled after the last scenario line also take time
+            try:
+                tcmd = txt2tim(args[1])
+            except ValueError:
+                continue
+            duration = max(duration, tcmd + (t if name == 'DELAY' else 0.0))
+    return (1.0 + duration) * max(1, ntraf)
+
+
+class BatchScheduler:
+    ''' Scheduler of the scenarios of a batch run.
+
+        Scenarios are handed out longest (estimated) first to nodes that
+        become available. Scenarios whose node crashed or timed out are
+        retried, and the status and wall time of each scenario is kept for
+        the summary of the batch. '''
+    def __init__(self):
+        self.queue = []
+        self.running = dict()
+        self.results = []
+        self.tstart = 0.0
+
+    def __bool__(self):
+        ''' True while the batch has scenarios waiting or running. '''
+        return bool(self.queue or self.running)
+
+    def load(self, scentime, scencmd):
+        ''' Start a new batch from the contents of a batch file, and return
+            the number of scenarios in it. '''
+        scenarios = list(split_scenarios(scentime, scencmd))
+        for idx, scen in enumerate(scenarios):
+            scen.update(idx=idx, cost=estimate_cost(scen), attempts=0)
+        self.queue = sorted(scenarios, key=lambda scen: scen['cost'], reverse=True)
+        self.running.clear()
+        self.results = []
+        self.tstart = time.time()
+        return len(scenarios)
+
+    def start(self, worker_id):
+        ''' Take the next scenario from the queue for worker_id, and return
+            the scenario data to send to the worker. '''
+        scen = self.queue.pop(0)
+        scen['attempts'] += 1
+        scen['tstart'] = time.time()
+        self.running[worker_id] = scen
+        return dict(name=scen['name'], scentime=scen['scentime'], scencmd=scen['scencmd'])
+
+    def finish(self, worker_id, status='ok'):
+        ''' Register the end of the scenario of worker_id, with status 'ok',
+            or a failure status. Failed scenarios are put back at the front
+            of the queue until their retries are used up. Returns False when
+            worker_id wasn't running a batch scenario. '''
+        scen = self.running.pop(worker_id, None)
+        if scen is None:
+            return False
+        walltime = time.time() - scen['tstart']
+        if status != 'ok' and scen['attempts'] <= bs.settings.batch_retries:
+            self.queue.insert(0, scen)
+        else:
+            self.results.append(dict(scenario=scen['name'], idx=scen['idx'],
+                                     cost=scen['cost'], status=status,
+                                     attempts=scen['attempts'],
+                                     node=worker_id.hex(), walltime=walltime))
+        return True
+
+    def timedout(self):
+        ''' Return the workers that exceeded the batch timeout. '''
+        if bs.settings.batch_timeout <= 0.0:
+            return []
+        tmin = time.time() - bs.settings.batch_timeout
+        return [worker_id for worker_id, scen in self.running.items()
+                if scen['tstart'] < tmin]
+
+    def write_summary(self, fname=''):
+        ''' Write the results of the batch to a CSV file, and return its name. '''
+        if not os.path.isdir(bs.settings.log_path):
+            os.makedirs(bs.settings.log_path)
+        fname = os.path.join(bs.settings.log_path, fname or
+                             datetime.now().strftime('BATCH_%Y%m%d_%H-%M-%S.csv'))
+        with open(fname, 'w') as f:
+            f.write(f'# Batch of {len(self.results)} scenarios, '
+                    f'total wall time {time.time() - self.tstart:.1f} s\n')
+            f.write('# scenario,index,estimated cost,status,attempts,node,wall time [s]\n')
+            for res in sorted(self.results, key=lambda res: res['idx']):
+                f.write(f'{res["scenario"]},{res["idx"]},{res["cost"]:.0f},{res["status"]},'
+                        f'{res["attempts"]},{res["node"]},{res["walltime"]:.3f}\n')
+        return fname
+
+    def summary(self):
+        ''' Return a one-line summary of the batch results. '''
+        nok = sum(1 for res in self.results if res['status'] == 'ok')
+        return f'{nok} of {len(self.results)} scenarios completed successfully'
@@ -0,0 +1,170 @@
+''' Delta/keyframe encoding of per-aircraft data streams.
+
+    Every keyframe_interval frames a keyframe is sent with all aircraft
+    data. In between, only the data of aircraft whose (quantised) values
+    changed since the previous frame is sent, as arrays of changed indices
+    and quantised value differences. The callsign list is only sent when it
+    changes. Encoder and decoder keep the same quantised state, so decoded
+    values never drift further than half a quantum from the encoded values.
+'''
+import numpy as np
+
+
+# Quantum per floating-point field. Other per-aircraft arrays are sent exactly.
+QUANTA = dict(lat=1e-6, lon=1e-6, alt=0.1, tas=0.01, cas=0.01, gs=0.01,
+              trk=0.01, vs=0.01, tcpamax=0.1, rpz=1.0, vmin=0.01, vmax=0.01,
+              asastas=0.01, asastrk=0.01)
+
+# Quantised representation of non-finite values
+NANVALUE = np.iinfo(np.int64).min
+
+
+def quantise(name, values):
+    ''' Return the quantised integer representation of a float field. '''
+    values = np.asarray(values, dtype=float)
+    finite = np.isfinite(values)
+    if finite.all():
+        return np.rint(values / QUANTA[name]).astype(np.int64)
+    return np.where(finite, np.rint(np.where(finite, values, 0.0) / QUANTA[name]),
+                    NANVALUE).astype(np.int64)
+
+
+def dequantise(name, qvalues):
+    ''' Return the float field values from their quantised representation. '''
+    values = qvalues * QUANTA[name]
+    values[qvalues == NANVALUE] = np.nan
+    return values
+
+
+def smallint(values):
+    ''' Return integer values in the smallest integer type that holds them. '''
+    if not len(values):
+        return values.astype(np.int16)
+    vmin, vmax = values.min(), values.max()
+    for dtype in (np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if vmin >= info.min and vmax <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+def remap(oldids, newids):
+    ''' Return for each callsign in newids its index in oldids, or -1. '''
+    oldidx = {acid: i for i, acid in enumerate(oldids)}
+    return np.array([oldidx.get(acid, -1) for acid in newids], dtype=np.int64)
+
+
+class DeltaEncoder:
+    ''' Encoder of a per-aircraft data stream. Data dicts contain a list of
+        callsigns 'id', per-aircraft arrays of the same length, and scalar
+        values, which are sent unchanged with each frame. '''
+    def __init__(self, keyframe_interval=25):
+        self.keyframe_interval = keyframe_interval
+        self.reset()
+
+    def reset(self):
+        ''' Clear the encoder state, the next frame is a keyframe. '''
+        self.seq = -1
+        self.nextkey = 0
+        self.ids = []
+        self.state = dict()
+
+    def forcekey(self):
+        ''' Send a keyframe with the next frame, e.g., for a new client. '''
+        self.nextkey = self.seq + 1
+
+    def encode(self, data):
+        ''' Encode data dict, and return the dict to send. '''
+        self.seq += 1
+        ids = list(data['id'])
+        ntraf = len(ids)
+        fields = {name: value for name, value in data.items()
+                  if name != 'id' and isinstance(value, np.ndarray) and
+                  value.ndim == 1 and len(value) == ntraf}
+        out = {name: value for name, value in data.items() if name != 'id' and name not in fields}
+
+        # Quantise float fields, other fields are compared exactly
+        values = {name: quantise(name, value) if name in QUANTA else np.array(value)
+                  for name, value in fields.items()}
+
+        if self.seq >= self.nextkey or values.keys() != self.state.keys():
+            self.nextkey = self.seq + self.keyframe_interval
+            self.ids = ids
+            self.state = values
+            out['delta'] = dict(seq=self.seq, key=True, id=ids,
+                                fields={name: smallint(value) if name in QUANTA else value
+                                        for name, value in values.items()})
+            return out
+
+        # Map the previous state onto the current callsign list
+        delta = dict(seq=self.seq, key=False)
+        if ids != self.ids:
+            src = remap(self.ids, ids)
+            known = src >= 0
+            for name, value in self.state.items():
+                prev = np.zeros_like(values[name])
+                prev[known] = value[src[known]]
+                self.state[name] = prev
+            self.ids = delta['id'] = ids
+        else:
+            known = np.ones(ntraf, dtype=bool)
+
+        # Send indices and value differences of changed aircraft
+        deltafields = dict()
+        idxtype = np.uint16 if ntraf <= 65536 else np.uint32
+        for name, value in values.items():
+            prev = self.state[name]
+            idx = np.flatnonzero((value != prev) | ~known)
+            if len(idx):
+                if name in QUANTA:
+                    diff = smallint(value[idx] - prev[idx])
+                else:
+                    diff = value[idx]
+                deltafields[name] = [idx.astype(idxtype), diff]
+            self.state[name] = value
+        delta['fields'] = deltafields
+        out['delta'] = delta
+        return out
+
+
+class DeltaDecoder:
+    ''' Decoder of a delta-encoded per-aircraft data stream. '''
+    def __init__(self):
+        self.seq = None
+        self.ids = []
+        self.state = dict()
+
+    def decode(self, data):
+        ''' Decode a received data dict. Returns the data dict with full
+            per-aircraft arrays, or None when the frame can't be decoded
+            because no keyframe was received after a missed frame. '''
+        delta = data.pop('delta')
+        if delta['key']:
+            self.ids = list(delta['id'])
+            self.state = {name: np.array(value, dtype=np.int64 if name in QUANTA else None)
+                          for name, value in delta['fields'].items()}
+        elif self.seq is None or delta['seq'] != self.seq + 1:
+            self.seq = None
+            return None
+        else:
+            if 'id' in delta:
+                ids = list(delta['id'])
+                src = remap(self.ids, ids)
+                known = src >= 0
+                for name, value in self.state.items():
+                    prev = np.zeros(len(ids), dtype=value.dtype)
+                    prev[known] = value[src[known]]
+                    self.state[name] = prev
+                self.ids = ids
+            for name, (idx, diff) in delta['fields'].items():
+                idx = idx.astype(np.int64)
+                if name in QUANTA:
+                    self.state[name][idx] += diff
+                else:
+                    self.state[name][idx] = diff
+        self.seq = delta['seq']
+
+        data['id'] = list(self.ids)
+        for name, value in self.state.items():
+            data[name] = dequantise(name, value) if name in QUANTA else value.copy()
+        return data
@@ -5,17 +5,18 @@ import msgpack
 import bluesky as bs
 from bluesky import stack
 from bluesky.core.walltime import Timer
-from bluesky.network.npcodec import encode_ndarray, decode_ndarray
+from bluesky.network.npcodec import encode_ndarray, decode_ndarray, packframes
 
 
 class Node:
     def __init__(self, event_port, stream_port):
-        self.node_id = b'\x00' + os.urandom(4)
+        self.node_id = b''
         self.host_id = b''
         self.running = True
-        ctx = zmq.Context.instance()
-        self.event_io = ctx.socket(zmq.DEALER)
-        self.stream_out = ctx.socket(zmq.PUB)
+        # Sockets are created on connect, so that an initialised node
+        # can be forked before connecting (see network.zygote)
+        self.event_io = None
+        self.stream_out = None
         self.event_port = event_port
         self.stream_port = stream_port
 
@@ -40,12 +41,16 @@ class Node:
     def connect(self):
         ''' Connect node to the BlueSky server. '''
         # Initialization of sockets.
+        ctx = zmq.Context.instance()
+        self.node_id = b'\x00' + os.urandom(4)
+        self.event_io = ctx.socket(zmq.DEALER)
+        self.stream_out = ctx.socket(zmq.PUB)
         self.event_io.setsockopt(zmq.IDENTITY, self.node_id)
         self.event_io.connect('tcp://localhost:{}'.format(self.event_port))
         self.stream_out.connect('tcp://localhost:{}'.format(self.stream_port))
 
         # Start communication, and receive this node's ID
-        self.send_event(b'REGISTER')
+        self.send_event(b'REGISTER', (os.getpid(), os.getppid()))
         self.host_id = self.event_io.recv_multipart()[0]
         # print('Node connected, id={}'.format(self.node_id))
 
@@ -78,4 +83,4 @@ class Node:
         self.event_io.send_multipart(target + [eventname, pydata])
 
     def send_stream(self, name, data):
-        self.stream_out.send_multipart([name + self.node_id, msgpack.packb(data, default=encode_ndarray, use_bin_type=True)])
+        self.stream_out.send_multipart([name + self.node_id] + packframes(data), copy=False)
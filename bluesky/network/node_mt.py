@@ -1,10 +1,11 @@
 """ Node encapsulates the sim process, and manages process I/O. """
+import os
 from threading import Thread
 import zmq
 import msgpack
 from bluesky import stack
 from bluesky.core.walltime import Timer
-from bluesky.network.npcodec import encode_ndarray, decode_ndarray
+from bluesky.network.npcodec import encode_ndarray, decode_ndarray, packframes
 
 class IOThread(Thread):
     ''' Separate thread for node I/O. '''
@@ -39,7 +40,7 @@ class IOThread(Thread):
                     break
                 fe_event.send_multipart(msg)
             if poll_socks.get(be_stream) == zmq.POLLIN:
-                fe_stream.send_multipart(be_stream.recv_multipart())
+                fe_stream.send_multipart(be_stream.recv_multipart(copy=False), copy=False)
 
 
 class Node:
@@ -71,7 +72,7 @@ class Node:
 
         # Start the I/O thread, and receive from it this node's ID
         self.iothread.start()
-        self.send_event(b'REGISTER')
+        self.send_event(b'REGISTER', (os.getpid(), os.getppid()))
         self.node_id = self.event_io.recv_multipart()[-1]
         self.host_id = self.node_id[:5]
         print('Node started, id={}'.format(self.node_id))
@@ -122,4 +123,4 @@ class Node:
         self.event_io.send_multipart([stack.sender() or b'*', name, msgpack.packb(data, default=encode_ndarray, use_bin_type=True)])
 
     def send_stream(self, name, data):
-        self.stream_out.send_multipart([name + self.node_id, msgpack.packb(data, default=encode_ndarray, use_bin_type=True)])
+        self.stream_out.send_multipart([name + self.node_id] + packframes(data), copy=False)
@@ -1,5 +1,13 @@
+''' Msgpack encoding of numpy arrays, and multipart message packing with
+    array data in separate (zero-copy) message frames. '''
+import msgpack
 import numpy as np
 
+
+# Arrays of at least this size [bytes] are sent as separate message frames
+FRAME_MINSIZE = 4096
+
+
 def encode_ndarray(o):
     '''Msgpack encoder for numpy arrays.'''
     if isinstance(o, np.ndarray):
@@ -12,5 +20,39 @@ def encode_ndarray(o):
 def decode_ndarray(o):
     '''Msgpack decoder for numpy arrays.'''
     if o.get(b'numpy'):
-        return np.fromstring(o[b'data'], dtype=np.dtype(o[b'type'])).reshape(o[b'shape'])
+        return np.frombuffer(o[b'data'], dtype=np.dtype(o[b'type'])).reshape(o[b'shape'])
     return o
+
+
+def packframes(data):
+    ''' Pack data into a list of message frames: a msgpack header frame,
+        followed by the data buffers of large numpy arrays, which can be
+        sent without copying (zmq copy=False). Each array is copied once,
+        because zmq sends the frames asynchronously, while the original
+        arrays can change in-place. '''
+    buffers = []
+
+    def encode(o):
+        if isinstance(o, np.ndarray) and o.nbytes >= FRAME_MINSIZE:
+            buffers.append(np.array(o, order='C'))
+            return {b'numpy': True,
+                    b'type': o.dtype.str,
+                    b'shape': o.shape,
+                    b'frame': len(buffers)}
+        return encode_ndarray(o)
+
+    return [msgpack.packb(data, default=encode, use_bin_type=True)] + buffers
+
+
+def unpackframes(frames):
+    ''' Unpack a list of message frames produced by packframes. Frames can
+        be bytes or zmq.Frame objects (received with copy=False), in which
+        case arrays are views on the received frame data. '''
+    def decode(o):
+        if o.get(b'numpy'):
+            frame = o.get(b'frame')
+            buf = o[b'data'] if frame is None else memoryview(frames[frame])
+            return np.frombuffer(buf, dtype=np.dtype(o[b'type'])).reshape(o[b'shape'])
+        return o
+
+    return msgpack.unpackb(memoryview(frames[0]), object_hook=decode, raw=False)
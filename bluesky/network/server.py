@@ -3,29 +3,23 @@ import os
 from multiprocessing import cpu_count
 from threading import Thread
 import sys
-from subprocess import Popen
+from subprocess import Popen, PIPE
 import zmq
 import msgpack
 
 # Local imports
 import bluesky as bs
 from .discovery import Discovery
+from .batch import BatchScheduler
+from .zygote import ForkedNode
 
 
 # Register settings defaults
 bs.settings.set_variable_defaults(max_nnodes=cpu_count(),
                                   event_port=9000, stream_port=9001,
                                   simevent_port=10000, simstream_port=10001,
-                                  enable_discovery=False)
-
-def split_scenarios(scentime, scencmd):
-    ''' Split the contents of a batch file into individual scenarios. '''
-    start = 0
-    for i in range(1, len(scencmd) + 1):
-        if i == len(scencmd) or scencmd[i][:4] == 'SCEN':
-            scenname = scencmd[start].split()[1].strip()
-            yield dict(name=scenname, scentime=scentime[start:i], scencmd=scencmd[start:i])
-            start = i
+                                  enable_discovery=False, server_hwm=1000,
+                                  server_async=False, prefork_nodes=False)
 
 
 class Server(Thread):
@@ -36,12 +30,18 @@ class Server(Thread):
         self.spawned_processes = list()
         self.running = True
         self.max_nnodes = min(cpu_count(), bs.settings.max_nnodes)
-        self.scenarios = []
+        self.batch = BatchScheduler()
         self.host_id = b'\x00' + os.urandom(4)
         self.clients = []
         self.workers = []
         self.servers = {self.host_id : dict(route=[], nodes=self.workers)}
         self.avail_workers = dict()
+        # Process ids of the nodes, to detect crashed nodes, and stop hung nodes
+        self.nodepids = dict()
+        # Zygote process from which nodes are forked, and the number of
+        # requested forks that haven't registered yet
+        self.zygote = None
+        self.nforking = 0
 
         # Information to pass on to spawned nodes
         self.altconfig = altconfig
@@ -54,12 +54,72 @@ class Server(Thread):
 
     def sendscenario(self, worker_id):
         # Send a new scenario to the target sim process
-        scen = self.scenarios.pop(0)
-        data = msgpack.packb(scen)
+        data = msgpack.packb(self.batch.start(worker_id))
         self.be_event.send_multipart([worker_id, self.host_id, b'BATCH', data])
 
+    def startbatchnodes(self):
+        ''' Start the nodes needed to run the waiting batch scenarios. '''
+        nstarting = self.nforking + sum(1 for p in self.spawned_processes
+                        if p.poll() is None and p.pid not in self.nodepids.values())
+        self.addnodes(min(len(self.batch.queue),
+                          max(0, self.max_nnodes - len(self.workers) - nstarting)))
+
+    def removenode(self, worker_id):
+        ''' Remove a crashed or hung node from this server. '''
+        self.workers.remove(worker_id)
+        self.avail_workers.pop(worker_id, None)
+        pid = self.nodepids.pop(worker_id, None)
+        for p in self.spawned_processes:
+            if p.pid == pid and p.poll() is None:
+                p.kill()
+                p.wait()
+        # Notify clients of this change
+        data = msgpack.packb({self.host_id : self.servers[self.host_id]}, use_bin_type=True)
+        for client_id in self.clients:
+            self.fe_event.send_multipart([client_id, self.host_id, b'NODESCHANGED', data])
+
+    def checkbatch(self):
+        ''' Check for crashed and timed out nodes during a batch run. '''
+        for worker_id, pid in list(self.nodepids.items()):
+            proc = next((p for p in self.spawned_processes if p.pid == pid), None)
+            if proc is not None and proc.poll() is not None:
+                self.batch.finish(worker_id, 'crashed')
+                self.removenode(worker_id)
+        for worker_id in self.batch.timedout():
+            self.batch.finish(worker_id, 'timeout')
+            if worker_id in self.nodepids:
+                self.removenode(worker_id)
+            else:
+                # Nodes without a known process can only be asked to quit
+                if worker_id in self.workers:
+                    self.workers.remove(worker_id)
+                self.be_event.send_multipart([worker_id, self.host_id, b'QUIT', msgpack.packb(None)])
+
+        # Continue with the remaining scenarios
+        while self.avail_workers and self.batch.queue:
+            worker_id = next(iter(self.avail_workers))
+            self.sendscenario(worker_id)
+            self.avail_workers.pop(worker_id)
+        self.startbatchnodes()
+        self.endbatch()
+
+    def endbatch(self):
+        ''' Write the batch summary when all batch scenarios have finished. '''
+        if self.batch or not self.batch.results or self.batch.tstart == 0.0:
+            return
+        fname = self.batch.write_summary()
+        self.batch.tstart = 0.0
+        data = msgpack.packb(dict(text=f'Batch finished: {self.batch.summary()}. '
+                                       f'Summary written to {fname}', flags=0),
+                             use_bin_type=True)
+        for client_id in self.clients:
+            self.fe_event.send_multipart([client_id, self.host_id, b'ECHO', data])
+
     def addnodes(self, count=1, startscn=None):
         ''' Add [count] nodes to this server. '''
+        if bs.settings.prefork_nodes and hasattr(os, 'fork'):
+            self.forknodes(count, startscn)
+            return
         for _ in range(count):
             args = [sys.executable, 'BlueSky.py', '--sim']
             if self.altconfig:
@@ -69,27 +129,66 @@ class Server(Thread):
             p = Popen(args)
             self.spawned_processes.append(p)
 
-    def run(self):
-        ''' The main loop of this server. '''
-        # Get ZMQ context
-        ctx = zmq.Context.instance()
+    def forknodes(self, count=1, startscn=None):
+        ''' Let the node zygote fork [count] new nodes. '''
+        if count < 1:
+            return
+        if self.zygote is None or self.zygote.poll() is not None:
+            args = [sys.executable, 'BlueSky.py', '--zygote']
+            if self.altconfig:
+                args.extend(['--configfile', self.altconfig])
+            self.zygote = Popen(args, stdin=PIPE, text=True)
+            self.nforking = 0
+        self.zygote.stdin.write(f'{startscn or ""}\n' * count)
+        self.zygote.stdin.flush()
+        self.nforking += count
 
-        # Create connection points for clients
+    def waitnodes(self):
+        ''' Wait for all nodes, and the zygote, to finish. '''
+        if self.zygote is not None:
+            self.zygote.stdin.close()
+            self.zygote.wait()
+        for n in self.spawned_processes:
+            n.wait()
+
+    def bind(self, ctx):
+        ''' Create and bind the client and sim node sockets in context ctx. '''
         self.fe_event = ctx.socket(zmq.ROUTER)
+        self.fe_stream = ctx.socket(zmq.XPUB)
+        self.be_event  = ctx.socket(zmq.ROUTER)
+        self.be_stream = ctx.socket(zmq.XSUB)
         self.fe_event.setsockopt(zmq.IDENTITY, self.host_id)
+        self.be_event.setsockopt(zmq.IDENTITY, self.host_id)
+        # High-water marks of the per-connection message queues
+        for sock in (self.fe_event, self.fe_stream, self.be_event, self.be_stream):
+            sock.setsockopt(zmq.SNDHWM, bs.settings.server_hwm)
+            sock.setsockopt(zmq.RCVHWM, bs.settings.server_hwm)
+
+        # Bind connection points for clients
         self.fe_event.bind(f'tcp://*:{bs.settings.event_port}')
-        self.fe_stream = ctx.socket(zmq.XPUB)
         self.fe_stream.bind(f'tcp://*:{bs.settings.stream_port}')
         print(f'Accepting event connections on port {bs.settings.event_port},',
               f'and stream connections on port {bs.settings.stream_port}')
 
-        # Create connection points for sim workers
-        self.be_event  = ctx.socket(zmq.ROUTER)
-        self.be_event.setsockopt(zmq.IDENTITY, self.host_id)
+        # Bind connection points for sim workers
         self.be_event.bind(f'tcp://*:{bs.settings.simevent_port}')
-        self.be_stream = ctx.socket(zmq.XSUB)
         self.be_stream.bind(f'tcp://*:{bs.settings.simstream_port}')
 
+    def discover(self):
+        ''' Process a message on the discovery socket. '''
+        dmsg = self.discovery.recv_reqreply()
+        # print('Received', dmsg)
+        if dmsg.conn_id != self.host_id and dmsg.is_request:
+            # This is a request from someone else: send a reply
+            # print('Sending reply')
+            self.discovery.send_reply(bs.settings.event_port,
+                bs.settings.stream_port)
+
+    def run(self):
+        ''' The main loop of this server. '''
+        # Get ZMQ context, and create the sockets
+        self.bind(zmq.Context.instance())
+
         # Create poller for both event connection points and the stream reader
         poller = zmq.Poller()
         poller.register(self.fe_event, zmq.POLLIN)
@@ -106,7 +205,8 @@ class Server(Thread):
 
         while self.running:
             try:
-                events = dict(poller.poll(None))
+                # During a batch run, periodically check the state of the nodes
+                events = dict(poller.poll(1000 if self.batch else None))
             except zmq.ZMQError:
                 print('ERROR while polling')
                 break  # interrupted
@@ -120,131 +220,140 @@ class Server(Thread):
                 # First check if the poller was triggered by the discovery socket
                 if self.discovery and sock == self.discovery.handle.fileno():
                     # This is a discovery message
-                    dmsg = self.discovery.recv_reqreply()
-                    # print('Received', dmsg)
-                    if dmsg.conn_id != self.host_id and dmsg.is_request:
-                        # This is a request from someone else: send a reply
-                        # print('Sending reply')
-                        self.discovery.send_reply(bs.settings.event_port,
-                            bs.settings.stream_port)
+                    self.discover()
                     continue
-                # Receive the message
-                msg = sock.recv_multipart()
+                # Receive the message. Stream messages are forwarded without copying
+                msg = sock.recv_multipart(copy=sock not in (self.be_stream, self.fe_stream))
                 if not msg:
                     # In the rare case that a message is empty, skip remaning processing
                     continue
 
                 # Check if this is a stream message: these should be forwarded unprocessed.
                 if sock == self.be_stream:
-                    self.fe_stream.send_multipart(msg)
+                    self.fe_stream.send_multipart(msg, copy=False)
                 elif sock == self.fe_stream:
-                    self.be_stream.send_multipart(msg)
+                    self.be_stream.send_multipart(msg, copy=False)
                 else:
-                    # Select the correct source and destination
-                    srcisclient = (sock == self.fe_event)
-                    src, dest = (self.fe_event, self.be_event) if srcisclient else (self.be_event, self.fe_event)
-
-                    # Message format: [route0, ..., routen, name, data]
-                    route, eventname, data = msg[:-2], msg[-2], msg[-1]
-                    sender_id = route[0]
-
-                    if eventname == b'REGISTER':
-                        # This is a registration message for a new connection
-                        # Reply with our host ID
-                        src.send_multipart([sender_id, self.host_id, b'REGISTER', b''])
-                        # Notify clients of this change
-                        if srcisclient:
-                            self.clients.append(sender_id)
-                            # If the new connection is a client, send it our server list
-                            data = msgpack.packb(self.servers, use_bin_type=True)
-                            src.send_multipart([sender_id, self.host_id, b'NODESCHANGED', data])
-                        else:
-                            self.workers.append(sender_id)
-                            data = msgpack.packb({self.host_id : self.servers[self.host_id]}, use_bin_type=True)
-                            for client_id in self.clients:
-                                dest.send_multipart([client_id, self.host_id, b'NODESCHANGED', data])
-                        continue # No message needs to be forwarded
-
-                    elif eventname == b'NODESCHANGED':
-                        servers_upd = msgpack.unpackb(data, raw=False)
-                        # Update the route with a hop to the originating server
-                        for server in servers_upd.values():
-                            server['route'].insert(0, sender_id)
-                        self.servers.update(servers_upd)
-                        # Notify own clients of this change
-                        data = msgpack.packb(servers_upd, use_bin_type=True)
-                        for client_id in self.clients:
-                            # Skip sender to avoid infinite message loop
-                            if client_id != sender_id:
-                                self.fe_event.send_multipart([client_id, self.host_id, b'NODESCHANGED', data])
-
-                    elif eventname == b'ADDNODES':
-                        # This is a request to start new nodes.
-                        count = msgpack.unpackb(data)
-                        self.addnodes(count)
-                        continue # No message needs to be forwarded
-
-                    elif eventname == b'STATECHANGE':
-                        state = msgpack.unpackb(data)
-                        if state < bs.OP:
-                            # If we have batch scenarios waiting, send
-                            # the worker a new scenario, otherwise store it in
-                            # the available worker list
-                            if self.scenarios:
-                                self.sendscenario(sender_id)
-                            else:
-                                self.avail_workers[sender_id] = route
-                        else:
-                            self.avail_workers.pop(route[0], None)
-                        continue
-
-                    elif eventname == b'QUIT':
-                        self.running = False
-                        # Send quit to all nodes and clients
-                        msg = [self.host_id, eventname, data]
-                        for connid in self.workers:
-                            self.be_event.send_multipart([connid] + msg)
-                        for connid in self.clients:
-                            self.fe_event.send_multipart([connid] + msg)
-                        continue
-
-                    elif eventname == b'BATCH':
-                        scentime, scencmd = msgpack.unpackb(data, raw=False)
-                        self.scenarios = [scen for scen in split_scenarios(scentime, scencmd)]
-                        # Check if the batch list contains scenarios
-                        if not self.scenarios:
-                            echomsg = 'No scenarios defined in batch file!'
-                        else:
-                            echomsg = f'Found {len(self.scenarios)} scenarios in batch'
-                            # Send scenario to available nodes (nodes that are in init or hold mode):
-                            while self.avail_workers and self.scenarios:
-                                worker_id = next(iter(self.avail_workers))
-                                self.sendscenario(worker_id)
-                                self.avail_workers.pop(worker_id)
-
-                            # If there are still scenarios left, determine and
-                            # start the required number of local nodes
-                            reqd_nnodes = min(len(self.scenarios), max(0, self.max_nnodes - len(self.workers)))
-                            self.addnodes(reqd_nnodes)
-                        # ECHO the results to the calling client
-                        eventname = b'ECHO'
-                        data = msgpack.packb(dict(text=echomsg, flags=0), use_bin_type=True)
-
-                    # ============================================================
-                    # If we get here there is a message that needs to be forwarded
-                    # Cycle the route by one step to get the next hop in the route
-                    # (or the destination)
-                    route.append(route.pop(0))
-                    msg = route + [eventname, data]
-                    if route[0] == b'*':
-                        # This is a send-to-all message
-                        msg.insert(0, b'')
-                        for connid in self.workers if srcisclient else self.clients:
-                            msg[0] = connid
-                            dest.send_multipart(msg)
-                    else:
-                        dest.send_multipart(msg)
+                    self.process_event(msg, sock == self.fe_event)
+
+            if self.batch:
+                self.checkbatch()
 
         # Wait for all nodes to finish
-        for n in self.spawned_processes:
-            n.wait()
+        self.waitnodes()
+
+    def process_event(self, msg, srcisclient):
+        ''' Process an event message, coming from a client when srcisclient
+            is True, or from a sim node otherwise. '''
+        # Select the correct source and destination
+        src, dest = (self.fe_event, self.be_event) if srcisclient else (self.be_event, self.fe_event)
+
+        # Message format: [route0, ..., routen, name, data]
+        route, eventname, data = msg[:-2], msg[-2], msg[-1]
+        sender_id = route[0]
+
+        if eventname == b'REGISTER':
+            # This is a registration message for a new connection
+            # Reply with our host ID
+            src.send_multipart([sender_id, self.host_id, b'REGISTER', b''])
+            # Notify clients of this change
+            if srcisclient:
+                self.clients.append(sender_id)
+                # If the new connection is a client, send it our server list
+                data = msgpack.packb(self.servers, use_bin_type=True)
+                src.send_multipart([sender_id, self.host_id, b'NODESCHANGED', data])
+            else:
+                self.workers.append(sender_id)
+                pid, ppid = msgpack.unpackb(data) or (None, None)
+                if self.zygote is not None and ppid == self.zygote.pid:
+                    self.spawned_processes.append(ForkedNode(pid))
+                    self.nforking = max(0, self.nforking - 1)
+                # Keep track of the processes of the nodes started by this server
+                if any(p.pid == pid for p in self.spawned_processes):
+                    self.nodepids[sender_id] = pid
+                data = msgpack.packb({self.host_id : self.servers[self.host_id]}, use_bin_type=True)
+                for client_id in self.clients:
+                    dest.send_multipart([client_id, self.host_id, b'NODESCHANGED', data])
+            return # No message needs to be forwarded
+
+        elif eventname == b'NODESCHANGED':
+            servers_upd = msgpack.unpackb(data, raw=False)
+            # Update the route with a hop to the originating server
+            for server in servers_upd.values():
+                server['route'].insert(0, sender_id)
+            self.servers.update(servers_upd)
+            # Notify own clients of this change
+            data = msgpack.packb(servers_upd, use_bin_type=True)
+            for client_id in self.clients:
+                # Skip sender to avoid infinite message loop
+                if client_id != sender_id:
+                    self.fe_event.send_multipart([client_id, self.host_id, b'NODESCHANGED', data])
+
+        elif eventname == b'ADDNODES':
+            # This is a request to start new nodes.
+            count = msgpack.unpackb(data)
+            self.addnodes(count)
+            return # No message needs to be forwarded
+
+        elif eventname == b'STATECHANGE':
+            state = msgpack.unpackb(data)
+            if state < bs.OP:
+                # The worker finished its batch scenario, if it had one.
+                # If we have batch scenarios waiting, send
+                # the worker a new scenario, otherwise store it in
+                # the available worker list
+                self.batch.finish(sender_id)
+                if self.batch.queue:
+                    self.sendscenario(sender_id)
+                else:
+                    self.avail_workers[sender_id] = route
+                    self.endbatch()
+            else:
+                self.avail_workers.pop(route[0], None)
+            return
+
+        elif eventname == b'QUIT':
+            self.running = False
+            # Send quit to all nodes and clients
+            msg = [self.host_id, eventname, data]
+            for connid in self.workers:
+                self.be_event.send_multipart([connid] + msg)
+            for connid in self.clients:
+                self.fe_event.send_multipart([connid] + msg)
+            return
+
+        elif eventname == b'BATCH':
+            scentime, scencmd = msgpack.unpackb(data, raw=False)
+            nscen = self.batch.load(scentime, scencmd)
+            # Check if the batch list contains scenarios
+            if not nscen:
+                echomsg = 'No scenarios defined in batch file!'
+            else:
+                echomsg = f'Found {nscen} scenarios in batch'
+                # Send scenario to available nodes (nodes that are in init or hold mode):
+                while self.avail_workers and self.batch.queue:
+                    worker_id = next(iter(self.avail_workers))
+                    self.sendscenario(worker_id)
+                    self.avail_workers.pop(worker_id)
+
+                # If there are still scenarios left, determine and
+                # start the required number of local nodes
+                self.startbatchnodes()
+            # ECHO the results to the calling client
+            eventname = b'ECHO'
+            data = msgpack.packb(dict(text=echomsg, flags=0), use_bin_type=True)
+
+        # ============================================================
+        # If we get here there is a message that needs to be forwarded
+        # Cycle the route by one step to get the next hop in the route
+        # (or the destination)
+        route.append(route.pop(0))
+        msg = route + [eventname, data]
+        if route[0] == b'*':
+            # This is a send-to-all message
+            msg.insert(0, b'')
+            for connid in self.workers if srcisclient else self.clients:
+                msg[0] = connid
+                dest.send_multipart(msg)
+        else:
+            dest.send_multipart(msg)
@@ -0,0 +1,346 @@
+''' Export of the traffic state to shared memory, for co-located consumers.
+
+    When enabled, the simulation node writes selected traffic arrays to a
+    ring of slots in a named shared memory segment after every simulation
+    step. Each slot is protected by a sequence lock: the writer makes the
+    sequence number odd while it writes the slot, and even when the slot is
+    complete, so that readers can check that what they read is consistent
+    without ever blocking the simulation. A reader in another process on
+    the same machine uses StateReader:
+
+        reader = StateReader('bluesky')
+        state = reader.read()   # dict with simt, frame, id and the arrays
+
+    Shared memory layout:
+    - A fixed-size control segment with the given name, with the field names,
+      the number of the latest complete frame, and the generation of the
+      data segment.
+    - A data segment named <name>_<generation> with a header, and nslots
+      slots with a slot header, the arrays, and the callsigns. When the
+      number of aircraft exceeds the capacity of the data segment, or a
+      callsign doesn't fit in the callsign field, a larger segment is
+      created with the next generation number.
+'''
+import atexit
+from operator import attrgetter
+from multiprocessing import shared_memory, resource_tracker
+import time
+import numpy as np
+
+import bluesky as bs
+
+
+# Register settings defaults
+bs.settings.set_variable_defaults(
+    shm_name='bluesky', shm_slots=4,
+    shm_fields=['lat', 'lon', 'alt', 'hdg', 'trk', 'tas', 'gs', 'cas', 'vs'])
+
+MAGIC = 0x42534B59
+VERSION = 2
+MAXFIELDS = 32
+IDSIZE = 16
+
+CONTROL = np.dtype([('magic', 'u4'), ('version', 'u4'), ('generation', 'i8'),
+                    ('frame', 'i8'), ('nfields', 'i8'), ('fields', 'S32', (MAXFIELDS,))])
+DATAHDR = np.dtype([('capacity', 'i8'), ('nslots', 'i8'), ('idsize', 'i8'),
+                    ('pad', 'i8', (5,))])
+SLOTHDR = np.dtype([('seq', 'i8'), ('frame', 'i8'), ('ntraf', 'i8'), ('simt', 'f8'),
+                    ('idversion', 'i8'), ('pad', 'i8', (3,))])
+
+# Names of the segments created in this process
+created = set()
+
+
+def slotsize(nfields, capacity, idsize=IDSIZE):
+    ''' Size in bytes of one slot of the data segment. '''
+    return SLOTHDR.itemsize + capacity * (8 * nfields + idsize)
+
+
+def slotviews(buf, nfields, capacity, nslots, idsize=IDSIZE):
+    ''' Return the header, array and callsign views of each slot in buf. '''
+    slots = []
+    for i in range(nslots):
+        offset = DATAHDR.itemsize + i * slotsize(nfields, capacity, idsize)
+        hdr = np.ndarray((), dtype=SLOTHDR, buffer=buf, offset=offset)
+        offset += SLOTHDR.itemsize
+        data = np.ndarray((nfields, capacity), buffer=buf, offset=offset)
+        offset += 8 * nfields * capacity
+        ids = np.ndarray((capacity,), dtype=f'S{idsize}', buffer=buf, offset=offset)
+        slots.append((hdr, data, ids))
+    return slots
+
+
+def attach(name):
+    ''' Attach to an existing shared memory segment, without letting this
+        process's resource tracker remove it when this process exits.
+        Processes started by multiprocessing share the resource tracker
+        of their parent, which keeps its own registration. '''
+    shm = shared_memory.SharedMemory(name=name)
+    if name not in created and resource_tracker._resource_tracker._pid is not None:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class StateWriter:
+    ''' Writer of traffic arrays to shared memory. '''
+    def __init__(self, name, fields, nslots=4, capacity=1024):
+        if len(fields) > MAXFIELDS:
+            raise ValueError(f'At most {MAXFIELDS} fields can be exported')
+        self.name = name
+        self.fields = list(fields)
+        self.nslots = nslots
+        self.frame = -1
+        self.capacity = 0
+        self.idsize = IDSIZE
+        self.data = None
+        self.slots = []
+        self.slotids = []
+        self.ids = None
+        self.idversion = 0
+
+        self.shm = create(name, CONTROL.itemsize)
+        self.control = np.ndarray((), dtype=CONTROL, buffer=self.shm.buf)
+        self.control['generation'] = 0
+        self.control['frame'] = -1
+        self.control['nfields'] = len(self.fields)
+        self.control['fields'][:len(self.fields)] = [f.encode() for f in self.fields]
+        self.control['version'] = VERSION
+        self.control['magic'] = MAGIC
+        self.grow(capacity)
+
+    def grow(self, capacity, idsize=None):
+        ''' Replace the data segment by one that fits capacity aircraft,
+            with callsigns of at most idsize characters. '''
+        generation = int(self.control['generation']) + 1
+        nfields = len(self.fields)
+        idsize = idsize or self.idsize
+        data = create(f'{self.name}_{generation}',
+                      DATAHDR.itemsize + self.nslots * slotsize(nfields, capacity, idsize))
+        hdr = np.ndarray((), dtype=DATAHDR, buffer=data.buf)
+        hdr['capacity'] = capacity
+        hdr['nslots'] = self.nslots
+        hdr['idsize'] = idsize
+        self.closedata()
+        self.data = data
+        self.capacity = capacity
+        self.idsize = idsize
+        self.slots = slotviews(data.buf, nfields, capacity, self.nslots, idsize)
+        self.slotids = [None] * self.nslots
+        self.control['generation'] = generation
+
+    def closedata(self):
+        ''' Release the current data segment. '''
+        if self.data is not None:
+            self.slots = []
+            self.data.close()
+            self.data.unlink()
+            created.discard(self.data.name)
+            self.data = None
+
+    def close(self):
+        ''' Release all shared memory of this writer. '''
+        self.closedata()
+        if self.shm is not None:
+            self.control['magic'] = 0
+            del self.control
+            self.shm.close()
+            self.shm.unlink()
+            created.discard(self.name)
+            self.shm = None
+
+    def write(self, simt, ids, arrays):
+        ''' Write a new frame with callsigns ids, and one array per field. '''
+        ntraf = len(ids)
+        if self.ids != ids:
+            self.ids = list(ids)
+            self.idversion += 1
+            # Widen the callsign field when a callsign doesn't fit
+            idsize = max(map(len, self.ids), default=0)
+            if idsize > self.idsize:
+                self.grow(self.capacity, max(idsize, 2 * self.idsize))
+        if ntraf > self.capacity:
+            self.grow(max(ntraf, 2 * self.capacity))
+        self.frame += 1
+        slot = self.frame % self.nslots
+        hdr, data, idarr = self.slots[slot]
+
+        # Odd sequence number: slot is being written
+        hdr['seq'] += 1
+        for row, arr in zip(data, arrays):
+            row[:ntraf] = arr
+        # Only write callsigns when they changed since this slot was written
+        if self.slotids[slot] != self.idversion:
+            idarr[:ntraf] = ids
+            self.slotids[slot] = self.idversion
+        hdr['idversion'] = self.idversion
+        hdr['frame'] = self.frame
+        hdr['ntraf'] = ntraf
+        hdr['simt'] = simt
+        hdr['seq'] += 1
+
+        self.control['frame'] = self.frame
+
+
+class StateReader:
+    ''' Reader of traffic arrays exported to shared memory by a sim node. '''
+    def __init__(self, name='bluesky'):
+        self.shm = attach(name)
+        self.name = name
+        self.control = np.ndarray((), dtype=CONTROL, buffer=self.shm.buf)
+        if self.control['magic'] != MAGIC or self.control['version'] != VERSION:
+            raise ValueError(f'{name} is not a BlueSky shared state segment')
+        nfields = int(self.control['nfields'])
+        self.fields = [f.decode() for f in self.control['fields'][:nfields]]
+        self.generation = 0
+        self.data = None
+        self.slots = []
+        self.lastframe = -1
+        # Decoded callsigns, and their version
+        self.ids = []
+        self.idversion = -1
+
+    def reattach(self):
+        ''' Attach to the current data segment of the writer. '''
+        generation = int(self.control['generation'])
+        if self.data is not None:
+            self.slots = []
+            closeview(self.data)
+        self.data = attach(f'{self.name}_{generation}')
+        hdr = np.ndarray((), dtype=DATAHDR, buffer=self.data.buf)
+        self.slots = slotviews(self.data.buf, len(self.fields), int(hdr['capacity']),
+                               int(hdr['nslots']), int(hdr['idsize']))
+        self.generation = generation
+
+    def latest(self, timeout=1.0, interval=1e-4):
+        ''' Return the views on the latest complete slot as (frame, slot
+            header, arrays, callsigns), or None if nothing was written yet.
+            When the latest slot is being written, the slot before it is
+            used. Returns None when no complete slot is found within
+            timeout seconds. The views are only valid as long as
+            valid(frame) is True. '''
+        tend = time.perf_counter() + timeout
+        while True:
+            if self.control['magic'] != MAGIC:
+                raise EOFError('Shared state export was closed')
+            if self.control['generation'] != self.generation:
+                self.reattach()
+            frame = int(self.control['frame'])
+            if frame < 0:
+                return None
+            for fnum in (frame, frame - 1):
+                hdr, data, ids = self.slots[fnum % len(self.slots)]
+                if hdr['seq'] % 2 == 0 and hdr['frame'] == fnum:
+                    ntraf = int(hdr['ntraf'])
+                    return fnum, hdr, data[:, :ntraf], ids[:ntraf]
+            if time.perf_counter() > tend:
+                return None
+            time.sleep(interval)
+
+    def valid(self, frame):
+        ''' True when the slot of frame hasn't been overwritten (yet). '''
+        hdr = self.slots[frame % len(self.slots)][0]
+        return hdr['seq'] % 2 == 0 and hdr['frame'] == frame and \
+            self.control['generation'] == self.generation
+
+    def read(self, timeout=1.0, interval=1e-4):
+        ''' Return a consistent copy of the latest frame as a dict with simt,
+            frame, id and the exported arrays, or None if nothing was
+            written yet, or no consistent copy was made within timeout
+            seconds. '''
+        tend = time.perf_counter() + timeout
+        while True:
+            latest = self.latest(max(0.0, tend - time.perf_counter()), interval)
+            if latest is None:
+                return None
+            frame, hdr, data, ids = latest
+            seq = int(hdr['seq'])
+            state = dict(zip(self.fields, data.copy()))
+            idversion = int(hdr['idversion'])
+            if idversion != self.idversion:
+                acids = [acid.decode() for acid in ids]
+            if int(hdr['seq']) == seq and hdr['frame'] == frame:
+                if idversion != self.idversion:
+                    self.ids, self.idversion = acids, idversion
+                state.update(simt=float(hdr['simt']), frame=frame, id=list(self.ids))
+                self.lastframe = frame
+                return state
+            if time.perf_counter() > tend:
+                return None
+
+    def wait(self, timeout=None, interval=1e-4):
+        ''' Wait for a frame newer than the last one read, and return it.
+            Returns None on timeout. '''
+        tend = None if timeout is None else time.perf_counter() + timeout
+        while self.control['frame'] <= self.lastframe:
+            if tend is not None and time.perf_counter() > tend:
+                return None
+            time.sleep(interval)
+        return self.read()
+
+    def close(self):
+        ''' Detach from the shared memory. '''
+        self.slots = []
+        if self.data is not None:
+            closeview(self.data)
+        del self.control
+        closeview(self.shm)
+
+
+def closeview(shm):
+    ''' Close a segment attached by a reader. Views on it that are still in
+        use keep the memory mapped until they are garbage collected. '''
+    try:
+        shm.close()
+    except BufferError:
+        pass
+
+
+def create(name, size):
+    ''' Create a shared memory segment, replacing a stale one of the same name. '''
+    try:
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        stale = shared_memory.SharedMemory(name=name)
+        stale.close()
+        stale.unlink()
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    created.add(name)
+    return shm
+
+
+# The writer of this sim node when the export is enabled, and the getters
+# of the exported traffic arrays
+writer = None
+getters = []
+
+
+def update():
+    ''' Write the current traffic state to shared memory. '''
+    if writer is not None:
+        writer.write(bs.sim.simt, bs.traf.id, [get(bs.traf) for get in getters])
+
+
+def export(flag=None, name=''):
+    ''' SHMEXPORT [ON/OFF],[name]: Export the traffic state to shared memory
+        after every simulation step. '''
+    global writer, getters
+    if flag is None:
+        if writer is None:
+            return True, 'SHMEXPORT [ON/OFF],[name]\nShared memory export is off'
+        return True, f'Exporting {", ".join(writer.fields)} to shared memory {writer.name}'
+    if writer is not None:
+        writer.close()
+        writer = None
+    if flag:
+        getters = [attrgetter(field) for field in bs.settings.shm_fields]
+        writer = StateWriter(name or bs.settings.shm_name, bs.settings.shm_fields,
+                             bs.settings.shm_slots)
+        return True, f'Exporting traffic state to shared memory {writer.name}'
+    return True, 'Shared memory export is off'
+
+
+@atexit.register
+def close():
+    ''' Release the shared memory on exit. '''
+    if writer is not None:
+        writer.close()
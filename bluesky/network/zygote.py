@@ -0,0 +1,80 @@
+''' Node zygote: a simulation node process that is initialised once, and
+    from which new simulation nodes are forked on request of the server.
+
+    Forked nodes share the loaded navigation database, performance model
+    coefficients and discovered plugins with the zygote, which saves the
+    startup time of a new python process for each node. The server requests
+    a new node by writing a line with an (optional) scenario file name to
+    the standard input of the zygote. Only available where os.fork is.
+'''
+import os
+import sys
+import random
+import signal
+import time
+import numpy as np
+
+import bluesky as bs
+from bluesky import stack
+from bluesky.core.walltime import Timer
+
+
+def run(configfile=None):
+    ''' Initialise a simulation node, and fork a new connected node for
+        each request on stdin, until stdin is closed. '''
+    bs.init(mode='sim', configfile=configfile)
+
+    # Let the OS reap the exited nodes
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    for line in sys.stdin:
+        if os.fork() == 0:
+            startnode(line.strip())
+            return
+
+
+def startnode(scenfile=''):
+    ''' Start a forked node: connect it to the server and run it. '''
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    sys.stdin.close()
+    # Forked nodes shouldn't share the random state of the zygote
+    random.seed()
+    np.random.seed()
+    # Restart wall-clock timers from the moment of forking
+    for timer in Timer.timers:
+        timer.start(timer.interval * 1e3)
+
+    if scenfile:
+        stack.stack(f'IC {scenfile}')
+    bs.net.connect()
+    bs.net.run()
+
+
+class ForkedNode:
+    ''' Server-side process handle of a node forked by the zygote, with the
+        subset of the Popen interface used by the server. '''
+    def __init__(self, pid):
+        self.pid = pid
+        self.returncode = None
+
+    def poll(self):
+        ''' Return None while the node is running. '''
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, 0)
+            except ProcessLookupError:
+                # The exit code of a forked node is only known to the zygote
+                self.returncode = -1
+        return self.returncode
+
+    def kill(self):
+        ''' Kill the node. '''
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def wait(self):
+        ''' Wait for the node to finish. '''
+        while self.poll() is None:
+            time.sleep(0.1)
+        return self.returncode
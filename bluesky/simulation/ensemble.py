@@ -0,0 +1,118 @@
+''' Ensemble runs: many instances of a scenario in a single simulation.
+
+    The aircraft of all ensemble members share the traffic arrays, so that
+    traffic, autopilot, performance and conflict detection are updated
+    vectorised over the whole ensemble. Each member has its own scenario
+    command queue and stack. Commands of a member are processed with that
+    member as context: the callsigns of the aircraft it creates get the
+    member number as suffix (KL204 becomes KL204_3 in member 3), callsigns
+    in its commands refer to its own aircraft, and conflicts are only
+    detected between aircraft of the same member. Simulation-wide commands
+    (HOLD, FF, DT, area definitions, ...) apply to the whole ensemble.
+'''
+from contextlib import contextmanager
+import numpy as np
+
+import bluesky as bs
+from bluesky.stack import simstack, stackbase
+from bluesky.stack.stackbase import Stack, CommandQueue
+
+
+class Member:
+    ''' Scenario commands and command stack of one ensemble member. '''
+    def __init__(self, scenname, scentime, scencmd):
+        self.scenname = scenname
+        self.scenqueue = CommandQueue(scentime, scencmd)
+        self.cmdstack = []
+
+
+class Ensemble:
+    ''' The members of an ensemble run. '''
+    def __init__(self):
+        self.members = []
+
+    def reset(self):
+        ''' Remove all ensemble members. '''
+        self.members = []
+
+    def start(self, fname='', n=0):
+        ''' ENSEMBLE filename,n: Start n instances of a scenario as ensemble.
+            Without arguments, show the state of the current ensemble. '''
+        if not fname:
+            if not self.members:
+                return True, 'ENSEMBLE filename,n\nNo ensemble running'
+            return True, '\n'.join(
+                f'{res["member"]:4d}: {res["ntraf"]} aircraft, '
+                f'{res["nconf"]} conflicts, {res["nlos"]} LoS' for res in self.results())
+        if n < 1:
+            return False, 'ENSEMBLE: number of members should be at least 1'
+
+        bs.sim.reset()
+        try:
+            scen = list(simstack.readscn(fname))
+        except FileNotFoundError:
+            return False, f'ENSEMBLE: File not found: {fname}'
+        scentime, scencmd = zip(*scen) if scen else ((), ())
+        self.members = [Member(fname, scentime, scencmd) for _ in range(n)]
+        bs.sim.op()
+        return True, f'ENSEMBLE: Started {n} instances of {fname}'
+
+    @contextmanager
+    def member(self, k):
+        ''' Make member k (counting from 1) the context of stack processing
+            and aircraft creation. '''
+        mem = self.members[k - 1]
+        saved = Stack.cmdstack, Stack.scenqueue, Stack.scenname
+        Stack.cmdstack, Stack.scenqueue, Stack.scenname = \
+            mem.cmdstack, mem.scenqueue, mem.scenname
+        bs.traf.curmember = k
+        try:
+            yield mem
+        finally:
+            mem.cmdstack, mem.scenqueue = Stack.cmdstack, Stack.scenqueue
+            Stack.cmdstack, Stack.scenqueue, Stack.scenname = saved
+            bs.traf.curmember = 0
+
+    def stack(self, k, *cmdlines):
+        ''' Stack commands in the context of member k, e.g., conditional and
+            waypoint commands that are triggered during the traffic update.
+            Outside ensemble members (k=0) they are stacked as usual. '''
+        if not 0 < k <= len(self.members):
+            stackbase.stack(*cmdlines)
+            return
+        cmdstack = self.members[k - 1].cmdstack
+        for cmdline in cmdlines:
+            cmdline = cmdline.strip()
+            if cmdline:
+                cmdstack.extend((line, None) for line in cmdline.split(';'))
+
+    def process(self):
+        ''' Process the scenario commands and stack of each member. '''
+        members = self.members
+        for k, mem in enumerate(members, 1):
+            if not (mem.cmdstack or mem.scenqueue.nexttime() <= bs.sim.simt):
+                continue
+            with self.member(k):
+                simstack.process()
+            # Stop when a member command reset the simulation
+            if self.members is not members:
+                break
+
+    def results(self):
+        ''' Return the number of aircraft, conflicts and losses of
+            separation of each member. '''
+        counts = np.bincount(bs.traf.member, minlength=len(self.members) + 1)
+
+        def permember(pairs):
+            ''' Count callsign pairs per member from the callsign suffix. '''
+            nmember = np.zeros(len(self.members) + 1, dtype=int)
+            for pair in pairs:
+                suffix = next(iter(pair)).rpartition('_')[2]
+                if suffix.isdigit() and int(suffix) <= len(self.members):
+                    nmember[int(suffix)] += 1
+            return nmember
+
+        nconf = permember(bs.traf.cd.confpairs_all)
+        nlos = permember(bs.traf.cd.lospairs_all)
+        return [dict(member=k, ntraf=int(counts[k]), nconf=int(nconf[k]), nlos=int(nlos[k]))
+                for k in range(1, len(self.members) + 1)]
@@ -0,0 +1,177 @@
+''' Step-locked control of detached simulations, for reinforcement learning.
+
+    Env runs a detached simulation node in the calling process. Each call to
+    step applies the given actions directly to the autopilot, bypassing the
+    stack parser, advances the simulation by a number of timesteps without
+    waiting for the wall clock, and returns the resulting observation:
+
+        env = Env()
+        obs = env.reset('my-scenario.scn', seed=1)
+        while not obs['done']:
+            obs = env.step(10, actions=dict(hdg=policy(obs)))
+
+    Observations are dicts with the simulation time, a done flag, the
+    callsigns, and the observed traffic arrays. The arrays are the traffic
+    arrays themselves, not copies: they are updated by the next step.
+
+    Actions are dicts with per-aircraft arrays of commanded values in SI
+    units (hdg [deg], alt [m], spd [CAS m/s or Mach], vs [m/s]). NaN values
+    leave the corresponding aircraft untouched.
+
+    VecEnv runs several Envs in worker processes, which step in parallel.
+'''
+from operator import attrgetter
+import multiprocessing as mp
+import numpy as np
+
+import bluesky as bs
+from bluesky.stack import simstack
+
+
+# Default observed traffic arrays
+OBSFIELDS = ('lat', 'lon', 'alt', 'hdg', 'trk', 'tas', 'gs', 'vs')
+
+# Autopilot commands that can be used as actions
+ACTIONS = dict(
+    hdg=lambda idx, values: bs.traf.ap.selhdgcmd(idx, values),
+    alt=lambda idx, values: bs.traf.ap.selaltcmd(idx, values),
+    spd=lambda idx, values: bs.traf.ap.selspdcmd(idx, values),
+    vs=lambda idx, values: bs.traf.ap.selvspdcmd(idx, values)
+)
+
+
+class Env:
+    ''' In-process, step-locked detached simulation. '''
+    def __init__(self, configfile=None, fields=OBSFIELDS):
+        if bs.sim is None:
+            bs.init(mode='sim', detached=True, configfile=configfile)
+        self.fields = list(fields)
+        self.getters = [attrgetter(field) for field in self.fields]
+
+    @property
+    def done(self):
+        ''' True when the simulation was held or stopped. '''
+        return bs.sim.state != bs.OP
+
+    def reset(self, scenario='', seed=None):
+        ''' Reset the simulation, load scenario, and return the first
+            observation. '''
+        if seed is not None:
+            bs.sim.setseed(seed)
+        if scenario:
+            success, msg = simstack.ic(scenario)
+            if not success:
+                raise FileNotFoundError(msg)
+        else:
+            bs.sim.reset()
+        bs.sim.op()
+        bs.sim.fastforward()
+        # Process the scenario commands at t=0
+        simstack.process()
+        return self.observe()
+
+    def act(self, actions):
+        ''' Apply actions to the autopilot of the aircraft. '''
+        for name, values in actions.items():
+            cmd = ACTIONS.get(name)
+            if cmd is None:
+                raise ValueError(f'Unknown action {name}, choose from {", ".join(ACTIONS)}')
+            values = np.asarray(values, dtype=float)
+            idx = np.flatnonzero(~np.isnan(values))
+            if len(idx):
+                cmd(idx, values[idx])
+
+    def step(self, n=1, actions=None):
+        ''' Apply actions, advance the simulation n timesteps, and return
+            the observation. '''
+        if actions:
+            self.act(actions)
+        for _ in range(n):
+            if bs.sim.state != bs.OP:
+                break
+            # Scenario commands like OP reset fast-time
+            if not bs.sim.ffmode:
+                bs.sim.fastforward()
+            bs.sim.step()
+        # Process wall-clock timers
+        bs.net.step()
+        return self.observe()
+
+    def observe(self):
+        ''' Return the current observation. '''
+        obs = dict(simt=bs.sim.simt, done=self.done, id=list(bs.traf.id))
+        obs.update(zip(self.fields, (get(bs.traf) for get in self.getters)))
+        return obs
+
+
+def worker(pipe, configfile, fields):
+    ''' Serve the calls of a VecEnv to an Env in this process. '''
+    env = Env(configfile, fields)
+    while True:
+        try:
+            method, args = pipe.recv()
+        except EOFError:
+            break
+        if method == 'close':
+            break
+        try:
+            pipe.send((True, getattr(env, method)(*args)))
+        except Exception as e:
+            pipe.send((False, e))
+    pipe.close()
+
+
+class VecEnv:
+    ''' Several Envs, each in its own worker process, which are reset and
+        stepped in parallel. '''
+    def __init__(self, nenvs, configfile=None, fields=OBSFIELDS):
+        ctx = mp.get_context('fork' if 'fork' in mp.get_all_start_methods() else 'spawn')
+        self.pipes = []
+        self.procs = []
+        for _ in range(nenvs):
+            pipe, child = ctx.Pipe()
+            proc = ctx.Process(target=worker, args=(child, configfile, fields), daemon=True)
+            proc.start()
+            child.close()
+            self.pipes.append(pipe)
+            self.procs.append(proc)
+
+    def __len__(self):
+        return len(self.pipes)
+
+    def call(self, method, argslist):
+        ''' Call method of all Envs, with one tuple of arguments per Env. '''
+        for pipe, args in zip(self.pipes, argslist):
+            pipe.send((method, args))
+        results = [pipe.recv() for pipe in self.pipes]
+        for success, result in results:
+            if not success:
+                raise result
+        return [result for _, result in results]
+
+    def reset(self, scenarios='', seeds=None):
+        ''' Reset all Envs, with one scenario for all, or one per Env, and
+            optionally one seed per Env. Returns the first observations. '''
+        if isinstance(scenarios, str):
+            scenarios = [scenarios] * len(self)
+        seeds = seeds or [None] * len(self)
+        return self.call('reset', zip(scenarios, seeds))
+
+    def step(self, n=1, actions=None):
+        ''' Step all Envs n timesteps, with one dict of actions per Env.
+            Returns the observations. '''
+        actions = actions or [None] * len(self)
+        return self.call('step', ((n, act) for act in actions))
+
+    def close(self):
+        ''' Stop the worker processes. '''
+        for pipe in self.pipes:
+            try:
+                pipe.send(('close', ()))
+            except (BrokenPipeError, OSError):
+                pass
+            pipe.close()
+        for proc in self.procs:
+            proc.join()
+        self.pipes = []
+        self.procs = []
@@ -7,18 +7,22 @@ import bluesky as bs
 from bluesky import stack
 from bluesky.tools import areafilter
 from bluesky.core.walltime import Timer
+from bluesky.core import profiler
+from bluesky.network.deltacodec import DeltaEncoder
 
-class ScreenIO:
-    """Class within sim task which sends/receives data to/from GUI task"""
 
-    # =========================================================================
-    # Settings
-    # =========================================================================
-    # Update rate of simulation info messages [Hz]
-    siminfo_rate = 1
+# Register settings defaults
+bs.settings.set_variable_defaults(siminfo_rate=1.0, acdata_rate=5.0,
+                                  routedata_rate=1.0, trails_rate=1.0,
+                                  acdata_adaptive=False, acdata_budget=0.1,
+                                  acdata_minrate=0.5)
+bs.settings.set_variable_defaults(acdata_delta=False, acdata_keyframe=25,
+                                  acdata_viewfilter=False, acdata_viewmargin=0.25,
+                                  acdata_viewmax=2000)
 
-    # Update rate of aircraft update messages [Hz]
-    acupdate_rate = 5
+
+class ScreenIO:
+    """Class within sim task which sends/receives data to/from GUI task"""
 
     # =========================================================================
     # Functions
@@ -44,16 +48,35 @@ class ScreenIO:
         self.samplecount = 0
         self.prevcount   = 0
 
-        # Output event timers
-        self.slow_timer = Timer()
-        self.slow_timer.timeout.connect(self.send_siminfo)
-        self.slow_timer.timeout.connect(self.send_route_data)
-        self.slow_timer.timeout.connect(self.send_trails)
-        self.slow_timer.start(int(1000 / self.siminfo_rate))
-
-        self.fast_timer = Timer()
-        self.fast_timer.timeout.connect(self.send_aircraft_data)
-        self.fast_timer.start(int(1000 / self.acupdate_rate))
+        # Output stream timers, and their update rates [Hz]
+        self.timers = dict(SIMINFO=Timer(), ROUTEDATA=Timer(), TRAILS=Timer(), ACDATA=Timer())
+        self.timers['SIMINFO'].timeout.connect(self.send_siminfo)
+        self.timers['ROUTEDATA'].timeout.connect(self.send_route_data)
+        self.timers['TRAILS'].timeout.connect(self.send_trails)
+        self.timers['ACDATA'].timeout.connect(self.update_aircraft_data)
+        self.rates = dict()
+        for stream in self.timers:
+            self.setrate(stream, getattr(bs.settings, stream.lower() + '_rate'))
+
+        # Adaptive aircraft data rate: the rate is lowered when sending takes
+        # more than a budget fraction of the wall time, and raised up to the
+        # set rate when it takes less than half of the budget.
+        self.acadaptive = bs.settings.acdata_adaptive
+        self.acbudget = bs.settings.acdata_budget
+        self.acminrate = bs.settings.acdata_minrate
+        self.acmaxrate = self.rates['ACDATA']
+        self.acprevtime = None
+
+        # Delta/keyframe encoding of the aircraft data, with an encoder per stream
+        self.acdelta = bs.settings.acdata_delta
+        self.keyframe_interval = bs.settings.acdata_keyframe
+        self.acencoders = dict()
+
+        # Per-client aircraft data streams, filtered on the view of each client,
+        # with a margin relative to the view size, and a maximum number of aircraft
+        self.viewfilter = bs.settings.acdata_viewfilter
+        self.viewmargin = bs.settings.acdata_viewmargin
+        self.viewmax = bs.settings.acdata_viewmax
 
     def step(self):
         if bs.sim.state == bs.OP:
@@ -74,9 +97,83 @@ class ScreenIO:
         self.def_pan = (0.0, 0.0)
         self.def_zoom = 1.0
 
+        self.acencoders.clear()
+
         # Communicate reset to gui
         bs.net.send_event(b'RESET', b'ALL', target=[b'*'])
 
+    def setacdelta(self, flag=None, keyframe_interval=None):
+        ''' Switch delta/keyframe encoding of the aircraft data stream. '''
+        if flag is None:
+            return True, 'ACDELTA [ON/OFF],[keyframe interval]\nDelta encoding is ' + \
+                (f'ON, with a keyframe every {self.keyframe_interval} frames'
+                 if self.acdelta else 'OFF')
+        if keyframe_interval is not None and keyframe_interval < 1:
+            return False, 'ACDELTA: keyframe interval should be at least one frame'
+        self.acdelta = flag
+        self.keyframe_interval = keyframe_interval or self.keyframe_interval
+        self.acencoders.clear()
+        return True
+
+    def setviewfilter(self, flag=None, margin=None, maxac=None):
+        ''' Switch per-client filtering of the aircraft data on the view of
+            each client. '''
+        if flag is None:
+            return True, 'ACVIEW [ON/OFF],[margin],[max aircraft]\nView filtering is ' + \
+                (f'ON, with a margin of {self.viewmargin} view sizes, and at most '
+                 f'{self.viewmax or "unlimited"} aircraft per client'
+                 if self.viewfilter else 'OFF')
+        if margin is not None and margin < 0.0 or maxac is not None and maxac < 0:
+            return False, 'ACVIEW: margin and maximum number of aircraft should be positive'
+        self.viewfilter = flag
+        self.viewmargin = self.viewmargin if margin is None else margin
+        self.viewmax = self.viewmax if maxac is None else maxac
+        self.acencoders.clear()
+        return True
+
+    def setrate(self, stream, rate):
+        ''' Set the update rate [Hz] of stream. Zero stops the stream. '''
+        self.rates[stream] = rate
+        if rate > 0.0:
+            self.timers[stream].start(1000.0 / rate)
+        else:
+            self.timers[stream].stop()
+
+    def setstreamrate(self, stream='', rate=''):
+        ''' Set the update rate [Hz] of a stream to the gui, or switch the
+            adaptive aircraft data rate on. '''
+        stream, rate = stream.upper(), rate.upper()
+        if stream not in self.timers:
+            msg = '\n'.join(f'{name}: {rate:.2f} Hz' for name, rate in self.rates.items())
+            adaptive = f'ON, between {self.acminrate} and {self.acmaxrate} Hz' \
+                if self.acadaptive else 'OFF'
+            return not stream, f'STREAMRATE [{"/".join(self.timers)}],[rate/AUTO]\n' + \
+                msg + f'\nAdaptive ACDATA rate: {adaptive}'
+        if not rate:
+            return True, f'{stream} rate is {self.rates[stream]:.2f} Hz'
+        if rate == 'AUTO':
+            if stream != 'ACDATA':
+                return False, 'STREAMRATE: only the ACDATA rate can be adaptive'
+            self.acadaptive = True
+            self.acprevtime = None
+            return True
+        try:
+            rate = float(rate)
+        except ValueError:
+            return False, f'STREAMRATE: {rate} is not a valid rate'
+        if rate < 0.0:
+            return False, 'STREAMRATE: rate should be positive'
+        if stream == 'ACDATA':
+            self.acadaptive = False
+            self.acmaxrate = rate
+        self.setrate(stream, rate)
+        return True
+
+    def forcekeyframe(self):
+        ''' Send all aircraft data with the next aircraft data frame. '''
+        for encoder in self.acencoders.values():
+            encoder.forcekey()
+
     def echo(self, text='', flags=0):
         bs.net.send_event(b'ECHO', dict(text=text, flags=flags))
 
@@ -86,9 +183,9 @@ class ScreenIO:
     def getviewctr(self):
         return self.client_pan.get(stack.sender()) or self.def_pan
 
-    def getviewbounds(self):
+    def getviewbounds(self, client=None):
         # Get appropriate lat/lon/zoom/aspect ratio
-        sender   = stack.sender()
+        sender   = client or stack.sender()
         lat, lon = self.client_pan.get(sender) or self.def_pan
         zoom     = self.client_zoom.get(sender) or self.def_zoom
         ar       = self.client_ar.get(sender) or 1.0
@@ -119,7 +216,7 @@ class ScreenIO:
             groupmask = bs.traf.groups.groups[name]
             data['groupid'] = groupmask
             self.custgrclr[groupmask] = (r, g, b)
-        elif name in bs.traf.id:
+        elif name in bs.traf.ididx:
             data['acid'] = name
             self.custacclr[name] = (r, g, b)
         elif areafilter.hasArea(name):
@@ -225,8 +322,12 @@ class ScreenIO:
         t  = time.time()
         dt = np.maximum(t - self.prevtime, 0.00001)  # avoid divide by 0
         speed = (self.samplecount - self.prevcount) / dt * bs.sim.simdt
-        bs.net.send_stream(b'SIMINFO', (speed, bs.sim.simdt, bs.sim.simt,
-            str(bs.sim.utc.replace(microsecond=0)), bs.traf.ntraf, bs.sim.state, stack.get_scenname()))
+        siminfo = (speed, bs.sim.simdt, bs.sim.simt,
+            str(bs.sim.utc.replace(microsecond=0)), bs.traf.ntraf, bs.sim.state, stack.get_scenname())
+        # When profiling, also send the profiler statistics of the last interval
+        if profiler.active:
+            siminfo += profiler.rollingstats()
+        bs.net.send_stream(b'SIMINFO', siminfo)
         self.prevtime  = t
         self.prevcount = self.samplecount
 
@@ -243,6 +344,27 @@ class ScreenIO:
             bs.traf.trails.clearnew()
             bs.net.send_stream(b'TRAILS', data)
 
+    def update_aircraft_data(self):
+        ''' Send aircraft data, and adapt the aircraft data rate. '''
+        if not self.acadaptive:
+            self.send_aircraft_data()
+            return
+
+        t0 = time.perf_counter()
+        self.send_aircraft_data()
+        tsend = time.perf_counter() - t0
+        if self.acprevtime is not None:
+            # Fraction of the wall time spent on sending aircraft data
+            load = tsend / max(t0 - self.acprevtime + tsend, 1e-9)
+            rate = self.rates['ACDATA']
+            if load > self.acbudget:
+                rate = max(self.acminrate, 0.7 * rate)
+            elif load < 0.5 * self.acbudget:
+                rate = min(self.acmaxrate, 1.25 * rate)
+            if rate != self.rates['ACDATA']:
+                self.setrate('ACDATA', rate)
+        self.acprevtime = t0 + tsend
+
     def send_aircraft_data(self):
         data = dict()
         data['simt']       = bs.sim.simt
@@ -257,9 +379,9 @@ class ScreenIO:
         data['inconf'] = bs.traf.cd.inconf
         data['tcpamax'] = bs.traf.cd.tcpamax
         data['rpz'] = bs.traf.cd.rpz
-        data['nconf_cur'] = len(bs.traf.cd.confpairs_unique)
+        data['nconf_cur'] = len(bs.traf.cd.confidx_unique[0])
         data['nconf_tot'] = len(bs.traf.cd.confpairs_all)
-        data['nlos_cur'] = len(bs.traf.cd.lospairs_unique)
+        data['nlos_cur'] = len(bs.traf.cd.losidx_unique[0])
         data['nlos_tot'] = len(bs.traf.cd.lospairs_all)
         data['trk']        = bs.traf.trk
         data['vs']         = bs.traf.vs
@@ -273,7 +395,44 @@ class ScreenIO:
         data['asastas']  = bs.traf.cr.tas
         data['asastrk']  = bs.traf.cr.trk
 
-        bs.net.send_stream(b'ACDATA', data)
+        if not self.viewfilter:
+            self.send_acstream(b'ACDATA', data)
+            return
+
+        # Send each client only the aircraft in and around its view
+        for client in bs.sim.clients:
+            self.send_acstream(b'ACDATA' + client, self.filterview(data, client)
+                               if client in self.client_pan else data)
+
+    def filterview(self, data, client):
+        ''' Return the aircraft data of the aircraft in the view of client. '''
+        lat0, lat1, lon0, lon1 = self.getviewbounds(client)
+        dlat = (lat1 - lat0) * self.viewmargin
+        dlon = (lon1 - lon0) * self.viewmargin
+        lat0, lat1, lon0, lon1 = lat0 - dlat, lat1 + dlat, lon0 - dlon, lon1 + dlon
+        lat, lon = bs.traf.lat, bs.traf.lon
+        # Longitudes relative to the west edge wrap around at the dateline
+        idx = np.flatnonzero((lat >= lat0) & (lat <= lat1) &
+                             ((lon - lon0) % 360.0 <= lon1 - lon0))
+        if self.viewmax and len(idx) > self.viewmax:
+            idx = thinview(idx, lat[idx], lon[idx], bs.traf.cd.inconf[idx],
+                           (lat0, lat1, lon0, lon1), self.viewmax)
+
+        ntraf = len(data['id'])
+        fdata = {name: value[idx] if isinstance(value, np.ndarray) and
+                 value.ndim == 1 and len(value) == ntraf else value
+                 for name, value in data.items()}
+        fdata['id'] = [data['id'][i] for i in idx]
+        return fdata
+
+    def send_acstream(self, topic, data):
+        ''' Send aircraft data, delta-encoded when enabled. '''
+        if self.acdelta:
+            encoder = self.acencoders.get(topic)
+            if encoder is None:
+                encoder = self.acencoders[topic] = DeltaEncoder(self.keyframe_interval)
+            data = encoder.encode(data)
+        bs.net.send_stream(topic, data)
 
     def send_route_data(self):
         ''' Send route data to client(s) '''
@@ -293,6 +452,30 @@ class ScreenIO:
         elif self.route_all:
             _sendrte(b'*', self.route_all)
         
+def thinview(idx, lat, lon, inconf, bounds, nmax):
+    ''' Level-of-detail thinning of the aircraft in a view: returns at most
+        nmax of the aircraft indices idx, evenly spread over a grid of cells
+        covering the view. Aircraft in conflict are kept first. '''
+    lat0, lat1, lon0, lon1 = bounds
+    ngrid = max(1, int(np.sqrt(nmax)))
+    row = np.clip(((lat - lat0) / (lat1 - lat0) * ngrid).astype(int), 0, ngrid - 1)
+    col = np.clip(((lon - lon0) % 360.0 / (lon1 - lon0) * ngrid).astype(int), 0, ngrid - 1)
+    cell = row * ngrid + col
+
+    # Rank of each aircraft within its cell, in order of index, so that
+    # selection is stable between frames
+    order = np.argsort(cell, kind='stable')
+    scell = cell[order]
+    start = np.flatnonzero(np.r_[True, scell[1:] != scell[:-1]])
+    rank = np.empty(len(idx), dtype=int)
+    rank[order] = np.arange(len(idx)) - np.repeat(start, np.diff(np.r_[start, len(idx)]))
+    rank[np.asarray(inconf, dtype=bool)] = -1
+
+    # Take aircraft round-robin over the cells, with the cells in a scrambled
+    # order, so that an incomplete round is still spread over the view
+    return np.sort(idx[np.lexsort(((cell * 7919) % (ngrid * ngrid), rank))[:nmax]])
+
+
 def _sendrte(sender, acid):
     ''' Local shorthand function to send route. '''
     data               = dict()
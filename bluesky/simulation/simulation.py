@@ -7,9 +7,12 @@ from random import seed
 # Local imports
 import bluesky as bs
 import bluesky.core as core
-from bluesky.core import plugin, simtime
+from bluesky.core import plugin, simtime, profiler
 from bluesky.stack import simstack, recorder
+from bluesky.stack.stackbase import Stack
 from bluesky.tools import datalog, areafilter, plotter
+from bluesky.network import sharedstate
+from bluesky.simulation.ensemble import Ensemble
 
 # Minimum sleep interval
 MINSLEEP = 1e-3
@@ -53,6 +56,9 @@ class Simulation:
         # Keep track of known clients
         self.clients = set()
 
+        # Scenario instances of an ensemble run
+        self.ensemble = Ensemble()
+
     def step(self):
         ''' Perform a simulation timestep. '''
         # Simulation starts as soon as there is traffic, or pending commands
@@ -60,7 +66,7 @@ class Simulation:
             if self.syst < 0.0:
                 self.syst = time.time()
 
-            if bs.traf.ntraf > 0 or len(bs.stack.get_scendata()[0]) > 0:
+            if bs.traf.ntraf > 0 or Stack.scenqueue or Stack.scenfile:
                 self.op()
                 if self.benchdt > 0.0:
                     self.fastforward(self.benchdt)
@@ -73,13 +79,18 @@ class Simulation:
             time.sleep(remainder)
 
         # Always update stack
-        simstack.process()
+        with profiler.section('stack'):
+            simstack.process()
+            self.ensemble.process()
 
         if self.state == bs.OP:
             # Plot/log the current timestep, and call preupdate functions
-            plotter.update()
-            datalog.update()
-            simtime.preupdate()
+            with profiler.section('plotter'):
+                plotter.update()
+            with profiler.section('datalog'):
+                datalog.update()
+            with profiler.section('preupdate'):
+                simtime.preupdate()
 
             # Determine interval towards next timestep
             if remainder < 0.0 and self.rtmode:
@@ -95,8 +106,12 @@ class Simulation:
             self.utc += datetime.timedelta(seconds=self.simdt)
 
             # Update traffic and other update functions for the next timestep
-            bs.traf.update()
-            simtime.update()
+            with profiler.section('traffic'):
+                bs.traf.update()
+            with profiler.section('update'):
+                simtime.update()
+            with profiler.section('sharedstate'):
+                sharedstate.update()
 
         # Always update syst
         self.syst += self.simdt / self.dtmult
@@ -162,6 +177,7 @@ class Simulation:
         bs.navdb.reset()
         bs.traf.reset()
         simstack.reset()
+        self.ensemble.reset()
         datalog.reset()
         areafilter.reset()
         bs.scr.reset()
@@ -231,6 +247,8 @@ class Simulation:
                 custgrclr=bs.scr.custgrclr, settings=bs.settings._settings_hierarchy,
                 plugins=list(plugin.Plugin.plugins.keys()))
             bs.net.send_event(b'SIMSTATE', simstate, target=sender_rte)
+            # Make sure the new client receives the data of all aircraft
+            bs.scr.forcekeyframe()
         else:
             # This is either an unknown event or a gui event.
             event_processed = bs.scr.event(eventname, eventdata, sender_rte)
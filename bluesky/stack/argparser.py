@@ -19,6 +19,14 @@ re_getarg = re.compile(
     r'\s*[\'"]?((?<=[\'"])[^\'"]*|(?<![\'"])[^\s,]*)[\'"]?\s*,?\s*(.*)')
 # re_getarg = re.compile(r'[\'"]?((?<=[\'"])[^\'"]+|(?<![\'"])[^\s,]+)[\'"]?\s*,?\s*')
 
+# Regular expression to split a command string into its separate arguments,
+# where each match includes the separator that follows the argument
+re_splitargs = re.compile(
+    r'\s*[\'"]?((?<=[\'"])[^\'"]*|(?<![\'"])[^\s,]*)[\'"]?\s*,?\s*')
+
+# Maximum number of cached results per argument parser
+CACHESIZE = 1024
+
 # Stack reference data namespace
 refdata = SimpleNamespace(lat=None, lon=None, alt=None, acidx=-1, hdg=None, cas=None)
 
@@ -123,13 +131,28 @@ class Parser:
     # Output size of this parser
     size = 1
 
-    def __init__(self, parsefun=None):
+    def __init__(self, parsefun=None, pure=False):
         self.parsefun = parsefun
+        # Parsers of which the result only depends on the argument text
+        # cache their parsed values by argument text
+        self.cache = dict() if pure else None
 
     def parse(self, argstring):
         ''' Parse the next argument from argstring. '''
         curarg, argstring = re_getarg.match(argstring).groups()
-        return self.parsefun(curarg), argstring
+        return self.parsevalue(curarg), argstring
+
+    def parsevalue(self, curarg):
+        ''' Parse the text of a single argument, using the cache if any. '''
+        if self.cache is None:
+            return self.parsefun(curarg)
+        if curarg in self.cache:
+            return self.cache[curarg]
+        value = self.parsefun(curarg)
+        if len(self.cache) >= CACHESIZE:
+            self.cache.clear()
+        self.cache[curarg] = value
+        return value
 
 
 class StringArg(Parser):
@@ -250,6 +273,19 @@ class PosArg(Parser):
         return posobj.lat, posobj.lon, argstring
 
 
+class HdgArg(Parser):
+    ''' Argument parser for headings. Magnetic headings depend on the
+        reference position, and are therefore not cached. '''
+    def __init__(self):
+        super().__init__(txt2hdg, pure=True)
+
+    def parse(self, argstring):
+        curarg, argstring = re_getarg.match(argstring).groups()
+        if 'M' in curarg.upper():
+            return txt2hdg(curarg, refdata.lat, refdata.lon), argstring
+        return self.parsevalue(curarg), argstring
+
+
 class PandirArg(Parser):
     ''' Parse pan direction commands. '''
     def parse(self, argstring):
@@ -277,13 +313,13 @@ class ColorArg(Parser):
 
 argparsers = {
     '*': None,
-    'txt': Parser(str.upper),
-    'word': Parser(str),
+    'txt': Parser(str.upper, pure=True),
+    'word': Parser(str, pure=True),
     'string': StringArg(),
-    'float': Parser(float),
-    'int': Parser(int),
-    'onoff': Parser(txt2bool),
-    'bool': Parser(txt2bool),
+    'float': Parser(float, pure=True),
+    'int': Parser(int, pure=True),
+    'onoff': Parser(txt2bool, pure=True),
+    'bool': Parser(txt2bool, pure=True),
     'acid': AcidArg(),
     'wpinroute': WpinrouteArg(),
     'wpt': WptArg(),
@@ -291,9 +327,9 @@ argparsers = {
     'lat': PosArg(),
     'lon': None,
     'pandir': PandirArg(),
-    'spd': Parser(txt2spd),
-    'vspd': Parser(txt2vs),
-    'alt': Parser(txt2alt),
-    'hdg': Parser(lambda txt: txt2hdg(txt, refdata.lat, refdata.lon)),
-    'time': Parser(txt2tim),
+    'spd': Parser(txt2spd, pure=True),
+    'vspd': Parser(txt2vs, pure=True),
+    'alt': Parser(txt2alt, pure=True),
+    'hdg': HdgArg(),
+    'time': Parser(txt2tim, pure=True),
     'color': ColorArg()}
@@ -4,9 +4,10 @@ import os
 
 import bluesky as bs
 from bluesky import settings
-from bluesky.core import select_implementation, simtime, varexplorer as ve
+from bluesky.core import select_implementation, simtime, profiler, varexplorer as ve
 from bluesky.tools import geo, aero, areafilter, plotter
 from bluesky.tools.calculator import calculator
+from bluesky.network import sharedstate
 from bluesky.stack.cmdparser import append_commands
 
 
@@ -50,6 +51,18 @@ def initbasecmds():
     #
     # --------------------------------------------------------------------
     cmddict = {
+        "ACDELTA": [
+            "ACDELTA [ON/OFF],[keyframe interval]",
+            "[onoff,int]",
+            lambda *args: bs.scr.setacdelta(*args),
+            "Switch delta/keyframe encoding of the aircraft data stream to the gui",
+        ],
+        "ACVIEW": [
+            "ACVIEW [ON/OFF],[margin],[max aircraft]",
+            "[onoff,float,int]",
+            lambda *args: bs.scr.setviewfilter(*args),
+            "Only send each gui client the aircraft in and around its view",
+        ],
         "ADDNODES": [
             "ADDNODES number",
             "int",
@@ -154,6 +167,12 @@ def initbasecmds():
             bs.traf.cre,
             "Create an aircraft",
         ],
+        "CREBULK": [
+            "CREBULK acid,type,lat,lon,hdg,alt,spd,[acid,type,lat,lon,hdg,alt,spd,...]",
+            "string",
+            bs.traf.crebulk,
+            "Create multiple aircraft at once",
+        ],
         "CRECMD": [
             "CRECMD cmdline (to be added after a/c id )",
             "string",
@@ -221,6 +240,12 @@ def initbasecmds():
             bs.scr.echo,
             "Show a text in command window for user to read",
         ],
+        "ENSEMBLE": [
+            "ENSEMBLE [filename,n]",
+            "[word,int]",
+            bs.sim.ensemble.start,
+            "Run n instances of a scenario vectorised in this simulation",
+        ],
         "FF": [
             "FF [timeinsec]",
             "[time]",
@@ -354,6 +379,12 @@ def initbasecmds():
             bs.traf.poscommand,
             "Get info on aircraft, airport or waypoint",
         ],
+        "PROFILE": [
+            "PROFILE [ON/OFF/DUMP],[filename]",
+            "[txt,string]",
+            profiler.profile,
+            "Profile the wall time spent in the subsystems of the simulation",
+        ],
         "QUIT": ["QUIT", "", bs.sim.stop, "Quit program/Stop simulation"],
         "REALTIME": [
             "REALTIME [ON/OFF]",
@@ -367,12 +398,24 @@ def initbasecmds():
             bs.sim.setseed,
             "Set seed for all functions using a randomizer (e.g.mcre,noise)",
         ],
+        "SHMEXPORT": [
+            "SHMEXPORT [ON/OFF],[name]",
+            "[onoff,word]",
+            sharedstate.export,
+            "Export the traffic state to shared memory after every simulation step",
+        ],
         "SSD": [
             "SSD ALL/CONFLICTS/OFF or SSD acid0, acid1, ...",
             "txt,[...]",
             lambda *args: bs.scr.feature("SSD", args),
             "Show state-space diagram (=conflict prevention display/predictive ASAS)",
         ],
+        "STREAMRATE": [
+            "STREAMRATE [stream],[rate/AUTO]",
+            "[txt,word]",
+            lambda *args: bs.scr.setstreamrate(*args),
+            "Set the update rate [Hz] of a stream to the gui, or use an adaptive aircraft data rate",
+        ],
         "SWRAD": [
             "SWRAD GEO/GRID/APT/VOR/WPT/LABEL/ADSBCOVERAGE/TRAIL/POLY [dt]/[value]",
             "txt,[float]",
@@ -80,6 +80,11 @@ class Command:
             args.extend(result[:-1])
 
         # Call callback function with parsed parameters
+        return self.call(*args)
+
+    def call(self, *args):
+        ''' Call this command with already parsed (typed) arguments,
+            bypassing the argument parsers. '''
         ret = self.callback(*args)
         # Always return a tuple with a success value and a message string
         if ret is None:
@@ -262,6 +267,14 @@ def remove_commands(commands):
         Command.cmddict.pop(cmd)
 
 
+def call(cmd, *args):
+    """ Call stack command cmd (a command name or Command object) with
+        already parsed (typed) arguments, bypassing the argument parsers.
+        Returns a tuple with a success value and a message string. """
+    cmdobj = cmd if isinstance(cmd, Command) else Command.cmddict[cmd.upper()]
+    return cmdobj.call(*args)
+
+
 def get_commands():
     """ Return the stack dictionary of commands. """
     return Command.cmddict
@@ -0,0 +1,110 @@
+''' Compiled (binary) scenario files.
+
+    A compiled scenario (.scnb) contains the commands of a scenario file,
+    sorted by time, in a form that can be memory-mapped and read lazily:
+
+    - a header with the number of commands, strings, and string bytes
+    - the command times, sorted (float64)
+    - per command the index of its command string (uint32)
+    - per line of the original file the index of its command (uint32)
+    - the byte offsets of the unique command strings (uint64)
+    - the utf-8 encoded unique command strings
+
+    Loading a compiled scenario therefore takes constant time and memory,
+    regardless of the length of the scenario. Commands are only decoded
+    when they are due. Iterating over a compiled scenario gives the
+    commands in the order of the original file, so that the SCEN blocks
+    of batch files stay together.
+'''
+import numpy as np
+
+
+MAGIC = b'BSSCNB'
+VERSION = 2
+HEADER = np.dtype([('magic', 'S8'), ('version', 'u8'), ('ncmd', 'u8'),
+                   ('nstr', 'u8'), ('nbytes', 'u8')])
+
+
+def padded(nbytes):
+    ''' Round nbytes up to a multiple of eight, to keep arrays aligned. '''
+    return (nbytes + 7) // 8 * 8
+
+
+def write(fname, entries):
+    ''' Write (time, command) entries to compiled scenario file fname. '''
+    times = []
+    cmdidx = []
+    strings = dict()
+    for cmdtime, cmd in entries:
+        times.append(cmdtime)
+        cmdidx.append(strings.setdefault(cmd, len(strings)))
+
+    # Sort by time, keeping the file order of simultaneous commands
+    times = np.array(times, dtype=np.float64)
+    order = np.argsort(times, kind='stable')
+    times = times[order]
+    cmdidx = np.array(cmdidx, dtype=np.uint32)[order]
+    fileorder = np.argsort(order).astype(np.uint32)
+    blobs = [cmd.encode() for cmd in strings]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(blob) for blob in blobs])
+
+    header = np.array((MAGIC, VERSION, len(times), len(blobs), offsets[-1]), dtype=HEADER)
+    with open(fname, 'wb') as f:
+        for arr in (header, times, cmdidx, fileorder, offsets):
+            data = arr.tobytes()
+            f.write(data + bytes(padded(len(data)) - len(data)))
+        f.write(b''.join(blobs))
+    return len(times)
+
+
+class CompiledScenario:
+    ''' Memory-mapped compiled scenario, from which the commands are taken
+        in order of time. '''
+    def __init__(self, fname):
+        buf = np.memmap(fname, dtype=np.uint8, mode='r')
+        header = buf[:HEADER.itemsize].view(HEADER)[0]
+        if header['magic'] != MAGIC or header['version'] != VERSION:
+            raise ValueError(f'{fname} is not a compiled BlueSky scenario')
+        ncmd, nstr = int(header['ncmd']), int(header['nstr'])
+
+        offset = HEADER.itemsize
+        self.times = buf[offset:offset + 8 * ncmd].view(np.float64)
+        offset += padded(8 * ncmd)
+        self.cmdidx = buf[offset:offset + 4 * ncmd].view(np.uint32)
+        offset += padded(4 * ncmd)
+        self.fileorder = buf[offset:offset + 4 * ncmd].view(np.uint32)
+        offset += padded(4 * ncmd)
+        self.offsets = buf[offset:offset + 8 * (nstr + 1)].view(np.uint64)
+        offset += padded(8 * (nstr + 1))
+        self.blob = buf[offset:offset + int(header['nbytes'])]
+        # Index of the next command
+        self.pos = 0
+
+    def __len__(self):
+        ''' The number of remaining commands. '''
+        return len(self.times) - self.pos
+
+    def __iter__(self):
+        ''' Iterate over all (time, command) entries in the order of the
+            original scenario file. '''
+        for i in self.fileorder:
+            yield float(self.times[i]), self.command(i)
+
+    def command(self, i):
+        ''' Decode command i. '''
+        istr = self.cmdidx[i]
+        return bytes(self.blob[self.offsets[istr]:self.offsets[istr + 1]]).decode()
+
+    def nexttime(self):
+        ''' The time of the next command, or infinity when there is none. '''
+        return float(self.times[self.pos]) if self.pos < len(self.times) else np.inf
+
+    def pop(self, simt):
+        ''' Return the times and commands that are due at simt, and
+            advance past them. '''
+        end = max(self.pos, int(np.searchsorted(self.times, simt, side='right')))
+        times = self.times[self.pos:end].tolist()
+        cmds = [self.command(i) for i in range(self.pos, end)]
+        self.pos = end
+        return times, cmds
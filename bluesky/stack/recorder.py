@@ -27,6 +27,7 @@ defexcl = [
     "RESET",
     "MCRE",
     "CRE",
+    "CREBULK",
     "TRAFGEN",
     "LISTRTE",
 ]  # Commands to be excluded, default
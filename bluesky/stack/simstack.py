@@ -6,7 +6,8 @@ import bluesky as bs
 from bluesky.stack.stackbase import Stack, stack, checkscen, forward
 from bluesky.stack.cmdparser import Command, command
 from bluesky.stack.basecmds import initbasecmds
-from bluesky.stack import recorder
+from bluesky.stack import recorder, compiledscn
+from bluesky.stack.compiledscn import CompiledScenario
 from bluesky.stack import argparser, ArgumentError
 from bluesky import settings
 
@@ -65,7 +66,7 @@ def process(from_pcall=None):
         cmdobj = Command.cmddict.get(cmdu)
 
         # If no function is found for 'cmd', check if cmd is actually an aircraft id
-        if not cmdobj and cmdu in bs.traf.id:
+        if not cmdobj and bs.traf.id2idx(cmdu) >= 0 and cmdu not in ('#', '*'):
             cmd, argstring = argparser.getnextarg(argstring)
             argstring = cmdu + " " + argstring
             # When no other args are parsed, command is POS
@@ -135,8 +136,8 @@ def process(from_pcall=None):
         Stack.clear()
 
 
-def readscn(fname):
-    ''' Read a scenario file. '''
+def scenpath(fname):
+    ''' Return the full path of a scenario file. '''
     # Split the incoming filename into a path + filename and an extension
     base, ext = os.path.splitext(fname.replace("\\", "/"))
     if not os.path.isabs(base):
@@ -144,7 +145,15 @@ def readscn(fname):
     ext = ext or ".scn"
 
     # The entire filename, possibly with added path and extension
-    fname_full = os.path.normpath(base + ext)
+    return os.path.normpath(base + ext)
+
+
+def readscn(fname):
+    ''' Read a scenario file. '''
+    fname_full = scenpath(fname)
+    if fname_full.endswith('.scnb'):
+        yield from CompiledScenario(fname_full)
+        return
 
     with open(fname_full, "r") as fscen:
         prevline = ''
@@ -192,7 +201,7 @@ def pcall(fname, *pcall_arglst):
     """
     # Check for a/c id as first argument (use case: procedure files)
     # CALL KL204 myproc should have effect as if: CALL myproc KL204
-    if pcall_arglst and fname in bs.traf.id:
+    if pcall_arglst and bs.traf.id2idx(fname) >= 0:
         acid = fname
         fname = pcall_arglst[0]
         pcall_arglst = [acid] + list(pcall_arglst[1:])
@@ -208,10 +217,6 @@ def pcall(fname, *pcall_arglst):
     t_offset = bs.sim.simt if absrel == "REL" else 0.0
 
     # Read the scenario file
-    # readscn(fname, pcall_arglst, t_offset)
-    insidx = 0
-    instime = bs.sim.simt
-
     try:
         # All commands with timestamps at the current sim time or earlier should be called immediately
         callnow = []
@@ -227,18 +232,8 @@ def pcall(fname, *pcall_arglst):
 
             if cmdtime <= bs.sim.simt:
                 callnow.append((cmdline, None))
-            elif not Stack.scentime or cmdtime >= Stack.scentime[-1]:
-                Stack.scentime.append(cmdtime)
-                Stack.scencmd.append(cmdline)
             else:
-                if cmdtime > instime:
-                    insidx, instime = next(
-                        ((j, t) for j, t in enumerate(Stack.scentime) if t >= cmdtime),
-                        (len(Stack.scentime), Stack.scentime[-1]),
-                    )
-                Stack.scentime.insert(insidx, cmdtime)
-                Stack.scencmd.insert(insidx, cmdline)
-                insidx += 1
+                Stack.scenqueue.push(cmdtime, cmdline)
 
         # execute any commands that are already due
         if callnow:
@@ -269,9 +264,12 @@ def ic(filename : 'string' = ''):
     # Reset sim and open new scenario file
     if filename:
         try:
-            for (cmdtime, cmd) in readscn(filename):
-                Stack.scentime.append(cmdtime)
-                Stack.scencmd.append(cmd)
+            if scenpath(filename).endswith('.scnb'):
+                # Compiled scenarios are read lazily during the simulation
+                Stack.scenfile = CompiledScenario(scenpath(filename))
+            else:
+                for (cmdtime, cmd) in readscn(filename):
+                    Stack.scenqueue.push(cmdtime, cmd)
             Stack.scenname, _ = os.path.splitext(os.path.basename(filename))
 
             # Remember this filename in IC.scn in scenario folder
@@ -299,6 +297,24 @@ def scenario(name: 'string'):
     return True, "Starting scenario " + name
 
 
+@command(name='COMPILESCN')
+def compilescn(filename: 'string'):
+    """ COMPILESCN: Compile a scenario file to a binary .scnb file, which
+        loads instantly and is read lazily during the simulation.
+
+        Arguments:
+        - filename: The filename of the scenario file to compile """
+    fname_full = scenpath(filename)
+    fname_out = os.path.splitext(fname_full)[0] + '.scnb'
+    if fname_full == fname_out:
+        return False, f'COMPILESCN: {filename} is already compiled'
+    try:
+        ncmd = compiledscn.write(fname_out, readscn(filename))
+    except FileNotFoundError:
+        return False, f'COMPILESCN: File not found: {filename}'
+    return True, f'COMPILESCN: Wrote {ncmd} commands to {fname_out}'
+
+
 @command
 def schedule(time: 'time', cmdline: 'string'):
     """ SCHEDULE a stack command at a specific simulation time.
@@ -306,10 +322,7 @@ def schedule(time: 'time', cmdline: 'string'):
         Arguments:
         - time: the time at which the command should be executed
         - cmdline: the command line to be executed """
-    # Get index of first scentime greater than 'time' as insert position
-    idx = next((i for i, t in enumerate(Stack.scentime) if t > time), len(Stack.scentime))
-    Stack.scentime.insert(idx, time)
-    Stack.scencmd.insert(idx, cmdline)
+    Stack.scenqueue.push(time, cmdline)
     return True
 
 
@@ -320,11 +333,7 @@ def delay(time: 'time', cmdline: 'string'):
         Arguments:
         - time: the time with which the command should be delayed
         - cmdline: the command line to be executed after the delay """
-    # Get index of first scentime greater than 'time' as insert position
-    time += bs.sim.simt
-    idx = next((i for i, t in enumerate(Stack.scentime) if t > time), len(Stack.scentime))
-    Stack.scentime.insert(idx, time)
-    Stack.scencmd.insert(idx, cmdline)
+    Stack.scenqueue.push(bs.sim.simt + time, cmdline)
     return True
 
 
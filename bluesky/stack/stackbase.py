@@ -1,7 +1,46 @@
 ''' BlueSky Stack base data and functions. '''
+from heapq import heapify, heappop, heappush, merge
+from math import inf
+from operator import itemgetter
 import bluesky as bs
 
 
+class CommandQueue:
+    ''' Priority queue of timed stack commands. Commands with equal times
+        are taken in the order in which they were added. '''
+    def __init__(self, times=(), cmds=()):
+        self.heap = [(t, i, cmd) for i, (t, cmd) in enumerate(zip(times, cmds))]
+        heapify(self.heap)
+        # Number of added commands, to order commands with equal times
+        self.count = len(self.heap)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __iter__(self):
+        ''' Iterate over the queued (time, command) entries in order of
+            time, without removing them. '''
+        for t, _, cmd in sorted(self.heap):
+            yield t, cmd
+
+    def push(self, time, cmd):
+        ''' Add command cmd at time. '''
+        heappush(self.heap, (time, self.count, cmd))
+        self.count += 1
+
+    def nexttime(self):
+        ''' The time of the next command, or infinity when there is none. '''
+        return self.heap[0][0] if self.heap else inf
+
+    def pop(self, simt):
+        ''' Remove and return the (time, command) entries due at simt. '''
+        due = []
+        while self.heap and self.heap[0][0] <= simt:
+            t, _, cmd = heappop(self.heap)
+            due.append((t, cmd))
+        return due
+
+
 class Stack:
     ''' Stack static-only namespace. '''
 
@@ -11,8 +50,8 @@ class Stack:
 
     # Scenario details
     scenname = ""  # Currently used scenario name (for reading)
-    scentime = []  # Times of the commands from the read scenario file
-    scencmd = []  # Commands from the scenario file
+    scenqueue = CommandQueue()  # Timed commands from scenario files, SCHEDULE and DELAY
+    scenfile = None  # Compiled scenario file from which commands are read lazily
 
     # Current command details
     sender_rte = None  # bs net route to sender
@@ -22,8 +61,8 @@ class Stack:
         ''' Reset stack variables. '''
         cls.cmdstack = []
         cls.scenname = ""
-        cls.scentime = []
-        cls.scencmd = []
+        cls.scenqueue = CommandQueue()
+        cls.scenfile = None
         cls.sender_rte = None
 
     @classmethod
@@ -40,14 +79,12 @@ class Stack:
 
 def checkscen():
     """ Check if commands from the scenario buffer need to be stacked. """
-    if Stack.scencmd:
-        # Find index of first timestamp exceeding bs.sim.simt
-        idx = next((i for i, t in enumerate(
-            Stack.scentime) if t > bs.sim.simt), None)
-        # Stack all commands before that time, and remove from scenario
-        stack(*Stack.scencmd[:idx])
-        del Stack.scencmd[:idx]
-        del Stack.scentime[:idx]
+    due = Stack.scenqueue.pop(bs.sim.simt)
+    if Stack.scenfile is not None and Stack.scenfile.nexttime() <= bs.sim.simt:
+        # Merge the due commands of a compiled scenario file in order of time
+        filedue = zip(*Stack.scenfile.pop(bs.sim.simt))
+        due = merge(due, filedue, key=itemgetter(0)) if due else filedue
+    stack(*(cmd for _, cmd in due))
 
 
 def stack(*cmdlines, sender_id=None):
@@ -92,11 +129,14 @@ def get_scenname():
 
 
 def get_scendata():
-    """ Return the scenario data that was loaded from a scenario file. """
-    return Stack.scentime, Stack.scencmd
+    """ Return the times and commands of the timed scenario data. """
+    scen = list(Stack.scenqueue)
+    if not scen:
+        return [], []
+    scentime, scencmd = zip(*scen)
+    return list(scentime), list(scencmd)
 
 
 def set_scendata(newtime, newcmd):
     """ Set the scenario data. This is used by the batch logic. """
-    Stack.scentime = newtime
-    Stack.scencmd = newcmd
+    Stack.scenqueue = CommandQueue(newtime, newcmd)
@@ -0,0 +1,79 @@
+"""
+Tests the wall-time profiler of the simulation subsystems.
+"""
+import pytest
+from bluesky.core import profiler
+
+
+@pytest.fixture(autouse=True)
+def cleanprofiler():
+    """
+    Leave the profiler switched off with empty statistics.
+    """
+    yield
+    profiler.stop()
+    profiler.stats.clear()
+
+
+def test_profiler_sections():
+    """
+    Nested sections are stored under their path in the hierarchy.
+    """
+    profiler.start()
+    for _ in range(3):
+        with profiler.section('step'):
+            with profiler.section('traffic'):
+                with profiler.section('cd'):
+                    pass
+            with profiler.section('stack'):
+                pass
+    assert sorted(profiler.stats) == ['step', 'step/stack', 'step/traffic', 'step/traffic/cd']
+    assert all(stat.ncalls == 3 for stat in profiler.stats.values())
+    assert profiler.stats['step'].total >= profiler.stats['step/traffic'].total
+    assert profiler._stack == [('', None)]
+
+
+def test_profiler_inactive():
+    """
+    Sections are not measured when profiling is off, also when profiling
+    is switched on or off inside a section.
+    """
+    with profiler.section('step'):
+        profiler.start()
+        with profiler.section('traffic'):
+            pass
+    assert list(profiler.stats) == ['traffic']
+    with profiler.section('step'):
+        profiler.stop()
+    assert list(profiler.stats) == ['traffic']
+    assert profiler._stack == [('', None)]
+
+
+def test_profiler_rollingstats():
+    """
+    Rolling statistics only cover the interval since the previous call.
+    """
+    profiler.start()
+    with profiler.section('step'):
+        pass
+    interval, dt = profiler.rollingstats()
+    assert interval['step'][0] == 1 and dt > 0.0
+    assert profiler.rollingstats()[0] == dict()
+    assert profiler.stats['step'].ncalls == 1
+
+
+def test_profiler_command(tmp_path, monkeypatch):
+    """
+    PROFILE ON/OFF/DUMP, with the dump written as CSV to the log path.
+    """
+    monkeypatch.setattr(profiler.settings, 'log_path', str(tmp_path), raising=False)
+    assert not profiler.profile('DUMP')[0]
+    assert profiler.profile('ON')[0] and profiler.active
+    with profiler.section('step'):
+        pass
+    assert profiler.profile('OFF')[0] and not profiler.active
+    success, msg = profiler.profile('DUMP', 'prof.csv')
+    assert success
+    lines = (tmp_path / 'prof.csv').read_text().splitlines()
+    assert len(lines) == 2 and lines[1].startswith('step,1,')
+    assert not profiler.profile('FOO')[0]
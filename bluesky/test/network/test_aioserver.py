@@ -0,0 +1,122 @@
+"""
+Tests the stream buffer and counters of the asyncio server.
+"""
+import asyncio
+import gc
+import pytest
+import numpy as np
+import zmq
+from bluesky.network.aioserver import StreamBuffer, Meter, Context
+from bluesky.network.deltacodec import DeltaEncoder, DeltaDecoder
+from bluesky.network.npcodec import packframes, unpackframes
+
+NODE1 = b'\x00NOD1'
+NODE2 = b'\x00NOD2'
+
+
+def test_coalesce():
+    """
+    Only the latest message of a coalesced topic is kept, in the position
+    of the first buffered message of that topic.
+    """
+    buf = StreamBuffer(coalesce=[b'ACDATA'])
+    buf.put(b'ACDATA' + NODE1, ['ac0'])
+    buf.put(b'TRAILS' + NODE1, ['tr0'])
+    buf.put(b'ACDATA' + NODE1, ['ac1'])
+    buf.put(b'ACDATA' + NODE2, ['ac2'])
+    buf.put(b'TRAILS' + NODE1, ['tr1'])
+    assert len(buf) == 4
+    assert buf.ncoalesced == 1
+    assert [buf.pop() for _ in range(len(buf))] == [['ac1'], ['tr0'], ['ac2'], ['tr1']]
+
+    # After forwarding, a new message of the topic is buffered again
+    buf.put(b'ACDATA' + NODE1, ['ac3'])
+    assert buf.pop() == ['ac3']
+
+
+def test_coalesce_delta():
+    """
+    Delta frames are never coalesced, keyframes only replace buffered
+    messages that no delta frame follows. Every forwarded frame decodes.
+    """
+    buf = StreamBuffer(coalesce=[b'ACDATA'])
+    encoder, decoder = DeltaEncoder(keyframe_interval=3), DeltaDecoder()
+    topic = b'ACDATA' + NODE1
+    frames = [dict(id=['KL1', 'KL2'], lat=np.array([52.0, 52.1]) + 0.01 * i)
+              for i in range(8)]
+    for data in frames:
+        buf.put(topic, [topic] + packframes(encoder.encode(data)))
+    assert buf.ncoalesced == 0 and len(buf) == 8
+
+    # Without a delta frame after it, a keyframe is replaced by the next one
+    encoder, topic = DeltaEncoder(), b'ACDATA' + NODE2
+    buf.put(topic, [topic] + packframes(encoder.encode(frames[0])))
+    encoder.forcekey()
+    buf.put(topic, [topic] + packframes(encoder.encode(frames[1])))
+    assert buf.ncoalesced == 1 and len(buf) == 9
+
+    decoded = [decoder.decode(unpackframes(buf.pop()[1:])) for _ in range(8)]
+    assert all(data is not None for data in decoded)
+    assert decoded[-1]['lat'] == pytest.approx(frames[-1]['lat'], abs=1e-5)
+
+
+def test_drop_oldest():
+    """
+    Above the maximum size the oldest messages are dropped.
+    """
+    buf = StreamBuffer(coalesce=[b'ACDATA'], maxsize=3)
+    buf.put(b'ACDATA' + NODE1, ['ac0'])
+    for i in range(4):
+        buf.put(b'PLOT' + NODE1, [i])
+    assert buf.ndropped == 2
+    assert [buf.pop() for _ in range(len(buf))] == [[1], [2], [3]]
+    # The dropped coalesced message doesn't linger in the buffer
+    assert not buf.latest
+
+
+def test_depth_per_node():
+    """
+    The number of buffered messages is tracked per node.
+    """
+    buf = StreamBuffer()
+    buf.put(b'PLOT' + NODE1, [0])
+    buf.put(b'PLOT' + NODE2, [1])
+    buf.put(b'TRAILS' + NODE2, [2])
+    assert buf.depth == {NODE1: 1, NODE2: 2}
+    buf.pop()
+    assert buf.depth == {NODE1: 0, NODE2: 2}
+
+
+def test_meter():
+    """
+    Message and byte rates are computed over the last update interval.
+    """
+    meter = Meter()
+    meter.count([b'ab', b'cde'])
+    meter.count([b'f'])
+    meter.update(0.5)
+    assert meter.stats() == dict(msgs=2, bytes=6, msgrate=4.0, byterate=12.0)
+    meter.count([b'ghij'])
+    meter.update(2.0)
+    assert meter.msgrate == pytest.approx(0.5)
+    assert meter.byterate == pytest.approx(2.0)
+
+
+def test_send_error(capsys):
+    """
+    Errors of sends that are not awaited are reported.
+    """
+    async def send():
+        ctx = Context()
+        sock = ctx.socket(zmq.ROUTER)
+        sock.setsockopt(zmq.ROUTER_MANDATORY, 1)
+        sock.send_multipart([b'NOBODY', b'EVENT'])
+        await asyncio.sleep(0.01)
+        sock.close(linger=0)
+        ctx.term()
+
+    asyncio.run(send())
+    gc.collect()
+    err = capsys.readouterr()
+    assert 'failed to send message' in err.out
+    assert 'never retrieved' not in err.err
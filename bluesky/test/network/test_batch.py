@@ -0,0 +1,75 @@
+"""
+Tests the scheduling and result collection of batch scenarios.
+"""
+import pytest
+from bluesky import settings
+from bluesky.network.batch import BatchScheduler, estimate_cost, split_scenarios
+
+
+BATCH = [(0.0, 'SCEN short'),
+         (0.0, 'CRE KL1 B744 52 4 90 FL200 250'),
+         (0.0, 'SCHEDULE 00:01:00 HOLD'),
+         (0.0, 'SCEN long'),
+         (0.0, 'MCRE 10'),
+         (600.0, 'HOLD'),
+         (0.0, 'SCEN medium'),
+         (0.0, 'CRE KL2,B744,52,4,90,FL200,250'),
+         (0.0, 'CRE KL3,B744,52,4,90,FL200,250'),
+         (10.0, 'DELAY 00:05:00 HOLD')]
+
+
+@pytest.fixture
+def batch(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, 'log_path', str(tmp_path), raising=False)
+    monkeypatch.setattr(settings, 'batch_retries', 1, raising=False)
+    monkeypatch.setattr(settings, 'batch_timeout', 0.0, raising=False)
+    sched = BatchScheduler()
+    assert sched.load(*zip(*BATCH)) == 3
+    return sched
+
+
+def test_estimate_cost():
+    """
+    Cost is the scenario duration times the number of created aircraft.
+    """
+    scens = {scen['name']: scen for scen in split_scenarios(*zip(*BATCH))}
+    assert estimate_cost(scens['short']) == 61.0
+    assert estimate_cost(scens['long']) == 601.0 * 10
+    assert estimate_cost(scens['medium']) == 311.0 * 2
+
+
+def test_longest_first(batch):
+    """
+    Scenarios are handed out in order of decreasing cost.
+    """
+    names = [batch.start(worker)['name'] for worker in (b'w1', b'w2', b'w3')]
+    assert names == ['long', 'medium', 'short']
+    assert not batch.queue and batch
+
+
+def test_retry_and_results(batch, tmp_path):
+    """
+    Failed scenarios are retried once, after which the failure is recorded.
+    """
+    batch.start(b'w1')
+    assert batch.finish(b'w1', 'crashed')
+    assert batch.queue[0]['name'] == 'long'
+    assert not batch.results
+
+    batch.start(b'w2')
+    batch.finish(b'w2', 'timeout')
+    assert not batch.finish(b'w2')
+    while batch.queue:
+        batch.start(b'w3')
+        batch.finish(b'w3')
+    assert not batch
+
+    status = {res['scenario']: (res['status'], res['attempts']) for res in batch.results}
+    assert status == dict(long=('timeout', 2), medium=('ok', 1), short=('ok', 1))
+    assert batch.summary() == '2 of 3 scenarios completed successfully'
+
+    fname = batch.write_summary('summary.csv')
+    with open(fname) as f:
+        lines = [line for line in f if not line.startswith('#')]
+    # Results are written in the order of the batch file
+    assert [line.split(',')[0] for line in lines] == ['short', 'long', 'medium']
@@ -0,0 +1,98 @@
+"""
+Tests the delta/keyframe encoding of the aircraft data stream.
+"""
+import msgpack
+import numpy as np
+import pytest
+from bluesky.network.npcodec import encode_ndarray, decode_ndarray
+from bluesky.network.deltacodec import DeltaEncoder, DeltaDecoder, QUANTA
+
+
+def transfer(data):
+    """
+    Pack and unpack data as it is sent over the network.
+    """
+    packed = msgpack.packb(data, default=encode_ndarray, use_bin_type=True)
+    return msgpack.unpackb(packed, object_hook=decode_ndarray, raw=False)
+
+
+def make_data(ids, rng, simt=0.0):
+    """
+    Aircraft data dict with random float fields, an exact field and scalars.
+    """
+    n = len(ids)
+    return dict(simt=simt, id=list(ids), nconf_cur=3,
+                lat=rng.uniform(-80, 80, n), lon=rng.uniform(-180, 180, n),
+                alt=rng.uniform(0, 12000, n), inconf=rng.random(n) < 0.5)
+
+
+def check_decoded(ref, dec):
+    """
+    Decoded data is within half a quantum of the encoded data.
+    """
+    assert dec['id'] == ref['id']
+    assert dec['simt'] == ref['simt'] and dec['nconf_cur'] == ref['nconf_cur']
+    for name in ('lat', 'lon', 'alt'):
+        np.testing.assert_allclose(dec[name], ref[name], rtol=0, atol=0.5001 * QUANTA[name])
+    np.testing.assert_array_equal(dec['inconf'], ref['inconf'])
+
+
+def test_deltacodec_stream():
+    """
+    A stream with small changes, created and deleted aircraft, and a
+    non-finite value is decoded correctly, with deltas smaller than keyframes.
+    """
+    rng = np.random.default_rng(1)
+    enc, dec = DeltaEncoder(keyframe_interval=10), DeltaDecoder()
+    ids = [f'AC{i}' for i in range(100)]
+    data = make_data(ids, rng)
+    sizes = []
+    for frame in range(25):
+        if frame == 5:
+            ids = ids[10:] + ['NEW1', 'NEW2']
+        keep = [data['id'].index(acid) if acid in data['id'] else None for acid in ids]
+        new = make_data(ids, rng, simt=frame)
+        for name in ('lat', 'lon', 'alt', 'inconf'):
+            old = np.array([data[name][i] if i is not None else new[name][j]
+                            for j, i in enumerate(keep)])
+            # Only a few aircraft change each frame
+            changed = rng.random(len(ids)) < 0.1
+            new[name] = np.where(changed, new[name], old)
+        if frame == 7:
+            new['alt'][3] = np.nan
+        data = new
+        msg = transfer(enc.encode(dict(data)))
+        sizes.append((msg['delta']['key'], len(msgpack.packb(msg, default=encode_ndarray))))
+        check_decoded(data, dec.decode(msg))
+
+    keysize = max(size for key, size in sizes if key)
+    assert [key for key, _ in sizes].count(True) == 3
+    assert all(size < keysize / 2 for key, size in sizes if not key)
+
+
+def test_deltacodec_missed_frame():
+    """
+    After a missed frame the decoder waits for the next keyframe.
+    """
+    rng = np.random.default_rng(2)
+    enc, dec = DeltaEncoder(keyframe_interval=5), DeltaDecoder()
+    ids = ['A', 'B', 'C']
+    assert dec.decode(transfer(enc.encode(make_data(ids, rng)))) is not None
+    enc.encode(make_data(ids, rng))
+    assert dec.decode(transfer(enc.encode(make_data(ids, rng)))) is None
+    enc.forcekey()
+    data = make_data(ids, rng)
+    check_decoded(data, dec.decode(transfer(enc.encode(dict(data)))))
+
+
+@pytest.mark.parametrize('ntraf', [0, 70000])
+def test_deltacodec_size(ntraf):
+    """
+    Empty traffic, and index arrays for more than 65536 aircraft.
+    """
+    rng = np.random.default_rng(3)
+    enc, dec = DeltaEncoder(), DeltaDecoder()
+    ids = [f'AC{i}' for i in range(ntraf)]
+    for _ in range(2):
+        data = make_data(ids, rng)
+        check_decoded(data, dec.decode(transfer(enc.encode(dict(data)))))
@@ -0,0 +1,61 @@
+"""
+Tests the multipart message packing of numpy arrays.
+"""
+import numpy as np
+import zmq
+from bluesky.network.npcodec import packframes, unpackframes, FRAME_MINSIZE
+
+
+def make_data():
+    """
+    Stream data with large and small arrays, and other values.
+    """
+    rng = np.random.default_rng(1)
+    return dict(simt=12.5, id=['A', 'B'], lat=rng.uniform(-90, 90, 10000),
+                inconf=rng.random(10000) < 0.5, small=np.arange(3),
+                nested=dict(grid=rng.random((100, 20)).T))
+
+
+def check_data(ref, res):
+    """
+    Unpacked data is equal to the packed data.
+    """
+    assert res['simt'] == ref['simt'] and res['id'] == ref['id']
+    for name in ('lat', 'inconf', 'small'):
+        assert res[name].dtype == ref[name].dtype
+        np.testing.assert_array_equal(res[name], ref[name])
+    np.testing.assert_array_equal(res['nested']['grid'], ref['nested']['grid'])
+
+
+def test_packframes():
+    """
+    Only large arrays get their own frame, and arrays are copied when packed.
+    """
+    data = make_data()
+    frames = packframes(data)
+    assert len(frames) == 4
+    assert all(frame.nbytes >= FRAME_MINSIZE for frame in frames[1:])
+    ref = make_data()
+    data['lat'][:] = 0.0
+    check_data(ref, unpackframes(frames))
+
+
+def test_packframes_zmq():
+    """
+    Send and receive without copying over a zmq socket pair.
+    """
+    ctx = zmq.Context.instance()
+    sout, sin = ctx.socket(zmq.PAIR), ctx.socket(zmq.PAIR)
+    sout.bind('inproc://test_npcodec')
+    sin.connect('inproc://test_npcodec')
+    try:
+        data = make_data()
+        sout.send_multipart([b'ACDATA'] + packframes(data), copy=False)
+        msg = sin.recv_multipart(copy=False)
+        assert msg[0].bytes == b'ACDATA'
+        res = unpackframes(msg[1:])
+        check_data(data, res)
+        assert res['lat'].base is not None
+    finally:
+        sout.close()
+        sin.close()
@@ -0,0 +1,114 @@
+"""
+Tests the export of traffic arrays to shared memory.
+"""
+import os
+import numpy as np
+import pytest
+from bluesky.network.sharedstate import StateWriter, StateReader
+
+
+FIELDS = ['lat', 'lon', 'alt']
+
+
+@pytest.fixture
+def writer():
+    shm = StateWriter(f'bstest_{os.getpid()}', FIELDS, nslots=3, capacity=2)
+    yield shm
+    shm.close()
+
+
+def frame(n, offset=0.0):
+    ''' Callsigns and arrays of n aircraft. '''
+    ids = [f'KL{i}' for i in range(n)]
+    return ids, [np.arange(n) + offset + i for i in range(len(FIELDS))]
+
+
+def test_read_before_write(writer):
+    reader = StateReader(writer.name)
+    assert reader.fields == FIELDS
+    assert reader.read() is None
+    reader.close()
+
+
+def test_roundtrip(writer):
+    reader = StateReader(writer.name)
+    for k in range(5):
+        ids, arrays = frame(2, k)
+        writer.write(k * 0.05, ids, arrays)
+        state = reader.read()
+        assert state['frame'] == k
+        assert state['simt'] == k * 0.05
+        assert state['id'] == ids
+        for name, arr in zip(FIELDS, arrays):
+            np.testing.assert_array_equal(state[name], arr)
+    reader.close()
+
+
+def test_grow(writer):
+    reader = StateReader(writer.name)
+    writer.write(0.0, *frame(2))
+    assert reader.read()['id'] == ['KL0', 'KL1']
+    ids, arrays = frame(5)
+    writer.write(1.0, ids, arrays)
+    assert writer.capacity >= 5
+    state = reader.read()
+    assert state['id'] == ids
+    np.testing.assert_array_equal(state['alt'], arrays[2])
+    reader.close()
+
+
+def test_ids_change(writer):
+    reader = StateReader(writer.name)
+    writer.write(0.0, ['KL1', 'KL2'], frame(2)[1])
+    assert reader.read()['id'] == ['KL1', 'KL2']
+    writer.write(0.1, ['KL2', 'KL3'], frame(2)[1])
+    writer.write(0.2, ['KL2', 'KL3'], frame(2)[1])
+    assert reader.read()['id'] == ['KL2', 'KL3']
+    writer.write(0.3, ['KL3'], frame(1)[1])
+    assert reader.read()['id'] == ['KL3']
+    reader.close()
+
+
+def test_latest_zero_copy(writer):
+    reader = StateReader(writer.name)
+    writer.write(0.0, *frame(2))
+    fnum, hdr, data, ids = reader.latest()
+    assert reader.valid(fnum)
+    np.testing.assert_array_equal(data[1], [1.0, 2.0])
+    # Overwriting all slots of the ring invalidates the views
+    for k in range(3):
+        writer.write(k + 1.0, *frame(2, k))
+    assert not reader.valid(fnum)
+    reader.close()
+
+
+def test_wait(writer):
+    reader = StateReader(writer.name)
+    assert reader.wait(timeout=0.01) is None
+    writer.write(0.0, *frame(1))
+    assert reader.wait(timeout=0.01)['frame'] == 0
+    assert reader.wait(timeout=0.01) is None
+    reader.close()
+
+
+def test_locked_slot(writer):
+    reader = StateReader(writer.name)
+    writer.write(0.0, *frame(2))
+    writer.write(0.1, *frame(2, 1.0))
+    # A writer that stopped halfway a slot leaves its sequence number odd:
+    # the reader falls back to the previous frame
+    writer.slots[1][0]['seq'] += 1
+    assert reader.read(timeout=0.01)['frame'] == 0
+    # Without a complete slot to fall back to, the read times out
+    writer.slots[0][0]['seq'] += 1
+    assert reader.read(timeout=0.01) is None
+    reader.close()
+
+
+def test_long_ids(writer):
+    reader = StateReader(writer.name)
+    ids = ['KL1', 'A' * 40]
+    writer.write(0.0, ids, frame(2)[1])
+    assert writer.idsize >= 40
+    assert reader.read()['id'] == ids
+    reader.close()
@@ -0,0 +1,40 @@
+"""
+Tests the actions and observations of the step-locked simulation API.
+"""
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import bluesky as bs
+from bluesky.simulation.env import Env
+
+
+@pytest.fixture
+def env(monkeypatch):
+    calls = []
+    ap = SimpleNamespace(
+        selhdgcmd=lambda idx, hdg: calls.append(('hdg', list(idx), list(hdg))),
+        selaltcmd=lambda idx, alt: calls.append(('alt', list(idx), list(alt))))
+    traf = SimpleNamespace(id=['KL1', 'KL2', 'KL3'], ap=ap,
+                           lat=np.array([52.0, 52.1, 52.2]), alt=np.zeros(3))
+    monkeypatch.setattr(bs, 'traf', traf)
+    monkeypatch.setattr(bs, 'sim', SimpleNamespace(simt=1.5, state=bs.OP))
+    env = Env(fields=['lat', 'alt'])
+    env.calls = calls
+    return env
+
+
+def test_act(env):
+    env.act(dict(hdg=[90.0, np.nan, 180.0], alt=[np.nan] * 3))
+    assert env.calls == [('hdg', [0, 2], [90.0, 180.0])]
+    with pytest.raises(ValueError):
+        env.act(dict(foo=[1.0, 2.0, 3.0]))
+
+
+def test_observe(env):
+    obs = env.observe()
+    assert obs['simt'] == 1.5 and not obs['done']
+    assert obs['id'] == ['KL1', 'KL2', 'KL3']
+    # Observed arrays are views of the traffic arrays
+    assert obs['lat'] is bs.traf.lat
+    bs.sim.state = bs.HOLD
+    assert env.observe()['done']
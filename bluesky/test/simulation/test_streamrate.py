@@ -0,0 +1,55 @@
+"""
+Tests the configurable and adaptive stream rates of ScreenIO.
+"""
+import time
+import pytest
+from bluesky.core.walltime import Timer
+from bluesky.simulation.screenio import ScreenIO
+
+
+@pytest.fixture
+def scr():
+    """
+    ScreenIO with its stream timers, which are stopped afterwards.
+    """
+    scr = ScreenIO()
+    yield scr
+    for timer in scr.timers.values():
+        timer.stop()
+
+
+def test_streamrate_command(scr):
+    """
+    Rates are set per stream, and zero stops a stream.
+    """
+    assert scr.setstreamrate()[0]
+    assert not scr.setstreamrate('FOO')[0]
+    assert scr.setstreamrate('trails', '0.5') is True
+    assert scr.rates['TRAILS'] == 0.5 and scr.timers['TRAILS'].interval == 2.0
+    assert scr.setstreamrate('SIMINFO', '0') is True
+    assert not scr.timers['SIMINFO'].isactive()
+    assert Timer.timers.count(scr.timers['TRAILS']) == 1
+    assert not scr.setstreamrate('SIMINFO', 'AUTO')[0]
+    assert not scr.setstreamrate('ACDATA', '-1')[0]
+
+
+def test_streamrate_adaptive(scr):
+    """
+    The aircraft data rate is lowered when sending takes more than the
+    budget, and raised up to the set rate when sending is cheap.
+    """
+    scr.setstreamrate('ACDATA', '4')
+    scr.setstreamrate('ACDATA', 'AUTO')
+    scr.send_aircraft_data = lambda: time.sleep(0.02)
+    scr.acprevtime = time.perf_counter() - 0.03
+    scr.update_aircraft_data()
+    assert scr.rates['ACDATA'] == pytest.approx(2.8)
+
+    scr.send_aircraft_data = lambda: None
+    for _ in range(5):
+        scr.acprevtime = time.perf_counter() - 1.0
+        scr.update_aircraft_data()
+    assert scr.rates['ACDATA'] == 4.0 and scr.acadaptive
+
+    scr.setstreamrate('ACDATA', '2')
+    assert not scr.acadaptive and scr.rates['ACDATA'] == 2.0
@@ -0,0 +1,113 @@
+"""
+Tests the per-client view filtering of the aircraft data stream.
+"""
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import bluesky as bs
+from bluesky.simulation.screenio import ScreenIO, thinview
+
+
+@pytest.fixture
+def scr(monkeypatch):
+    """
+    ScreenIO without timers, with random traffic over a 20x20 degree area,
+    and one client looking at a 2x2 degree area around 52N, 4E.
+    """
+    rng = np.random.default_rng(1)
+    n = 20000
+    traf = SimpleNamespace(lat=rng.uniform(42, 62, n), lon=rng.uniform(-6, 14, n),
+                           cd=SimpleNamespace(inconf=rng.random(n) < 0.01))
+    traf.id = [f'AC{i}' for i in range(n)]
+    monkeypatch.setattr(bs, 'traf', traf)
+    scr = object.__new__(ScreenIO)
+    scr.def_pan, scr.def_zoom = (0.0, 0.0), 1.0
+    scr.client_pan = {b'C1': (52.0, 4.0)}
+    scr.client_zoom = {b'C1': 1.0}
+    scr.client_ar = {b'C1': 1.0}
+    scr.viewmargin, scr.viewmax = 0.0, 0
+    return scr
+
+
+def make_data(traf):
+    """
+    Aircraft data dict as sent by ScreenIO.
+    """
+    return dict(simt=1.0, id=traf.id, lat=traf.lat, lon=traf.lon,
+                inconf=traf.cd.inconf, nconf_cur=5)
+
+
+def test_filterview(scr):
+    """
+    Only aircraft in the view, extended with the margin, are sent.
+    """
+    traf = bs.traf
+    lat0, lat1, lon0, lon1 = scr.getviewbounds(b'C1')
+    data = scr.filterview(make_data(traf), b'C1')
+    inview = (traf.lat >= lat0) & (traf.lat <= lat1) & (traf.lon >= lon0) & (traf.lon <= lon1)
+    assert data['id'] == [acid for acid, ok in zip(traf.id, inview) if ok]
+    np.testing.assert_array_equal(data['lat'], traf.lat[inview])
+    assert data['nconf_cur'] == 5 and data['simt'] == 1.0
+
+    scr.viewmargin = 0.5
+    assert len(scr.filterview(make_data(traf), b'C1')['id']) > np.count_nonzero(inview)
+
+
+def test_thinview(scr):
+    """
+    Thinning keeps at most nmax aircraft, all aircraft in conflict, spread
+    over the view, and the same aircraft when traffic doesn't change.
+    """
+    traf = bs.traf
+    bounds = (42.0, 62.0, -6.0, 14.0)
+    idx = np.arange(len(traf.id))
+    sel = thinview(idx, traf.lat, traf.lon, traf.cd.inconf, bounds, 1000)
+    assert len(sel) == 1000 and np.all(np.diff(sel) > 0)
+    assert np.all(np.isin(np.flatnonzero(traf.cd.inconf), sel))
+    # Aircraft in each quadrant of the view
+    quadrants = (traf.lat[sel] > 52.0) * 2 + (traf.lon[sel] > 4.0)
+    assert np.all(np.bincount(quadrants) > 200)
+    np.testing.assert_array_equal(
+        sel, thinview(idx, traf.lat, traf.lon, traf.cd.inconf, bounds, 1000))
+
+    scr.viewmax = 50
+    assert len(scr.filterview(make_data(traf), b'C1')['id']) == 50
+
+
+def test_thinview_float_inconf(scr):
+    """
+    Without conflict detection, inconf is a float array.
+    """
+    traf = bs.traf
+    inconf = traf.cd.inconf.astype(float)
+    idx = np.arange(len(traf.id))
+    sel = thinview(idx, traf.lat, traf.lon, inconf, (42.0, 62.0, -6.0, 14.0), 1000)
+    np.testing.assert_array_equal(
+        sel, thinview(idx, traf.lat, traf.lon, traf.cd.inconf, (42.0, 62.0, -6.0, 14.0), 1000))
+
+    traf.cd.inconf = np.zeros(len(traf.id))
+    scr.viewmax = 50
+    assert len(scr.filterview(make_data(traf), b'C1')['id']) == 50
+
+
+def test_dateline(scr):
+    """
+    Views across the dateline contain the aircraft on both sides of it,
+    and thinning spreads them over the whole view.
+    """
+    traf = bs.traf
+    traf.lon = (traf.lon + 174.0 + 180.0) % 360.0 - 180.0
+    scr.client_pan[b'C1'] = (52.0, 180.0)
+    data = scr.filterview(make_data(traf), b'C1')
+    dlon = 1.0 / np.cos(np.radians(52.0))
+    inview = (np.abs(traf.lat - 52.0) <= 1.0) & (np.abs(traf.lon) >= 180.0 - dlon)
+    assert data['id'] == [acid for acid, ok in zip(traf.id, inview) if ok]
+    assert np.any(data['lon'] < 0.0) and np.any(data['lon'] > 0.0)
+
+    # Four aircraft in each column of the 4x4 thinning grid
+    idx = np.flatnonzero(inview & ~traf.cd.inconf)
+    lat0, lat1, lon0, lon1 = scr.getviewbounds(b'C1')
+    sel = thinview(idx, traf.lat[idx], traf.lon[idx], traf.cd.inconf[idx],
+                   (lat0, lat1, lon0, lon1), 16)
+    col = ((traf.lon[sel] - lon0) % 360.0 / (lon1 - lon0) * 4).astype(int)
+    assert list(np.bincount(col, minlength=4)) == [4, 4, 4, 4]
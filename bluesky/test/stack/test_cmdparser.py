@@ -0,0 +1,57 @@
+"""
+Tests the argument parser cache and the typed call of stack commands.
+"""
+import pytest
+from bluesky import stack
+from bluesky.stack import argparser
+from bluesky.stack.argparser import argparsers, refdata
+from bluesky.stack.cmdparser import Command
+from bluesky.tools.aero import ft
+
+
+@pytest.fixture
+def cmd():
+    calls = []
+
+    @stack.command(name='TESTCMD')
+    def testcmd(alt: 'alt', hdg: 'hdg' = None):
+        calls.append((alt, hdg))
+        if alt < 0:
+            return False, 'negative altitude'
+        return True
+
+    yield Command.cmddict['TESTCMD'], calls
+    stack.remove_commands(['TESTCMD'])
+
+
+def test_parse_cache(cmd):
+    cmdobj, calls = cmd
+    assert cmdobj('FL100,90') == (True, '')
+    # Only the current argument is used as key, and the value is cached
+    assert argparsers['alt'].cache['FL100'] == 100 * 100 * ft
+    assert argparsers['hdg'].cache['90'] == 90.0
+    assert cmdobj('FL100,180') == (True, '')
+    assert calls == [(100 * 100 * ft, 90.0), (100 * 100 * ft, 180.0)]
+    with pytest.raises(argparser.ArgumentError):
+        cmdobj('FLX')
+    assert 'FLX' not in argparsers['alt'].cache
+
+
+def test_magnetic_not_cached(monkeypatch):
+    monkeypatch.setattr(argparser, 'txt2hdg', lambda txt, lat, lon: lat)
+    hdg = argparsers['hdg']
+    refdata.lat, refdata.lon = 10.0, 0.0
+    assert hdg.parse('90M') == (10.0, '')
+    refdata.lat = 20.0
+    assert hdg.parse('90M') == (20.0, '')
+    assert '90M' not in hdg.cache
+    argparser.reset()
+
+
+def test_call(cmd):
+    cmdobj, calls = cmd
+    assert stack.call('testcmd', -10.0) == (False, 'negative altitude')
+    assert stack.call(cmdobj, 10.0, 180.0) == (True, '')
+    assert calls == [(-10.0, None), (10.0, 180.0)]
+    with pytest.raises(KeyError):
+        stack.call('NOTACOMMAND')
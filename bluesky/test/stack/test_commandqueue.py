@@ -0,0 +1,27 @@
+"""
+Tests the priority queue of timed stack commands.
+"""
+from bluesky.stack.stackbase import CommandQueue
+
+
+def test_order():
+    queue = CommandQueue([10.0, 0.0, 10.0], ['B', 'A', 'C'])
+    queue.push(5.0, 'D')
+    queue.push(10.0, 'E')
+    queue.push(0.0, 'F')
+    assert len(queue) == 6 and queue.nexttime() == 0.0
+    # Equal times keep the order in which commands were added
+    assert list(queue) == [(0.0, 'A'), (0.0, 'F'), (5.0, 'D'),
+                           (10.0, 'B'), (10.0, 'C'), (10.0, 'E')]
+
+
+def test_pop():
+    queue = CommandQueue()
+    assert queue.pop(100.0) == [] and not queue
+    for t in (3.0, 1.0, 2.0, 1.0):
+        queue.push(t, f'CMD{t}')
+    assert queue.pop(0.5) == []
+    assert queue.pop(2.0) == [(1.0, 'CMD1.0'), (1.0, 'CMD1.0'), (2.0, 'CMD2.0')]
+    assert queue.nexttime() == 3.0
+    assert queue.pop(3.0) == [(3.0, 'CMD3.0')]
+    assert queue.nexttime() == float('inf')
@@ -0,0 +1,81 @@
+"""
+Tests compiled scenario files, and their lazy reading by the stack.
+"""
+from types import SimpleNamespace
+import pytest
+import bluesky as bs
+from bluesky.stack import compiledscn
+from bluesky.stack.compiledscn import CompiledScenario
+from bluesky.stack.stackbase import Stack, CommandQueue, checkscen
+from bluesky.stack.simstack import readscn
+from bluesky.network.batch import split_scenarios
+
+
+ENTRIES = [(0.0, 'CRE KL1 B744 52 4 90 FL200 250'),
+           (10.0, 'KL1 HDG 180'),
+           (5.0, 'KL1 ALT FL100'),
+           (10.0, 'ECHO é'),
+           (20.0, 'KL1 HDG 180')]
+
+
+@pytest.fixture
+def scnb(tmp_path):
+    fname = str(tmp_path / 'test.scnb')
+    assert compiledscn.write(fname, ENTRIES) == len(ENTRIES)
+    return fname
+
+
+def test_roundtrip(scnb):
+    scen = CompiledScenario(scnb)
+    assert len(scen) == 5
+    # Iteration keeps the order of the original file
+    assert list(scen) == ENTRIES
+
+
+def test_pop(scnb):
+    scen = CompiledScenario(scnb)
+    assert scen.pop(-1.0) == ([], [])
+    assert scen.pop(5.0) == ([0.0, 5.0], ['CRE KL1 B744 52 4 90 FL200 250', 'KL1 ALT FL100'])
+    assert scen.nexttime() == 10.0
+    assert scen.pop(15.0)[1] == ['KL1 HDG 180', 'ECHO é']
+    assert scen.pop(100.0)[1] == ['KL1 HDG 180']
+    assert len(scen) == 0 and scen.nexttime() == float('inf')
+
+
+def test_not_compiled(tmp_path):
+    fname = tmp_path / 'test.scnb'
+    fname.write_bytes(b'00:00:00.00>HOLD\n' * 4)
+    with pytest.raises(ValueError):
+        CompiledScenario(str(fname))
+
+
+def test_batch(tmp_path):
+    scn = tmp_path / 'batch.scn'
+    scn.write_text('00:00:00.00>SCEN A\n00:10:00.00>HOLD\n'
+                   '00:00:00.00>SCEN B\n00:05:00.00>HOLD\n')
+    scnb = str(tmp_path / 'batch.scnb')
+    compiledscn.write(scnb, readscn(str(scn)))
+    # Commands stay in their SCEN blocks
+    scentime, scencmd = zip(*readscn(scnb))
+    scenarios = list(split_scenarios(scentime, scencmd))
+    assert [(s['name'], s['scencmd']) for s in scenarios] == \
+        [('A', ('SCEN A', 'HOLD')), ('B', ('SCEN B', 'HOLD'))]
+    assert scenarios[0]['scentime'] == (0.0, 600.0)
+    # The scenario is still taken in order of time
+    assert CompiledScenario(scnb).pop(300.0)[1] == ['SCEN A', 'SCEN B', 'HOLD']
+
+
+def test_checkscen_merge(scnb, monkeypatch):
+    monkeypatch.setattr(bs, 'sim', SimpleNamespace(simt=0.0))
+    Stack.reset()
+    Stack.scenfile = CompiledScenario(scnb)
+    Stack.scenqueue = CommandQueue([7.0, 30.0], ['ECHO scheduled', 'ECHO later'])
+    checkscen()
+    assert [cmd for cmd, _ in Stack.cmdstack] == ['CRE KL1 B744 52 4 90 FL200 250']
+    Stack.clear()
+    bs.sim.simt = 10.0
+    checkscen()
+    assert [cmd for cmd, _ in Stack.cmdstack] == \
+        ['KL1 ALT FL100', 'ECHO scheduled', 'KL1 HDG 180', 'ECHO é']
+    assert list(Stack.scenqueue) == [(30.0, 'ECHO later')]
+    Stack.reset()
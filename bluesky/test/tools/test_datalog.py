@@ -0,0 +1,37 @@
+"""
+Tests the columnar NPZ logger against the logged data.
+"""
+from types import SimpleNamespace
+import numpy as np
+import bluesky as bs
+from bluesky import settings
+from bluesky.tools import datalog
+
+
+def test_npzlogger(tmp_path, monkeypatch):
+    monkeypatch.setattr(bs, 'sim', SimpleNamespace(simt=0.0))
+    monkeypatch.setattr(settings, 'log_chunkrows', 5, raising=False)
+    lat = np.array([52.0, 52.1, 52.2])
+    logger = datalog.NPZLogger('TESTNPZLOG', 1.0, 'Test header')
+    logger.selvars = [SimpleNamespace(varname='lat', get=lambda: lat)]
+    logger.open(str(tmp_path / 'test.log'))
+    assert logger.isopen() and logger.fname.endswith('.npz')
+
+    for simt in range(4):
+        bs.sim.simt = float(simt)
+        logger.log(['KL1', 'KL2', 'KL3'], np.arange(6).reshape(3, 2), 7)
+        lat += 1.0
+    # Rows are flushed in chunks, and when the logger is reset
+    assert logger.nchunks == 2
+    fname = logger.fname
+    logger.reset()
+    assert not logger.isopen()
+
+    data = datalog.readlog(fname)
+    assert list(data) == ['simt', 'lat', 'var0', 'var1_0', 'var1_1', 'var2']
+    np.testing.assert_array_equal(data['simt'], np.repeat(np.arange(4.0), 3))
+    # Logged arrays are copies of the data at the time of logging
+    np.testing.assert_allclose(data['lat'], np.add.outer(np.arange(4.0), [52.0, 52.1, 52.2]).ravel())
+    assert list(data['var0'][:3]) == ['KL1', 'KL2', 'KL3']
+    np.testing.assert_array_equal(data['var1_1'], np.tile([1, 3, 5], 4))
+    assert data['var2'].dtype.kind == 'i' and (data['var2'] == 7).all()
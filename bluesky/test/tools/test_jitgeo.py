@@ -0,0 +1,68 @@
+"""
+Tests the JIT-compiled geo functions against the NumPy versions in geo.py.
+"""
+import numpy as np
+import pytest
+from bluesky.tools import geo
+
+jitgeo = pytest.importorskip('bluesky.tools.jitgeo')
+
+
+@pytest.fixture(params=[10, 10000])
+def pos(request):
+    """
+    Random positions on both hemispheres, for the serial and parallel kernels.
+    """
+    rng = np.random.default_rng(1)
+    n = request.param
+    return (rng.uniform(-80, 80, n), rng.uniform(-180, 180, n),
+            rng.uniform(-80, 80, n), rng.uniform(-180, 180, n))
+
+
+def assert_close(ref, res):
+    """
+    Results have the same type and shape, and equal values.
+    """
+    for r, v in zip(np.atleast_1d(ref) if not isinstance(ref, tuple) else ref,
+                    np.atleast_1d(res) if not isinstance(res, tuple) else res):
+        assert type(r) is type(v)
+        assert np.shape(r) == np.shape(v)
+        np.testing.assert_allclose(v, r, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('name', ['qdrdist', 'latlondist', 'kwikdist', 'kwikqdrdist'])
+def test_jitgeo_vector(name, pos):
+    """
+    Vector and scalar inputs of the pairwise functions.
+    """
+    ref, res = getattr(geo, name), getattr(jitgeo, name)
+    assert_close(ref(*pos), res(*pos))
+    assert_close(ref(52.0, 4.0, *(p[0] for p in pos[2:])),
+                 res(52.0, 4.0, *(p[0] for p in pos[2:])))
+    # Single reference position with a vector of positions
+    assert_close(ref(52.0, 4.0, pos[2], pos[3]), res(52.0, 4.0, pos[2], pos[3]))
+
+
+def test_jitgeo_qdrpos(pos):
+    """
+    Positions from bearing and distance.
+    """
+    qdr, dist = pos[3], np.abs(pos[2]) * 10.0
+    assert_close(geo.qdrpos(pos[0], pos[1], qdr, dist),
+                 jitgeo.qdrpos(pos[0], pos[1], qdr, dist))
+    assert_close(geo.rwgs84(pos[0]), jitgeo.rwgs84(pos[0]))
+    assert_close(geo.rwgs84_matrix(pos[0]), jitgeo.rwgs84_matrix(pos[0]))
+
+
+@pytest.mark.parametrize('name', ['qdrdist_matrix', 'latlondist_matrix',
+                                  'kwikqdrdist_matrix'])
+def test_jitgeo_matrix(name, pos):
+    """
+    Matrix inputs give all combinations, as matrices.
+    """
+    ref, res = getattr(geo, name), getattr(jitgeo, name)
+    mats = [np.asmatrix(p[:100]) for p in pos]
+    assert_close(ref(*mats), res(*mats))
+    mats = [np.asmatrix(p[:50]) for p in pos[:2]] + [np.asmatrix(p) for p in pos[2:]]
+    if name != 'latlondist_matrix':
+        assert_close(ref(*mats), res(*mats))
@@ -21,7 +21,7 @@ def traffic_():
     naming `traffic_` in their parameter lists.
     """
     bluesky.settings.is_sim = True
-    bluesky.init()
+    bluesky.init(detached=True)
     yield bluesky.traf
 
 
@@ -33,3 +33,17 @@ def route_(traffic_):
     """
     from bluesky.traffic import route
     yield route
+
+
+@pytest.fixture
+def traf(traffic_):
+    """
+    Test-level setup and teardown function, for those test functions
+    naming `traf` in their parameter lists: traffic without aircraft, and
+    without conflict detection after the test.
+    """
+    from bluesky.traffic.asas.detection import ConflictDetection
+    traffic_.reset()
+    yield traffic_
+    traffic_.reset()
+    ConflictDetection.select()
@@ -0,0 +1,131 @@
+"""
+Tests grid-based state-based conflict detection (StateBasedGrid) against
+the full-matrix StateBased implementation.
+"""
+import importlib
+import numpy as np
+import pytest
+from bluesky.tools.aero import nm, ft
+from bluesky.traffic.asas import statebased, gridbased
+from bluesky.traffic.asas.statebased import StateBased
+from bluesky.traffic.asas.gridbased import StateBasedGrid
+
+
+def make_traffic(traf, n, seed, lat0=52.0, lon0=4.0, spread=2.0, nlevels=5):
+    """
+    Replace the traffic by n aircraft with a random state, with the
+    attributes used by conflict detection.
+    """
+    rng = np.random.default_rng(seed)
+    traf.reset()
+    if n:
+        traf.cre(['AC%04d' % i for i in range(n)], 'B744',
+                 lat0 + rng.uniform(-spread, spread, n),
+                 lon0 + rng.uniform(-spread, spread, n),
+                 rng.uniform(0, 360, n),
+                 rng.integers(0, nlevels, n) * 1000 * ft + rng.uniform(0, 500 * ft, n))
+        traf.gs[:] = rng.uniform(100, 250, n)
+        traf.vs[:] = np.where(rng.random(n) < 0.3, rng.uniform(-15, 15, n), 0.0)
+    return traf
+
+
+def detect(cdclass, traf, rpz, hpz, dtlook):
+    """
+    Select cdclass as conflict detection method, and detect the conflicts
+    in traf.
+    """
+    cdclass.select()
+    return traf.cd.detect(traf, traf, rpz, hpz, dtlook)
+
+
+def assert_parity(traf, rpz, hpz, dtlook):
+    """
+    Check that both detection methods produce the same conflicts, and
+    equal conflict geometry up to rounding (the grid method computes
+    qdr/dist element-wise instead of as a matrix).
+    """
+    ref = detect(StateBased, traf, rpz, hpz, dtlook)
+    res = detect(StateBasedGrid, traf, rpz, hpz, dtlook)
+    for name, r, g in zip(('confpairs', 'lospairs', 'inconf'), ref, res):
+        np.testing.assert_array_equal(np.asarray(r), np.asarray(g), name)
+    names = ('tcpamax', 'qdr', 'dist', 'dcpa', 'tcpa', 'tLOS')
+    for name, r, g in zip(names, ref[3:], res[3:]):
+        np.testing.assert_allclose(g, r, rtol=1e-8, atol=1e-6, err_msg=name)
+    return ref
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_cdgrid_parity(traf, seed):
+    """
+    Random traffic with global PZ and lookahead settings.
+    """
+    n = 400
+    make_traffic(traf, n, seed)
+    ref = assert_parity(traf, np.full(n, 5 * nm), np.full(n, 1000 * ft),
+                        np.full(n, 300.0))
+    # Make sure the scenario actually contains conflicts and LoS
+    assert len(ref[0][0]) and len(ref[1][0])
+
+
+def test_cdgrid_parity_peraircraft(traf):
+    """
+    Per-aircraft PZ dimensions and lookahead times.
+    """
+    n = 300
+    make_traffic(traf, n, 10, spread=1.0)
+    rng = np.random.default_rng(11)
+    assert_parity(traf, rng.uniform(3, 8, n) * nm, rng.uniform(500, 1500, n) * ft,
+                  rng.uniform(60, 600, n))
+
+
+def test_cdgrid_parity_dateline(traf):
+    """
+    Traffic around the date line, where longitude bins wrap.
+    """
+    n = 300
+    make_traffic(traf, n, 20, lat0=0.0, lon0=180.0, spread=3.0)
+    assert traf.lon.min() < 0.0 < traf.lon.max()
+    ref = assert_parity(traf, np.full(n, 5 * nm), np.full(n, 1000 * ft),
+                        np.full(n, 300.0))
+    assert len(ref[0][0])
+
+
+def test_cdgrid_parity_blocks(traf, monkeypatch):
+    """
+    Candidate pairs split over many blocks.
+    """
+    n = 200
+    make_traffic(traf, n, 30, spread=0.5)
+    monkeypatch.setattr(StateBasedGrid, 'maxpairs', 500)
+    assert_parity(traf, np.full(n, 5 * nm), np.full(n, 1000 * ft),
+                  np.full(n, 300.0))
+
+
+def test_cdgrid_small(traf):
+    """
+    No traffic, or a single aircraft.
+    """
+    for n in (0, 1):
+        make_traffic(traf, n, 0)
+        res = detect(StateBasedGrid, traf, np.full(n, 5 * nm),
+                     np.full(n, 1000 * ft), np.full(n, 300.0))
+        assert len(res[0][0]) == 0 and len(res[1][0]) == 0
+        assert len(res[2]) == n
+
+
+@pytest.mark.parametrize('backend', ['geo', 'jitgeo', 'cgeo'])
+def test_cdgrid_geo_backends(traf, backend, monkeypatch):
+    """
+    Parity with each available geo backend, which both methods use.
+    """
+    try:
+        geo = importlib.import_module('bluesky.tools.' + backend)
+    except ImportError:
+        pytest.skip(f'{backend} not available')
+    monkeypatch.setattr(statebased, 'geo', geo)
+    monkeypatch.setattr(gridbased, 'geo', geo)
+    n = 300
+    make_traffic(traf, n, 40)
+    ref = assert_parity(traf, np.full(n, 5 * nm), np.full(n, 1000 * ft),
+                        np.full(n, 300.0))
+    assert len(ref[0][0])
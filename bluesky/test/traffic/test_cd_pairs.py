@@ -0,0 +1,99 @@
+"""
+Tests the index-based conflict pair database of ConflictDetection, and the
+callsign views derived from it.
+"""
+import numpy as np
+import pytest
+import bluesky as bs
+from bluesky.traffic.asas.detection import ConflictDetection
+
+
+class FixedPairs(ConflictDetection):
+    """
+    Conflict detection that returns a preset list of pairs.
+    """
+    def detect(self, ownship, intruder, rpz, hpz, dtlookahead):
+        data = np.arange(len(self.pairs[0]) if isinstance(self.pairs, tuple)
+                         else len(self.pairs), dtype=float)
+        return self.pairs, self.lospairs_in, np.zeros(ownship.ntraf, dtype=bool), \
+            np.zeros(ownship.ntraf), data, data, data, data, data
+
+
+@pytest.fixture
+def cd(traf):
+    """
+    Detection with preset pairs, for five aircraft.
+    """
+    FixedPairs.select()
+    traf.cre(['A', 'B', 'C', 'D', 'E'], aclon=np.arange(5.0))
+    return traf.cd
+
+
+def test_cd_pairs_views(cd):
+    """
+    Callsign views and unique pairs are derived from the index pairs.
+    """
+    cd.pairs = (np.array([0, 1, 2, 3]), np.array([1, 0, 3, 2]))
+    cd.lospairs_in = (np.array([2, 3]), np.array([3, 2]))
+    cd.update(bs.traf, bs.traf)
+    assert cd.confpairs == [('A', 'B'), ('B', 'A'), ('C', 'D'), ('D', 'C')]
+    assert cd.lospairs == [('C', 'D'), ('D', 'C')]
+    assert cd.confpairs_unique == {frozenset('AB'), frozenset('CD')}
+    assert cd.lospairs_unique == {frozenset('CD')}
+    assert cd.confpairs_all == [frozenset('AB'), frozenset('CD')]
+    assert cd.lospairs_all == [frozenset('CD')]
+
+    # Only new pairs are added to the totals
+    cd.pairs = (np.array([1, 4]), np.array([0, 0]))
+    cd.lospairs_in = []
+    cd.update(bs.traf, bs.traf)
+    assert cd.confpairs == [('B', 'A'), ('E', 'A')]
+    assert cd.confpairs_all == [frozenset('AB'), frozenset('CD'), frozenset('AE')]
+    assert cd.lospairs == [] and cd.lospairs_unique == set()
+
+
+def test_cd_pairs_legacy(cd):
+    """
+    Detection implementations can still return lists of callsign pairs.
+    """
+    cd.pairs = [('A', 'C'), ('C', 'A')]
+    cd.lospairs_in = []
+    cd.update(bs.traf, bs.traf)
+    np.testing.assert_array_equal(cd.confidx[0], [0, 2])
+    np.testing.assert_array_equal(cd.confidx[1], [2, 0])
+    assert cd.confpairs == cd.pairs
+
+
+def test_cd_pairs_delete(cd):
+    """
+    Pairs with deleted aircraft are removed, the others are renumbered.
+    """
+    cd.pairs = (np.array([0, 1, 2, 3, 4]), np.array([1, 0, 4, 4, 3]))
+    cd.lospairs_in = (np.array([3, 4]), np.array([4, 3]))
+    cd.update(bs.traf, bs.traf)
+    assert len(cd.confpairs) == 5
+
+    bs.traf.delete([1, 2])
+    assert bs.traf.id == ['A', 'D', 'E']
+    np.testing.assert_array_equal(cd.confidx[0], [1, 2])
+    np.testing.assert_array_equal(cd.confidx[1], [2, 1])
+    np.testing.assert_array_equal(cd.tcpa, [3.0, 4.0])
+    assert cd.confpairs == [('D', 'E'), ('E', 'D')]
+    assert cd.confpairs_unique == {frozenset('DE')}
+    assert cd.lospairs_unique == {frozenset('DE')}
+    assert len(cd.inconf) == 3
+
+
+def test_cd_pairs_ensemble(cd):
+    """
+    In ensemble runs, only pairs within the same member are kept.
+    """
+    bs.traf.member[:] = [1, 1, 2, 2, 1]
+    cd.pairs = (np.array([0, 1, 0, 2, 4]), np.array([1, 0, 2, 3, 0]))
+    cd.lospairs_in = (np.array([1, 3]), np.array([2, 2]))
+    cd.update(bs.traf, bs.traf)
+    assert cd.confpairs == [('A', 'B'), ('B', 'A'), ('C', 'D'), ('E', 'A')]
+    np.testing.assert_array_equal(cd.tcpa, [0.0, 1.0, 3.0, 4.0])
+    np.testing.assert_array_equal(cd.inconf, [True, True, True, False, True])
+    np.testing.assert_array_equal(cd.tcpamax, [0.0, 1.0, 3.0, 0.0, 4.0])
+    assert cd.lospairs == [('D', 'C')]
@@ -0,0 +1,62 @@
+"""
+Tests parallel grid-based conflict detection (StateBasedParallel) against
+the single-process StateBasedGrid implementation.
+"""
+import numpy as np
+import pytest
+from bluesky.tools.aero import nm, ft
+from bluesky.traffic.asas.gridbased import StateBasedGrid, mergeblocks
+from bluesky.traffic.asas.parallel import StateBasedParallel
+from bluesky.test.traffic.test_cd_grid import make_traffic, detect
+
+
+def assert_equal(ref, res):
+    """
+    Check that two sets of detection outputs are identical.
+    """
+    names = ('confpairs', 'lospairs', 'inconf', 'tcpamax',
+             'qdr', 'dist', 'dcpa', 'tcpa', 'tLOS')
+    for name, r, p in zip(names, ref, res):
+        np.testing.assert_array_equal(np.asarray(r), np.asarray(p), name)
+
+
+@pytest.fixture
+def cd(traf, monkeypatch):
+    """
+    Parallel detection object with two workers, used for all traffic sizes.
+    """
+    StateBasedParallel.select()
+    cd = StateBasedParallel.implinstance()
+    monkeypatch.setattr(cd, 'nworkers', 2)
+    monkeypatch.setattr(cd, 'minparallel', 0)
+    yield cd
+    cd.closepool()
+
+
+def test_cd_rows(traf):
+    """
+    Detection in separate row ranges merges into the full result.
+    """
+    n = 300
+    make_traffic(traf, n, 1, spread=1.0)
+    args = (traf, traf, np.full(n, 5 * nm), np.full(n, 1000 * ft), np.full(n, 300.0))
+    StateBasedGrid.select()
+    cd = StateBasedGrid.implinstance()
+    blocks = [cd.detectrows(*args, rows=rows)
+              for rows in ((0, 7), (7, 7), (7, 150), (150, n))]
+    assert_equal(cd.detect(*args), mergeblocks(n, blocks))
+
+
+def test_cd_parallel(traf, cd):
+    """
+    Worker results are identical to single-process detection, also when
+    the shared state buffer has to grow.
+    """
+    for n, seed in ((200, 2), (500, 3), (100, 4)):
+        make_traffic(traf, n, seed, spread=1.0)
+        rng = np.random.default_rng(seed)
+        args = (rng.uniform(3, 8, n) * nm, rng.uniform(500, 1500, n) * ft,
+                rng.uniform(60, 600, n))
+        ref = detect(StateBasedGrid, traf, *args)
+        assert len(ref[0][0])
+        assert_equal(ref, cd.detect(traf, traf, *args))
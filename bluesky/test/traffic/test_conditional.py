@@ -0,0 +1,62 @@
+"""
+Tests the vectorised evaluation of conditional commands.
+"""
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import bluesky as bs
+from bluesky.stack.stackbase import Stack
+from bluesky.traffic.conditional import Condition
+
+
+@pytest.fixture
+def cond(monkeypatch):
+    traf = SimpleNamespace(alt=np.array([1000.0, 2000.0, 3000.0]),
+                           cas=np.array([100.0, 150.0, 200.0]),
+                           lat=np.array([52.0, 52.0, 52.0]),
+                           lon=np.array([4.0, 4.0, 4.0]),
+                           member=np.zeros(3, dtype=int))
+    monkeypatch.setattr(bs, 'traf', traf)
+    Stack.reset()
+    yield Condition()
+    Stack.reset()
+
+
+def stacked():
+    cmds = [cmd for cmd, _ in Stack.cmdstack]
+    Stack.clear()
+    return cmds
+
+
+def test_conditions(cond):
+    for i in range(20):
+        cond.ataltcmd(i % 3, 2500.0, f'ALT{i}')
+    cond.atspdcmd(2, 180.0, 'SPD')
+    cond.atdistcmd(0, 52.0, 5.0, 10.0, 'DIST')
+    assert cond.ncond == 22 and len(cond.data) >= 22
+
+    cond.update()
+    assert stacked() == []
+    bs.traf.alt[:] = 2600.0
+    bs.traf.cas[2] = 170.0
+    cond.update()
+    # Aircraft 0 and 1 climbed through 2500, aircraft 2 slowed down below 180
+    assert stacked() == [f'ALT{i}' for i in range(20) if i % 3 < 2] + ['SPD']
+    assert cond.cmd == [f'ALT{i}' for i in range(20) if i % 3 == 2] + ['DIST']
+
+    # Move aircraft 0 to within 10 nm of 52N, 5E
+    bs.traf.lon[0] = 4.9
+    cond.update()
+    assert stacked() == ['DIST']
+
+
+def test_delete(cond):
+    for i in range(3):
+        cond.ataltcmd(i, 2500.0, f'ALT{i}')
+    cond.delete(np.array([0]))
+    bs.traf.alt = np.array([2600.0, 2600.0])
+    assert list(cond.conditions['acidx']) == [0, 1]
+    cond.update()
+    assert stacked() == ['ALT1']
+    cond.reset()
+    assert cond.ncond == 0 and cond.cmd == []
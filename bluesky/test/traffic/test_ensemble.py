@@ -0,0 +1,112 @@
+"""
+Tests ensemble runs: the member context of stack processing, the callsign
+suffixes of member aircraft, and the results per member.
+"""
+import pytest
+import bluesky as bs
+from bluesky.stack.stackbase import Stack
+from bluesky.tools.aero import ft, kts
+
+
+SCENARIO = """\
+00:00:00.00>CRE KL204 B744 52 4 90 FL100 250
+00:00:00.00>CRE KL205 B744 52 4.3 270 FL100 250
+"""
+
+
+def run(t):
+    """
+    Run the simulation in fast-time for t seconds.
+    """
+    bs.sim.fastforward()
+    tend = bs.sim.simt + t
+    while bs.sim.simt < tend:
+        bs.sim.step()
+
+
+@pytest.fixture
+def ensemble(traffic_, tmp_path):
+    """
+    Ensemble of two members of a scenario with two aircraft in conflict.
+    """
+    def start(scenario=SCENARIO, n=2):
+        fname = tmp_path / 'ensemble.scn'
+        fname.write_text(scenario)
+        bs.sim.ensemble.start(str(fname), n)
+        run(1.0)
+        return bs.sim.ensemble
+    yield start
+    bs.sim.reset()
+
+
+def test_member_aircraft(ensemble):
+    """
+    Aircraft get the number of their member as callsign suffix, and
+    callsigns refer to the aircraft of the current member.
+    """
+    ens = ensemble()
+    assert bs.traf.id == ['KL204_1', 'KL205_1', 'KL204_2', 'KL205_2']
+    assert list(bs.traf.member) == [1, 1, 2, 2]
+    assert bs.traf.id2idx('KL204') == -1
+    with ens.member(2) as mem:
+        assert Stack.cmdstack is mem.cmdstack and bs.traf.curmember == 2
+        assert bs.traf.id2idx('KL205') == 3
+        assert bs.traf.id2idx('KL204_1') == 0
+    assert bs.traf.curmember == 0 and Stack.cmdstack is not mem.cmdstack
+
+
+def test_member_commands(ensemble):
+    """
+    Commands stacked for a member only affect the aircraft of that member.
+    """
+    ens = ensemble()
+    with ens.member(2):
+        bs.stack.stack('KL204 SPD 200')
+    run(1.0)
+    assert not ens.members[1].cmdstack
+    assert bs.traf.selspd[0] != bs.traf.selspd[2]
+
+
+def test_member_wpstack(ensemble):
+    """
+    Waypoint commands of member aircraft are stored with a single callsign.
+    """
+    ens = ensemble()
+    with ens.member(1):
+        bs.stack.stack('DEFWPT MYWP 52 4.5', 'KL204 ADDWPT MYWP',
+                       'KL204 AT MYWP DO SPD KL204 200',
+                       'KL204 AT MYWP DO KL204 ALT FL120',
+                       'KL204 AT MYWP DO HDG 120')
+    run(1.0)
+    route = bs.traf.ap.route[0]
+    assert route.wpstack[-1] == ['SPD KL204 200', 'KL204 ALT FL120', 'KL204_1 HDG 120']
+
+
+def test_member_triggers(ensemble):
+    """
+    Conditional and waypoint commands that fire during the traffic update
+    run in the context of the member of their aircraft.
+    """
+    ensemble(SCENARIO + """\
+00:00:00.00>KL204 ALT FL110
+00:00:00.00>KL204 ATALT FL101 KL204 SPD 300
+00:00:00.00>KL205 ATDIST 52 4.3 2 KL205 ALT FL150
+00:00:00.00>DEFWPT MYWP 52 4.02
+00:00:00.00>KL204 ADDWPT MYWP
+00:00:00.00>KL204 AT MYWP DO KL204 HDG 120
+""")
+    run(30.0)
+    assert bs.traf.cond.ncond == 0
+    assert bs.traf.selspd[[0, 2]] / kts == pytest.approx(300.0)
+    assert bs.traf.selalt[[1, 3]] / ft == pytest.approx(15000.0)
+    assert bs.traf.ap.trk[[0, 2]] == pytest.approx(120.0)
+
+
+def test_results(ensemble):
+    """
+    Aircraft and conflicts are counted per member.
+    """
+    ens = ensemble(n=3)
+    bs.stack.stack('CDMETHOD STATEBASED')
+    run(2.0)
+    assert ens.results() == [dict(member=k, ntraf=2, nconf=1, nlos=0) for k in (1, 2, 3)]
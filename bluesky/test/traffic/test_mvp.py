@@ -0,0 +1,389 @@
+"""
+Tests the vectorised MVP conflict resolution against the original per-pair
+implementation, which is kept here as a reference.
+"""
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from bluesky.tools.aero import nm, ft
+from bluesky.traffic.asas.mvp import MVP
+from bluesky.traffic.asas.statebased import StateBased
+
+
+class LoopMVP(MVP):
+    """
+    Reference MVP implementation, resolving one conflict pair at a time.
+    """
+
+    def applyprio(self, dv_mvp, dv1, dv2, vs1, vs2):
+        ''' Apply the desired priority setting to the resolution '''
+
+        # Primary Free Flight prio rules (no priority)
+        if self.priocode == 'FF1':
+            # since cooperative, the vertical resolution component can be halved, and then dv_mvp can be added
+            dv_mvp[2] = dv_mvp[2] / 2.0
+            dv1 = dv1 - dv_mvp
+            dv2 = dv2 + dv_mvp
+
+        # Secondary Free Flight (Cruising aircraft has priority, combined resolutions)
+        if self.priocode == 'FF2':
+            # since cooperative, the vertical resolution component can be halved, and then dv_mvp can be added
+            dv_mvp[2] = dv_mvp[2]/2.0
+            # If aircraft 1 is cruising, and aircraft 2 is climbing/descending -> aircraft 2 solves conflict
+            if abs(vs1) < 0.1 and abs(vs2) > 0.1:
+                dv2 = dv2 + dv_mvp
+            # If aircraft 2 is cruising, and aircraft 1 is climbing -> aircraft 1 solves conflict
+            elif abs(vs2) < 0.1 and abs(vs1) > 0.1:
+                dv1 = dv1 - dv_mvp
+            else:  # both are climbing/descending/cruising -> both aircraft solves the conflict
+                dv1 = dv1 - dv_mvp
+                dv2 = dv2 + dv_mvp
+
+        # Tertiary Free Flight (Climbing/descending aircraft have priority and crusing solves with horizontal resolutions)
+        elif self.priocode == 'FF3':
+            # If aircraft 1 is cruising, and aircraft 2 is climbing/descending -> aircraft 1 solves conflict horizontally
+            if abs(vs1) < 0.1 and abs(vs2) > 0.1:
+                dv_mvp[2] = 0.0
+                dv1 = dv1 - dv_mvp
+            # If aircraft 2 is cruising, and aircraft 1 is climbing -> aircraft 2 solves conflict horizontally
+            elif abs(vs2) < 0.1 and abs(vs1) > 0.1:
+                dv_mvp[2] = 0.0
+                dv2 = dv2 + dv_mvp
+            else:  # both are climbing/descending/cruising -> both aircraft solves the conflict, combined
+                dv_mvp[2] = dv_mvp[2]/2.0
+                dv1 = dv1 - dv_mvp
+                dv2 = dv2 + dv_mvp
+
+        # Primary Layers (Cruising aircraft has priority and clmibing/descending solves. All conflicts solved horizontally)
+        elif self.priocode == 'LAY1':
+            dv_mvp[2] = 0.0
+            # If aircraft 1 is cruising, and aircraft 2 is climbing/descending -> aircraft 2 solves conflict horizontally
+            if abs(vs1) < 0.1 and abs(vs2) > 0.1:
+                dv2 = dv2 + dv_mvp
+            # If aircraft 2 is cruising, and aircraft 1 is climbing -> aircraft 1 solves conflict horizontally
+            elif abs(vs2) < 0.1 and abs(vs1) > 0.1:
+                dv1 = dv1 - dv_mvp
+            else:  # both are climbing/descending/cruising -> both aircraft solves the conflict horizontally
+                dv1 = dv1 - dv_mvp
+                dv2 = dv2 + dv_mvp
+
+        # Secondary Layers (Climbing/descending aircraft has priority and cruising solves. All conflicts solved horizontally)
+        elif self.priocode == 'LAY2':
+            dv_mvp[2] = 0.0
+            # If aircraft 1 is cruising, and aircraft 2 is climbing/descending -> aircraft 1 solves conflict horizontally
+            if abs(vs1) < 0.1 and abs(vs2) > 0.1:
+                dv1 = dv1 - dv_mvp
+            # If aircraft 2 is cruising, and aircraft 1 is climbing -> aircraft 2 solves conflict horizontally
+            elif abs(vs2) < 0.1 and abs(vs1) > 0.1:
+                dv2 = dv2 + dv_mvp
+            else:  # both are climbing/descending/cruising -> both aircraft solves the conflic horizontally
+                dv1 = dv1 - dv_mvp
+                dv2 = dv2 + dv_mvp
+
+        return dv1, dv2
+
+
+    def resolve(self, conf, ownship, intruder):
+        ''' Resolve all current conflicts '''
+        # Initialize an array to store the resolution velocity vector for all A/C
+        dv = np.zeros((ownship.ntraf, 3))
+
+        # Initialize an array to store time needed to resolve vertically
+        timesolveV = np.ones(ownship.ntraf) * 1e9
+
+        # Call MVP function to resolve conflicts-----------------------------------
+        for ((ac1, ac2), qdr, dist, tcpa, tLOS) in zip(conf.confpairs, conf.qdr, conf.dist, conf.tcpa, conf.tLOS):
+            idx1 = ownship.id.index(ac1)
+            idx2 = intruder.id.index(ac2)
+
+            # If A/C indexes are found, then apply MVP on this conflict pair
+            # Because ADSB is ON, this is done for each aircraft separately
+            if idx1 >-1 and idx2 > -1:
+                dv_mvp, tsolV = self.MVP(ownship, intruder, conf, qdr, dist, tcpa, tLOS, idx1, idx2)
+                if tsolV < timesolveV[idx1]:
+                    timesolveV[idx1] = tsolV
+
+                # Use priority rules if activated
+                if self.swprio:
+                    dv[idx1], _ = self.applyprio(dv_mvp, dv[idx1], dv[idx2], ownship.vs[idx1], intruder.vs[idx2])
+                else:
+                    # since cooperative, the vertical resolution component can be halved, and then dv_mvp can be added
+                    dv_mvp[2] = 0.5 * dv_mvp[2]
+                    dv[idx1] = dv[idx1] - dv_mvp
+
+                # Check the noreso aircraft. Nobody avoids noreso aircraft.
+                # But noreso aircraft will avoid other aircraft
+                if self.noresoac[idx2]:
+                    dv[idx1] = dv[idx1] + dv_mvp
+
+                # Check the resooff aircraft. These aircraft will not do resolutions.
+                if self.resooffac[idx1]:
+                    dv[idx1] = 0.0
+
+
+        # Determine new speed and limit resolution direction for all aicraft-------
+
+        # Resolution vector for all aircraft, cartesian coordinates
+        dv = np.transpose(dv)
+
+        # The old speed vector, cartesian coordinates
+        v = np.array([ownship.gseast, ownship.gsnorth, ownship.vs])
+
+        # The new speed vector, cartesian coordinates
+        newv = v + dv
+
+        # Limit resolution direction if required-----------------------------------
+
+        # Compute new speed vector in polar coordinates based on desired resolution
+        if self.swresohoriz: # horizontal resolutions
+            if self.swresospd and not self.swresohdg: # SPD only
+                newtrack = ownship.trk
+                newgs    = np.sqrt(newv[0,:]**2 + newv[1,:]**2)
+                newvs    = ownship.vs
+            elif self.swresohdg and not self.swresospd: # HDG only
+                newtrack = (np.arctan2(newv[0,:],newv[1,:])*180/np.pi) % 360
+                newgs    = ownship.gs
+                newvs    = ownship.vs
+            else: # SPD + HDG
+                newtrack = (np.arctan2(newv[0,:],newv[1,:])*180/np.pi) %360
+                newgs    = np.sqrt(newv[0,:]**2 + newv[1,:]**2)
+                newvs    = ownship.vs
+        elif self.swresovert: # vertical resolutions
+            newtrack = ownship.trk
+            newgs    = ownship.gs
+            newvs    = newv[2,:]
+        else: # horizontal + vertical
+            newtrack = (np.arctan2(newv[0,:],newv[1,:])*180/np.pi) %360
+            newgs    = np.sqrt(newv[0,:]**2 + newv[1,:]**2)
+            newvs    = newv[2,:]
+
+        # Determine ASAS module commands for all aircraft--------------------------
+
+        # Cap the velocity
+        newgscapped = np.maximum(ownship.perf.vmin,np.minimum(ownship.perf.vmax,newgs))
+
+        # Cap the vertical speed
+        vscapped = np.maximum(ownship.perf.vsmin,np.minimum(ownship.perf.vsmax,newvs))
+
+        # Calculate if Autopilot selected altitude should be followed. This avoids ASAS from
+        # climbing or descending longer than it needs to if the autopilot leveloff
+        # altitude also resolves the conflict. Because asasalttemp is calculated using
+        # the time to resolve, it may result in climbing or descending more than the selected
+        # altitude.
+        asasalttemp = vscapped * timesolveV + ownship.alt
+        signdvs = np.sign(vscapped - ownship.ap.vs * np.sign(ownship.selalt - ownship.alt))
+        signalt = np.sign(asasalttemp - ownship.selalt)
+        alt = np.where(np.logical_or(signdvs == 0, signdvs == signalt), asasalttemp, ownship.selalt)
+
+        # To compute asas alt, timesolveV is used. timesolveV is a really big value (1e9)
+        # when there is no conflict. Therefore asas alt is only updated when its
+        # value is less than the look-ahead time, because for those aircraft are in conflict
+        altCondition = np.logical_and(timesolveV<conf.dtlookahead, np.abs(dv[2,:])>0.0)
+        alt[altCondition] = asasalttemp[altCondition]
+
+        # If resolutions are limited in the horizontal direction, then asasalt should
+        # be equal to auto pilot alt (aalt). This is to prevent a new asasalt being computed
+        # using the auto pilot vertical speed (ownship.avs) using the code in line 106 (asasalttemp) when only
+        # horizontal resolutions are allowed.
+        alt = alt * (1 - self.swresohoriz) + ownship.selalt * self.swresohoriz
+        return newtrack, newgscapped, vscapped, alt
+
+    def MVP(self, ownship, intruder, conf, qdr, dist, tcpa, tLOS, idx1, idx2):
+        """Modified Voltage Potential (MVP) resolution method"""
+        # Preliminary calculations-------------------------------------------------
+        # Determine largest RPZ and HPZ of the conflict pair, use lookahead of ownship
+        rpz_m = np.max(conf.rpz[[idx1, idx2]] * self.resofach)
+        hpz_m = np.max(conf.hpz[[idx1, idx2]] * self.resofacv)
+        dtlook = conf.dtlookahead[idx1]
+        # Convert qdr from degrees to radians
+        qdr = np.radians(qdr)
+
+        # Relative position vector between id1 and id2
+        drel = np.array([np.sin(qdr) * dist, \
+                        np.cos(qdr) * dist, \
+                        intruder.alt[idx2] - ownship.alt[idx1]])
+
+        # Write velocities as vectors and find relative velocity vector
+        v1 = np.array([ownship.gseast[idx1], ownship.gsnorth[idx1], ownship.vs[idx1]])
+        v2 = np.array([intruder.gseast[idx2], intruder.gsnorth[idx2], intruder.vs[idx2]])
+        vrel = v2 - v1
+
+
+        # Horizontal resolution----------------------------------------------------
+
+        # Find horizontal distance at the tcpa (min horizontal distance)
+        dcpa  = drel + vrel*tcpa
+        dabsH = np.sqrt(dcpa[0] * dcpa[0] + dcpa[1] * dcpa[1])
+
+        # Compute horizontal intrusion
+        iH = rpz_m - dabsH
+
+        # Exception handlers for head-on conflicts
+        # This is done to prevent division by zero in the next step
+        if dabsH <= 10.:
+            dabsH = 10.
+            dcpa[0] = drel[1] / dist * dabsH
+            dcpa[1] = -drel[0] / dist * dabsH
+
+        # If intruder is outside the ownship PZ, then apply extra factor
+        # to make sure that resolution does not graze IPZ
+        if rpz_m < dist and dabsH < dist:
+            # Compute the resolution velocity vector in horizontal direction.
+            # abs(tcpa) because it bcomes negative during intrusion.
+            erratum = np.cos(np.arcsin(rpz_m / dist)-np.arcsin(dabsH / dist))
+            dv1 = ((rpz_m / erratum - dabsH) * dcpa[0]) / (abs(tcpa) * dabsH)
+            dv2 = ((rpz_m / erratum - dabsH) * dcpa[1]) / (abs(tcpa) * dabsH)
+        else:
+            dv1 = (iH * dcpa[0]) / (abs(tcpa) * dabsH)
+            dv2 = (iH * dcpa[1]) / (abs(tcpa) * dabsH)
+
+        # Vertical resolution------------------------------------------------------
+
+        # Compute the  vertical intrusion
+        # Amount of vertical intrusion dependent on vertical relative velocity
+        iV = hpz_m if abs(vrel[2]) > 0.0 else hpz_m - abs(drel[2])
+
+        # Get the time to solve the conflict vertically - tsolveV
+        tsolV = abs(drel[2] / vrel[2]) if abs(vrel[2]) > 0.0 else tLOS
+
+        # If the time to solve the conflict vertically is longer than the look-ahead time,
+        # because the the relative vertical speed is very small, then solve the intrusion
+        # within tinconf
+        if tsolV > dtlook:
+            tsolV = tLOS
+            iV    = hpz_m
+
+        # Compute the resolution velocity vector in the vertical direction
+        # The direction of the vertical resolution is such that the aircraft with
+        # higher climb/decent rate reduces their climb/decent rate
+        dv3 = np.where(abs(vrel[2]) > 0.0, (iV / tsolV) * (-vrel[2] / abs(vrel[2])), (iV / tsolV))
+
+        # It is necessary to cap dv3 to prevent that a vertical conflict
+        # is solved in 1 timestep, leading to a vertical separation that is too
+        # high (high vs assumed in traf). If vertical dynamics are included to
+        # aircraft  model in traffic.py, the below three lines should be deleted.
+        #    mindv3 = -400*fpm# ~ 2.016 [m/s]
+        #    maxdv3 = 400*fpm
+        #    dv3 = np.maximum(mindv3,np.minimum(maxdv3,dv3))
+
+
+        # Combine resolutions------------------------------------------------------
+
+        # combine the dv components
+        dv = np.array([dv1, dv2, dv3])
+
+        return dv, tsolV
+
+
+def make_conflicts(n, seed, spread=0.5):
+    """
+    Generate a random traffic state, and the conflicts detected in it.
+    """
+    rng = np.random.default_rng(seed)
+    trk = rng.uniform(0, 360, n)
+    gs = rng.uniform(100, 250, n)
+    vs = np.where(rng.random(n) < 0.3, rng.uniform(-10, 10, n), 0.0)
+    alt = rng.integers(0, 5, n) * 1000 * ft + rng.uniform(0, 500 * ft, n)
+    traf = SimpleNamespace(
+        ntraf=n,
+        id=['AC%04d' % i for i in range(n)],
+        lat=52.0 + rng.uniform(-spread, spread, n),
+        lon=4.0 + rng.uniform(-spread, spread, n),
+        alt=alt, trk=trk, gs=gs, vs=vs,
+        gseast=gs * np.sin(np.radians(trk)),
+        gsnorth=gs * np.cos(np.radians(trk)),
+        selalt=alt + rng.choice([-2000, 0, 2000], n) * ft,
+        ap=SimpleNamespace(vs=np.where(rng.random(n) < 0.5, 5.0, 0.0)),
+        perf=SimpleNamespace(vmin=np.full(n, 50.0), vmax=np.full(n, 300.0),
+                             vsmin=np.full(n, -20.0), vsmax=np.full(n, 20.0)))
+
+    conf = SimpleNamespace(rpz=np.full(n, 5 * nm), hpz=np.full(n, 1000 * ft),
+                           dtlookahead=np.full(n, 300.0))
+    confidx, _, _, _, conf.qdr, conf.dist, _, conf.tcpa, conf.tLOS = \
+        object.__new__(StateBased).detect(traf, traf, conf.rpz, conf.hpz,
+                                          conf.dtlookahead)
+    conf.confidx = confidx
+    conf.confpairs = [(traf.id[i], traf.id[j]) for i, j in zip(*confidx)]
+    return traf, conf
+
+
+def make_reso(cls, n, seed=None, **kwargs):
+    """
+    Create an MVP object without instantiating it as a traffic child.
+    """
+    reso = object.__new__(cls)
+    reso.swprio, reso.priocode = False, ''
+    reso.resofach = reso.resofacv = 1.01
+    reso.swresohoriz, reso.swresospd, reso.swresohdg = True, False, False
+    reso.swresovert = False
+    reso.noresoac = np.zeros(n, dtype=bool)
+    reso.resooffac = np.zeros(n, dtype=bool)
+    if seed is not None:
+        rng = np.random.default_rng(seed)
+        reso.noresoac = rng.random(n) < 0.1
+        reso.resooffac = rng.random(n) < 0.1
+    reso.__dict__.update(kwargs)
+    return reso
+
+
+def assert_parity(traf, conf, seed=None, **kwargs):
+    """
+    Check that both implementations produce identical outputs.
+    """
+    ref = make_reso(LoopMVP, traf.ntraf, seed, **kwargs).resolve(conf, traf, traf)
+    res = make_reso(MVP, traf.ntraf, seed, **kwargs).resolve(conf, traf, traf)
+    for name, r, v in zip(('trk', 'gs', 'vs', 'alt'), ref, res):
+        np.testing.assert_array_equal(r, v, name)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_mvp_parity(seed):
+    """
+    Default settings, and combined horizontal and vertical resolutions.
+    """
+    traf, conf = make_conflicts(300, seed)
+    assert len(conf.confpairs) > 50
+    assert_parity(traf, conf)
+    assert_parity(traf, conf, swresohoriz=False)
+    assert_parity(traf, conf, swresohoriz=False, swresovert=True)
+
+
+@pytest.mark.parametrize('priocode', ['FF1', 'FF2', 'FF3', 'LAY1', 'LAY2'])
+def test_mvp_parity_prio(priocode):
+    """
+    Priority rules, combined with noreso and resooff aircraft.
+    """
+    traf, conf = make_conflicts(300, 10)
+    assert_parity(traf, conf, seed=11, swprio=True, priocode=priocode,
+                  swresohoriz=False)
+
+
+def test_mvp_parity_noreso():
+    """
+    Noreso and resooff aircraft without priority rules.
+    """
+    traf, conf = make_conflicts(300, 20)
+    assert_parity(traf, conf, seed=21, swresohoriz=False)
+
+
+def test_mvp_parity_headon():
+    """
+    Head-on conflicts, where the distance at CPA is (almost) zero.
+    """
+    traf, conf = make_conflicts(4, 30)
+    traf.lat[:] = 52.0
+    traf.lon[:] = [4.0, 4.2, 4.0, 4.0]
+    traf.lat[3] = 52.1
+    traf.alt[:] = 5000 * ft
+    traf.vs[:] = [0.0, 0.0, 2.0, -2.0]
+    traf.gs[:] = 200.0
+    traf.trk[:] = [90.0, 270.0, 0.0, 180.0]
+    traf.gseast = traf.gs * np.sin(np.radians(traf.trk))
+    traf.gsnorth = traf.gs * np.cos(np.radians(traf.trk))
+    confidx, _, _, _, conf.qdr, conf.dist, _, conf.tcpa, conf.tLOS = \
+        object.__new__(StateBased).detect(traf, traf, conf.rpz, conf.hpz,
+                                          conf.dtlookahead)
+    conf.confidx = confidx
+    conf.confpairs = [(traf.id[i], traf.id[j]) for i, j in zip(*confidx)]
+    assert ('AC0000', 'AC0001') in conf.confpairs
+    assert_parity(traf, conf, swresohoriz=False)
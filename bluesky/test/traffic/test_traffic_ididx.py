@@ -0,0 +1,64 @@
+"""
+Tests the callsign to index map used by Traffic.id2idx.
+"""
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def traf(traf):
+    """
+    Traffic with six aircraft.
+    """
+    traf.cre(['A', 'B', 'C', 'D', 'E', 'F'], aclat=np.arange(6.0))
+    return traf
+
+
+def check_ididx(traf):
+    """
+    The index map matches the callsign list.
+    """
+    assert traf.ididx == {acid: i for i, acid in enumerate(traf.id)}
+    assert traf.id2idx(traf.id) == list(range(traf.ntraf))
+
+
+def test_ididx_lookup(traf):
+    """
+    Single and list lookups, with unknown callsigns and the last aircraft.
+    """
+    assert traf.id2idx('c') == 2
+    assert traf.id2idx('X') == -1
+    assert traf.id2idx('*') == 5
+    assert traf.id2idx(['F', 'X', 'A']) == [5, -1, 0]
+
+
+def test_ididx_delete(traf):
+    """
+    Deleted aircraft are removed, and the following aircraft renumbered.
+    """
+    traf.delete(4)
+    assert traf.id2idx('E') == -1 and traf.id2idx('F') == 4
+    check_ididx(traf)
+
+    traf.delete([3, 0])
+    assert traf.id == ['B', 'C', 'F']
+    check_ididx(traf)
+
+    traf.delete([])
+    check_ididx(traf)
+
+
+def test_ididx_ensemble_member(traf):
+    """
+    In the context of an ensemble member, callsigns refer to the aircraft
+    of that member first.
+    """
+    traf.curmember = 2
+    traf.cre(['A', 'C'])
+    assert traf.id[6:] == ['A_2', 'C_2']
+    assert traf.memberid('A') == 'A_2'
+    assert traf.id2idx('a') == 6
+    assert traf.id2idx(['C', 'D', 'X']) == [7, 3, -1]
+    traf.curmember = 0
+    assert traf.id2idx('A') == 0 and traf.id2idx('C_2') == 7
+    check_ididx(traf)
@@ -0,0 +1,124 @@
+"""
+Tests the preallocated storage of TrafficArrays numpy arrays.
+"""
+import pytest
+import numpy as np
+from bluesky.core import TrafficArrays
+
+
+class Root(TrafficArrays):
+    """
+    Traffic-like root object with a list and two arrays.
+    """
+    def __init__(self):
+        super().__init__()
+        TrafficArrays.setroot(self)
+        self.ntraf = 0
+        with self.settrafarrays():
+            self.id = []
+            self.lat = np.array([])
+            self.flag = np.array([], dtype=bool)
+
+
+class Child(TrafficArrays):
+    """
+    Child object with an integer array.
+    """
+    def __init__(self):
+        super().__init__()
+        with self.settrafarrays():
+            self.num = np.array([], dtype=int)
+
+
+@pytest.fixture
+def root():
+    """
+    Root and child object, restoring the original root afterwards.
+    """
+    oldroot = TrafficArrays.root
+    root = Root()
+    root.child = Child()
+    yield root
+    TrafficArrays.setroot(oldroot)
+
+
+def create(root, n):
+    """
+    Create n elements with increasing values.
+    """
+    root.create(n)
+    root.create_children(n)
+    root.id[-n:] = ['AC%d' % (root.ntraf + i) for i in range(n)]
+    root.lat[-n:] = root.ntraf + np.arange(n)
+    root.child.num[-n:] = root.ntraf + np.arange(n)
+    root.ntraf += n
+
+
+def test_storage_growth(root):
+    """
+    Buffers grow by doubling, and arrays are views onto them.
+    """
+    for _ in range(100):
+        create(root, 1)
+    buf, view, _ = root._ArrBufs['lat']
+    assert view is root.lat
+    assert np.shares_memory(root.lat, buf)
+    assert len(buf) == 128
+    np.testing.assert_array_equal(root.lat, np.arange(100))
+    np.testing.assert_array_equal(root.child.num, np.arange(100))
+    assert root.lat.dtype == float and root.child.num.dtype == int
+    assert not root.flag.any() and root.flag.dtype == bool
+
+
+def test_storage_delete(root):
+    """
+    Deletion compacts the arrays in place, keeping the element order.
+    """
+    create(root, 10)
+    buf = root._ArrBufs['lat'][0]
+    root.delete([2, 5, 6])
+    root.ntraf = len(root.lat)
+    expected = [0, 1, 3, 4, 7, 8, 9]
+    np.testing.assert_array_equal(root.lat, expected)
+    np.testing.assert_array_equal(root.child.num, expected)
+    assert root.id == ['AC%d' % i for i in expected]
+    assert root._ArrBufs['lat'][0] is buf
+
+    root.delete(6)
+    root.ntraf = len(root.lat)
+    create(root, 2)
+    np.testing.assert_array_equal(root.lat, [0, 1, 3, 4, 7, 8, 6, 7])
+
+
+def test_storage_replaced(root):
+    """
+    Arrays that are replaced, or aliased to another array, are copied to
+    their own storage on create and delete.
+    """
+    create(root, 4)
+    root.lat = root.lat * 2.0
+    root.child.num = root.lat.astype(int)
+    create(root, 1)
+    np.testing.assert_array_equal(root.lat, [0, 2, 4, 6, 4])
+    np.testing.assert_array_equal(root.child.num, [0, 2, 4, 6, 4])
+
+    # Alias of an array that is compacted in place
+    root.flag = root.lat
+    root.delete(0)
+    root.ntraf = len(root.lat)
+    np.testing.assert_array_equal(root.lat, [2, 4, 6, 4])
+    np.testing.assert_array_equal(root.flag, [2, 4, 6, 4])
+
+    root.reset()
+    assert len(root.lat) == 0 and not root._ArrBufs
+
+
+def test_storage_dtype(root):
+    """
+    Array types are promoted in the same way as with np.append.
+    """
+    root.actype = np.array([], dtype=str)
+    root._ArrVars.append('actype')
+    create(root, 2)
+    root.actype[-2:] = ['B744', 'A320']
+    assert list(root.actype) == ['B744', 'A320']
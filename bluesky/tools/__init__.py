@@ -6,8 +6,12 @@ if settings.prefer_compiled:
         from . import cgeo as geo
         print('Using compiled geo functions')
     except ImportError:
-        from . import geo
-        print('Using Python-based geo functions')
+        try:
+            from . import jitgeo as geo
+            print('Using JIT-compiled geo functions')
+        except ImportError:
+            from . import geo
+            print('Using Python-based geo functions')
 else:
     from . import geo
     print('Using Python-based geo functions')
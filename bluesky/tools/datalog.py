@@ -2,8 +2,10 @@
 
 # ToDo: Add description in comments
 
+import os
 import numbers
 import itertools
+import zipfile
 from datetime import datetime
 import numpy as np
 from bluesky import settings, stack
@@ -12,7 +14,7 @@ import bluesky as bs
 from bluesky.stack import command
 
 # Register settings defaults
-settings.set_variable_defaults(log_path='output')
+settings.set_variable_defaults(log_path='output', log_format='csv', log_chunkrows=100000)
 
 logprecision = '%.8f'
 
@@ -31,18 +33,27 @@ def crelogstack(name: 'txt', dt: float = None, header: 'string' = ''):
         - name: The name of the logger
         - dt: The logging time interval. When a value is given for dt
               this becomes a periodic logger.
-        - header: A header text to put at the top of each log file
+        - header: A header text to put at the top of each log file.
+              When the header starts with CSV or NPZ, this selects the
+              file format of the logger (default: setting log_format).
     """
     if name in allloggers:
         return False, f'Logger {name} already exists'
 
-    crelog(name, dt, header)
+    fmt, _, rest = header.partition(' ')
+    if fmt.lower() in loggerclasses:
+        header = rest.strip()
+    else:
+        fmt = None
+    crelog(name, dt, header, fmt)
     return True, f'Created {"periodic" if dt else ""} logger {name}'
 
 
-def crelog(name, dt=None, header=''):
-    """ Create a new logger. """
-    allloggers[name] = allloggers.get(name, CSVLogger(name, dt or 0.0, header))
+def crelog(name, dt=None, header='', fmt=None):
+    """ Create a new logger, with file format fmt ('csv' or 'npz'). """
+    if name not in allloggers:
+        logclass = loggerclasses[(fmt or settings.log_format).lower()]
+        allloggers[name] = logclass(name, dt or 0.0, header)
     if dt:
         periodicloggers[name] = allloggers[name]
 
@@ -238,3 +249,114 @@ class CSVLogger:
             return self.addvars(list(args[1:]))
 
         return True
+
+
+class NPZLogger(CSVLogger):
+    ''' Data logger that buffers the logged variables as typed columns, and
+        appends them in chunks of compressed numpy arrays to a .npz file.
+        Read a log file with readlog(). '''
+    def __init__(self, name, dt, header):
+        super().__init__(name, dt, header)
+        self.logfile = None
+        self.columns = []
+        self.buffer = []
+        self.nrows = 0
+        self.nchunks = 0
+
+    def open(self, fname):
+        if self.logfile:
+            self.flush()
+        self.logfile = self.fname = os.path.splitext(fname)[0] + '.npz'
+        self.columns = []
+        self.buffer = []
+        self.nrows = 0
+        self.nchunks = 0
+        with zipfile.ZipFile(self.logfile, 'w') as zfile:
+            zfile.writestr('header.txt', '\n'.join(self.header))
+
+    def isopen(self):
+        return self.logfile is not None
+
+    def log(self, *additional_vars):
+        if self.logfile and bs.sim.simt >= self.tlog:
+            # Set the next log timestep
+            self.tlog += self.dt
+
+            # Make the variable reference list
+            varlist = [bs.sim.simt]
+            varlist += [v.get() for v in self.selvars]
+            varlist += additional_vars
+
+            # Get the number of rows from the first array/list
+            nrows = 1
+            for v in varlist:
+                if isinstance(v, (list, np.ndarray)):
+                    nrows = len(v)
+                    break
+            if nrows == 0:
+                return
+
+            # Copy the data as columns, repeating scalars for each row
+            columns = []
+            for col in varlist:
+                arr = np.array(col)
+                if arr.ndim == 0:
+                    arr = np.full(nrows, arr)
+                columns.extend(arr.T if arr.ndim > 1 else [arr])
+
+            if not self.columns:
+                self.columns = self.colnames(varlist)
+                self.buffer = [[] for _ in self.columns]
+            for buf, col in zip(self.buffer, columns):
+                buf.append(col)
+            self.nrows += nrows
+            if self.nrows >= settings.log_chunkrows:
+                self.flush()
+
+    def colnames(self, varlist):
+        ''' Make unique column names for the logged variables. '''
+        names = ['simt'] + [v.varname for v in self.selvars]
+        names += [f'var{i}' for i in range(len(varlist) - len(names))]
+        columns = []
+        for name, col in zip(names, varlist):
+            ncols = np.shape(col)[1] if np.ndim(col) > 1 else 1
+            for i in range(ncols):
+                colname = f'{name}_{i}' if ncols > 1 else name
+                while colname in columns:
+                    colname += '_'
+                columns.append(colname)
+        return columns
+
+    def flush(self):
+        ''' Append the buffered rows as a new chunk to the log file. '''
+        if not self.nrows:
+            return
+        with zipfile.ZipFile(self.logfile, 'a', zipfile.ZIP_DEFLATED, compresslevel=1) as zfile:
+            for name, chunks in zip(self.columns, self.buffer):
+                with zfile.open(f'{name}/{self.nchunks:06d}.npy', 'w') as f:
+                    np.lib.format.write_array(f, np.concatenate(chunks), allow_pickle=False)
+                chunks.clear()
+        self.nchunks += 1
+        self.nrows = 0
+
+    def reset(self):
+        if self.logfile:
+            self.flush()
+            self.logfile = None
+        super().reset()
+
+
+def readlog(fname):
+    ''' Read a log file of an NPZ logger as a dict of columns. '''
+    columns = dict()
+    with zipfile.ZipFile(fname) as zfile:
+        for member in zfile.namelist():
+            if member.endswith('.npy'):
+                with zfile.open(member) as f:
+                    columns.setdefault(member.rpartition('/')[0], []).append(
+                        np.lib.format.read_array(f, allow_pickle=False))
+    return {name: np.concatenate(chunks) for name, chunks in columns.items()}
+
+
+# Available logger file formats
+loggerclasses = dict(csv=CSVLogger, npz=NPZLogger)
@@ -0,0 +1,278 @@
+""" JIT-compiled versions of the geographic functions in geo.py, using Numba.
+
+    The compiled functions have the same interface and give the same results
+    as their NumPy counterparts in geo.py, but evaluate all formulas in a single loop over
+    the (broadcast) inputs, without temporary arrays. Large inputs are
+    processed in parallel. All other functions are taken from geo.py.
+
+    Importing this module raises an ImportError when Numba is not installed.
+"""
+import numpy as np
+from numba import njit, prange
+
+from bluesky.tools.geo import *
+
+
+# Minimum number of elements for which the parallel kernels are used
+parallel_min = 5000
+
+# Constants
+a_wgs = 6378137.0       # [m] Major semi-axis WGS-84
+b_wgs = 6356752.314245  # [m] Minor semi-axis WGS-84
+re_kwik = 6371000.      # [m] Radius earth used in the kwik functions
+
+
+def _kernel(nout):
+    ''' Decorator that compiles an element-wise function of floats into a
+        serial and a parallel kernel that loop over flat arrays, and returns
+        a function that applies the kernels to broadcast inputs. '''
+    def decorator(func):
+        elem = njit(cache=True)(func)
+        if nout == 1:
+            def loop(args, out):
+                for i in prange(out.shape[1]):
+                    out[0, i] = elem(args[0, i], args[1, i], args[2, i], args[3, i])
+        else:
+            def loop(args, out):
+                for i in prange(out.shape[1]):
+                    out[0, i], out[1, i] = elem(args[0, i], args[1, i], args[2, i], args[3, i])
+        serial = njit(cache=True)(loop)
+        parallel = njit(cache=True, parallel=True)(loop)
+
+        def apply(*args):
+            ''' Apply the kernel to (up to four) broadcast scalars or arrays. '''
+            bargs = np.broadcast_arrays(*args)
+            shape = bargs[0].shape
+            flat = np.zeros((4, bargs[0].size))
+            for i, arg in enumerate(bargs):
+                flat[i] = arg.ravel()
+            out = np.empty((nout, flat.shape[1]))
+            (parallel if out.shape[1] >= parallel_min else serial)(flat, out)
+            if not shape:
+                return out[0, 0] if nout == 1 else tuple(out[:, 0])
+            if nout == 1:
+                return out[0].reshape(shape)
+            return tuple(o.reshape(shape) for o in out)
+        return apply
+    return decorator
+
+
+def _asmatrix(args, res):
+    ''' Return results as matrices when one of the inputs is a matrix, as the
+        NumPy matrix functions in geo.py do. '''
+    if any(isinstance(arg, np.matrix) for arg in args):
+        if isinstance(res, tuple):
+            return tuple(np.asmatrix(r) for r in res)
+        return np.asmatrix(res)
+    return res
+
+
+def _transpose(arg):
+    ''' Transpose of an array input to a matrix function (lat1.T in geo.py). '''
+    return np.transpose(arg) if isinstance(arg, np.ndarray) else arg
+
+
+@njit(cache=True)
+def _rwgs84(latd):
+    ''' Earth radius [m] at latitude latd [deg] for a single value. '''
+    lat = np.radians(latd)
+    coslat = np.cos(lat)
+    sinlat = np.sin(lat)
+    an = a_wgs * a_wgs * coslat
+    bn = b_wgs * b_wgs * sinlat
+    ad = a_wgs * coslat
+    bd = b_wgs * sinlat
+    return np.sqrt((an * an + bn * bn) / (ad * ad + bd * bd))
+
+
+@_kernel(1)
+def _rwgs84_kernel(latd, _1, _2, _3):
+    return _rwgs84(latd)
+
+
+@_kernel(2)
+def _qdrdist_kernel(latd1, lond1, latd2, lond2):
+    if latd1 * latd2 >= 0.:
+        r = _rwgs84(0.5 * (latd1 + latd2))
+    else:
+        r = 0.5 * (abs(latd1) * (_rwgs84(latd1) + a_wgs) +
+                   abs(latd2) * (_rwgs84(latd2) + a_wgs)) / \
+            max(0.000001, abs(latd1) + abs(latd2))
+    lat1 = np.radians(latd1)
+    lat2 = np.radians(latd2)
+    dlon = np.radians(lond2) - np.radians(lond1)
+    coslat1 = np.cos(lat1)
+    coslat2 = np.cos(lat2)
+    sinlat1 = np.sin(lat1)
+    sinlat2 = np.sin(lat2)
+    cosdlon = np.cos(dlon)
+    d = r * np.arccos(coslat1 * coslat2 * cosdlon + sinlat1 * sinlat2)
+    qdr = np.degrees(np.arctan2(np.sin(dlon) * coslat2,
+                                coslat1 * sinlat2 - sinlat1 * coslat2 * cosdlon))
+    return qdr, d / nm
+
+
+@_kernel(2)
+def _qdrdist_matrix_kernel(lat1, lon1, lat2, lon2):
+    if lat1 * lat2 < 0:
+        r = 0.5 * (abs(lat1) * (_rwgs84(lat1) + a_wgs) +
+                   abs(lat2) * (_rwgs84(lat2) + a_wgs)) / \
+            (abs(lat1) + abs(lat2) + (lat1 == 0.) * 0.000001)
+    else:
+        r = _rwgs84(lat1 + lat2)
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
+    sinlat1 = np.sin(np.radians(lat1))
+    sinlat2 = np.sin(np.radians(lat2))
+    coslat1 = np.cos(np.radians(lat1))
+    coslat2 = np.cos(np.radians(lat2))
+    qdr = np.degrees(np.arctan2(np.sin(dlon) * coslat2,
+                                coslat1 * sinlat2 - sinlat1 * coslat2 * np.cos(dlon)))
+    sin1 = abs(np.sin(dlat / 2.))
+    sin2 = abs(np.sin(dlon / 2.))
+    root = sin1 * sin1 + coslat1 * coslat2 * sin2 * sin2
+    dist = r / nm * 2. * np.arctan2(np.sqrt(root), np.sqrt(1 - root))
+    return qdr, dist
+
+
+@_kernel(1)
+def _latlondist_kernel(latd1, lond1, latd2, lond2):
+    if latd1 * latd2 >= 0.:
+        r = _rwgs84(0.5 * (latd1 + latd2))
+    else:
+        r = 0.5 * (abs(latd1) * (_rwgs84(latd1) + a_wgs) +
+                   abs(latd2) * (_rwgs84(latd2) + a_wgs)) / \
+            (abs(latd1) + abs(latd2))
+    lat1 = np.radians(latd1)
+    lat2 = np.radians(latd2)
+    sin1 = np.sin(0.5 * (lat2 - lat1))
+    sin2 = np.sin(0.5 * (np.radians(lond2) - np.radians(lond1)))
+    root = sin1 * sin1 + np.cos(lat1) * np.cos(lat2) * sin2 * sin2
+    return 2. * r * np.arctan2(np.sqrt(root), np.sqrt(1. - root))
+
+
+@_kernel(1)
+def _latlondist_matrix_kernel(lat1, lon1, lat2, lon2):
+    if lat1 * lat2 < 0:
+        r = 0.5 * (abs(lat1) * (_rwgs84(lat1) + a_wgs) +
+                   abs(lat2) * (_rwgs84(lat2) + a_wgs)) / \
+            (abs(lat1) + abs(lat2))
+    else:
+        r = _rwgs84(lat1 + lat2)
+    sin1 = np.sin(np.radians(lat2 - lat1) / 2)
+    sin2 = np.sin(np.radians(lon2 - lon1) / 2)
+    root = sin1 * sin1 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * sin2 * sin2
+    return r / nm * 2 * np.arctan2(np.sqrt(root), np.sqrt(1. - root))
+
+
+@_kernel(2)
+def _qdrpos_kernel(latd1, lond1, qdr, dist):
+    R = _rwgs84(latd1) / nm
+    lat1 = np.radians(latd1)
+    lon1 = np.radians(lond1)
+    sinlat1 = np.sin(lat1)
+    coslat1 = np.cos(lat1)
+    sind = np.sin(dist / R)
+    cosd = np.cos(dist / R)
+    lat2 = np.arcsin(sinlat1 * cosd + coslat1 * sind * np.cos(np.radians(qdr)))
+    lon2 = lon1 + np.arctan2(np.sin(np.radians(qdr)) * sind * coslat1,
+                             cosd - sinlat1 * np.sin(lat2))
+    return np.degrees(lat2), np.degrees(lon2)
+
+
+@_kernel(2)
+def _kwikqdrdist_kernel(lata, lona, latb, lonb):
+    dlat = np.radians(latb - lata)
+    dlon = np.radians(((lonb - lona) + 180) % 360 - 180)
+    cavelat = np.cos(np.radians(lata + latb) * 0.5)
+    dangle = np.sqrt(dlat * dlat + dlon * dlon * (cavelat * cavelat))
+    qdr = np.degrees(np.arctan2(dlon * cavelat, dlat)) % 360.
+    return qdr, re_kwik * dangle / nm
+
+
+def rwgs84(latd):
+    """ Calculate the earths radius with WGS'84 geoid definition
+        In:  lat [deg] (latitude)
+        Out: R   [m]   (earth radius) """
+    return _rwgs84_kernel(latd)
+
+
+def rwgs84_matrix(latd):
+    """ Calculate the earths radius with WGS'84 geoid definition
+        In:  lat [deg] (Vector of latitudes)
+        Out: R   [m]   (Vector of radii) """
+    return _asmatrix((latd,), _rwgs84_kernel(latd))
+
+
+def qdrdist(latd1, lond1, latd2, lond2):
+    """ Calculate bearing and distance, using WGS'84
+        In:
+            latd1,lond1 en latd2, lond2 [deg] :positions 1 & 2
+        Out:
+            qdr [deg] = heading from 1 to 2
+            d [nm]    = distance from 1 to 2 in nm """
+    return _qdrdist_kernel(latd1, lond1, latd2, lond2)
+
+
+def qdrdist_matrix(lat1, lon1, lat2, lon2):
+    """ Calculate bearing and distance vectors, using WGS'84
+        In:
+            latd1,lond1 en latd2, lond2 [deg] :positions 1 & 2 (vectors)
+        Out:
+            qdr [deg] = heading from 1 to 2 (matrix)
+            d [nm]    = distance from 1 to 2 in nm (matrix) """
+    args = (lat1, lon1, lat2, lon2)
+    return _asmatrix(args, _qdrdist_matrix_kernel(_transpose(lat1), _transpose(lon1), lat2, lon2))
+
+
+def latlondist(latd1, lond1, latd2, lond2):
+    """ Calculates only distance using haversine notation of the same formulae and average r from wgs'84
+        Input:
+              two lat/lon positions in degrees
+        Out:
+              distance in meters !!!! """
+    return _latlondist_kernel(latd1, lond1, latd2, lond2)
+
+
+def latlondist_matrix(lat1, lon1, lat2, lon2):
+    """ Calculates distance using haversine formulae and avaerage r from wgs'84
+        Input:
+              two lat/lon position vectors in degrees
+        Out:
+              distance vector in meters !!!! """
+    args = (lat1, lon1, lat2, lon2)
+    return _asmatrix(args, _latlondist_matrix_kernel(_transpose(lat1), _transpose(lon1), lat2, lon2))
+
+
+def qdrpos(latd1, lond1, qdr, dist):
+    """ Calculate vector with positions from vectors of reference position,
+        bearing and distance.
+        In:
+             latd1,lond1  [deg]   ref position(s)
+             qdr          [deg]   bearing (vector) from 1 to 2
+             dist         [nm]    distance (vector) between 1 and 2
+        Out:
+             latd2,lond2 (IN DEGREES!) """
+    return _qdrpos_kernel(latd1, lond1, qdr, dist)
+
+
+def kwikdist(lata, lona, latb, lonb):
+    """ Quick and dirty dist [nm]
+        In:
+            lat/lon, lat/lon [deg]
+        Out:
+            dist [nm] """
+    return _kwikqdrdist_kernel(lata, lona, latb, lonb)[1]
+
+
+def kwikqdrdist(lata, lona, latb, lonb):
+    """ Gives quick and dirty qdr[deg] and dist [nm]
+        from lat/lon. (note: does not work well close to poles) """
+    return _kwikqdrdist_kernel(lata, lona, latb, lonb)
+
+
+def kwikqdrdist_matrix(lata, lona, latb, lonb):
+    """ Gives quick and dirty qdr[deg] and dist [nm] matrices
+        from lat/lon vectors. (note: does not work well close to poles) """
+    args = (lata, lona, latb, lonb)
+    return _asmatrix(args, _kwikqdrdist_kernel(_transpose(lata), _transpose(lona), latb, lonb))
@@ -1,4 +1,6 @@
 from .detection import ConflictDetection
 from .resolution import ConflictResolution
 from .statebased import StateBased
-from .mvp import MVP
\ No newline at end of file
+from .gridbased import StateBasedGrid
+from .mvp import MVP
+from .parallel import StateBasedParallel
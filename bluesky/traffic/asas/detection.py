@@ -29,16 +29,20 @@ class ConflictDetection(Entity, replaceable=True):
         self.global_dtnolook = True
 
         # Conflicts and LoS detected in the current timestep (used for resolving)
-        self.confpairs = list()
-        self.lospairs = list()
+        # as (ownship, intruder) index arrays, and per-pair conflict data
+        self.confidx = emptypairs()
+        self.losidx = emptypairs()
         self.qdr = np.array([])
         self.dist = np.array([])
         self.dcpa = np.array([])
         self.tcpa = np.array([])
         self.tLOS = np.array([])
-        # Unique conflicts and LoS in the current timestep (a, b) = (b, a)
-        self.confpairs_unique = set()
-        self.lospairs_unique = set()
+        # Unique conflicts and LoS in the current timestep (a, b) = (b, a),
+        # as sorted index arrays with idx1 < idx2
+        self.confidx_unique = emptypairs()
+        self.losidx_unique = emptypairs()
+        # Callsign views on the above, created on first use
+        self._views = dict()
 
         # All conflicts and LoS since simt=0
         self.confpairs_all = list()
@@ -58,10 +62,11 @@ class ConflictDetection(Entity, replaceable=True):
 
     def clearconfdb(self):
         ''' Clear conflict database. '''
-        self.confpairs_unique.clear()
-        self.lospairs_unique.clear()
-        self.confpairs.clear()
-        self.lospairs.clear()
+        self.confidx = emptypairs()
+        self.losidx = emptypairs()
+        self.confidx_unique = emptypairs()
+        self.losidx_unique = emptypairs()
+        self._views.clear()
         self.qdr = np.array([])
         self.dist = np.array([])
         self.dcpa = np.array([])
@@ -70,6 +75,38 @@ class ConflictDetection(Entity, replaceable=True):
         self.inconf = np.zeros(bs.traf.ntraf)
         self.tcpamax = np.zeros(bs.traf.ntraf)
 
+    @property
+    def confpairs(self):
+        ''' Conflict pairs in the current timestep as a list of
+            (ownship id, intruder id) tuples. '''
+        return self._pairview('confpairs', self.confidx, list)
+
+    @property
+    def lospairs(self):
+        ''' LoS pairs in the current timestep as a list of
+            (ownship id, intruder id) tuples. '''
+        return self._pairview('lospairs', self.losidx, list)
+
+    @property
+    def confpairs_unique(self):
+        ''' Set of unique conflict pairs in the current timestep,
+            as frozensets of aircraft ids. '''
+        return self._pairview('confpairs_unique', self.confidx_unique, set)
+
+    @property
+    def lospairs_unique(self):
+        ''' Set of unique LoS pairs in the current timestep,
+            as frozensets of aircraft ids. '''
+        return self._pairview('lospairs_unique', self.losidx_unique, set)
+
+    def _pairview(self, name, idx, viewtype):
+        ''' Return (and cache) the callsign view of a list of index pairs. '''
+        view = self._views.get(name)
+        if view is None:
+            view = viewtype(ids2pairs(idx, frozenset if viewtype is set else tuple))
+            self._views[name] = view
+        return view
+
     def create(self, n):
         super().create(n)
         # Initialise values of own states
@@ -78,6 +115,26 @@ class ConflictDetection(Entity, replaceable=True):
         self.dtlookahead[-n:] = self.dtlookahead_def
         self.dtnolook[-n:] = self.dtnolook_def
 
+    def delete(self, idx):
+        ''' Remove deleted aircraft from the conflict database, and shift the
+            indices of the remaining pairs. '''
+        keep = np.ones(len(self.inconf), dtype=bool)
+        keep[idx] = False
+        newidx = np.cumsum(keep) - 1
+
+        def remap(pairs):
+            sel = keep[pairs[0]] & keep[pairs[1]]
+            return sel, (newidx[pairs[0][sel]], newidx[pairs[1][sel]])
+
+        sel, self.confidx = remap(self.confidx)
+        self.qdr, self.dist, self.dcpa, self.tcpa, self.tLOS = \
+            (v[sel] for v in (self.qdr, self.dist, self.dcpa, self.tcpa, self.tLOS))
+        self.losidx = remap(self.losidx)[1]
+        self.confidx_unique = remap(self.confidx_unique)[1]
+        self.losidx_unique = remap(self.losidx_unique)[1]
+        self._views.clear()
+        super().delete(idx)
+
     def reset(self):
         super().reset()
         self.clearconfdb()
@@ -208,30 +265,61 @@ class ConflictDetection(Entity, replaceable=True):
 
     def update(self, ownship, intruder):
         ''' Perform an update step of the Conflict Detection implementation. '''
-        self.confpairs, self.lospairs, self.inconf, self.tcpamax, self.qdr, \
-            self.dist, self.dcpa, self.tcpa, self.tLOS = \
+        confidx, losidx, self.inconf, self.tcpamax, qdr, dist, dcpa, tcpa, tLOS = \
                 self.detect(ownship, intruder, self.rpz, self.hpz, self.dtlookahead)
+        self.confidx = pairs2idx(confidx, ownship)
+        self.losidx = pairs2idx(losidx, ownship)
+        self.qdr, self.dist, self.dcpa, self.tcpa, self.tLOS = \
+            (np.asarray(v, dtype=float) for v in (qdr, dist, dcpa, tcpa, tLOS))
+        self._views.clear()
+
+        # In ensemble runs, only aircraft of the same member can be in conflict
+        if ownship.member.any():
+            self.samemember(ownship)
 
-        # confpairs has conflicts observed from both sides (a, b) and (b, a)
-        # confpairs_unique keeps only one of these
-        confpairs_unique = {frozenset(pair) for pair in self.confpairs}
-        lospairs_unique = {frozenset(pair) for pair in self.lospairs}
+        # confidx has conflicts observed from both sides (a, b) and (b, a)
+        # confidx_unique keeps only one of these
+        confidx_unique = uniquepairs(self.confidx, ownship.ntraf)
+        losidx_unique = uniquepairs(self.losidx, ownship.ntraf)
 
-        self.confpairs_all.extend(confpairs_unique - self.confpairs_unique)
-        self.lospairs_all.extend(lospairs_unique - self.lospairs_unique)
+        # Only the pairs that are new in this timestep are converted to callsigns
+        self.confpairs_all.extend(ids2pairs(
+            newpairs(confidx_unique, self.confidx_unique, ownship.ntraf), frozenset))
+        self.lospairs_all.extend(ids2pairs(
+            newpairs(losidx_unique, self.losidx_unique, ownship.ntraf), frozenset))
 
-        # Update confpairs_unique and lospairs_unique
-        self.confpairs_unique = confpairs_unique
-        self.lospairs_unique = lospairs_unique
+        # Update confidx_unique and losidx_unique
+        self.confidx_unique = confidx_unique
+        self.losidx_unique = losidx_unique
+
+    def samemember(self, ownship):
+        ''' Remove the conflicts and LoS between aircraft of different
+            ensemble members. '''
+        member = ownship.member
+        same = member[self.confidx[0]] == member[self.confidx[1]]
+        self.confidx = (self.confidx[0][same], self.confidx[1][same])
+        self.qdr, self.dist, self.dcpa, self.tcpa, self.tLOS = \
+            (v[same] for v in (self.qdr, self.dist, self.dcpa, self.tcpa, self.tLOS))
+        same = member[self.losidx[0]] == member[self.losidx[1]]
+        self.losidx = (self.losidx[0][same], self.losidx[1][same])
+        self.inconf = np.zeros(ownship.ntraf, dtype=bool)
+        self.inconf[self.confidx[0]] = True
+        self.tcpamax = np.zeros(ownship.ntraf)
+        np.maximum.at(self.tcpamax, self.confidx[0], self.tcpa)
 
     def detect(self, ownship, intruder, rpz, hpz, dtlookahead):
         ''' Detect any conflicts between ownship and intruder.
             This function should be reimplemented in a subclass for actual
             detection of conflicts. See for instance
             bluesky.traffic.asas.statebased.
+
+            Conflict and LoS pairs are returned as tuples of (ownship, intruder)
+            index arrays, as for instance obtained with np.where() on a
+            conflict matrix. Lists of (ownship id, intruder id) tuples are
+            also accepted.
         '''
-        confpairs = []
-        lospairs = []
+        confpairs = emptypairs()
+        lospairs = emptypairs()
         inconf = np.zeros(ownship.ntraf)
         tcpamax = np.zeros(ownship.ntraf)
         qdr = np.array([])
@@ -240,3 +328,41 @@ class ConflictDetection(Entity, replaceable=True):
         tcpa = np.array([])
         tLOS = np.array([])
         return confpairs, lospairs, inconf, tcpamax, qdr, dist, dcpa, tcpa, tLOS
+
+
+def emptypairs():
+    ''' Return an empty tuple of index pair arrays. '''
+    return np.array([], dtype=int), np.array([], dtype=int)
+
+
+def pairs2idx(pairs, ownship):
+    ''' Convert detected pairs to a tuple of index arrays. Pairs can be passed
+        as index arrays, or as a list of (ownship id, intruder id) tuples. '''
+    if isinstance(pairs, list):
+        if not pairs:
+            return emptypairs()
+        ac1, ac2 = zip(*pairs)
+        pairs = ownship.id2idx(ac1), ownship.id2idx(ac2)
+    return np.asarray(pairs[0], dtype=int), np.asarray(pairs[1], dtype=int)
+
+
+def uniquepairs(pairs, ntraf):
+    ''' Return the sorted unique (idx1, idx2) pairs, where idx1 < idx2. '''
+    ntraf = max(1, ntraf)
+    key = np.unique(np.minimum(*pairs) * ntraf + np.maximum(*pairs))
+    return key // ntraf, key % ntraf
+
+
+def newpairs(pairs, prevpairs, ntraf):
+    ''' Return the unique pairs that are not in prevpairs. '''
+    key = pairs[0] * ntraf + pairs[1]
+    new = np.isin(key, prevpairs[0] * ntraf + prevpairs[1], invert=True)
+    return pairs[0][new], pairs[1][new]
+
+
+def ids2pairs(pairs, pairtype=tuple):
+    ''' Generate callsign pairs from index pairs. '''
+    if len(pairs[0]):
+        acid = bs.traf.id
+        for i, j in zip(*pairs):
+            yield pairtype((acid[i], acid[j]))
@@ -0,0 +1,244 @@
+''' State-based conflict detection on a spatial grid.
+
+    Instead of evaluating all ntraf x ntraf aircraft combinations, aircraft
+    are binned into a lat/lon/altitude grid. The cell size is chosen such that
+    two aircraft that are more than one cell apart can never be in conflict
+    within the lookahead time, so that only pairs from neighbouring cells
+    need to be evaluated. The detected conflicts are the same as those of
+    StateBased, with the conflict geometry equal up to rounding.
+'''
+import numpy as np
+from bluesky.tools import geo
+from bluesky.tools.aero import nm
+from bluesky.traffic.asas import StateBased
+from bluesky.traffic.asas.detection import emptypairs
+
+
+# Mean earth radius used by geo.kwikqdrdist [m]
+REARTH = 6371000.
+
+# Extra closing speed [m/s] and distance [m] added to the pair bounds to cover
+# rounding effects and the lower limit on the relative velocity in the CPA
+# calculation.
+VMARGIN = 1.0
+DMARGIN = 1.0
+
+
+class StateBasedGrid(StateBased):
+    ''' State-based conflict detection, evaluating only aircraft pairs from
+        neighbouring cells of a lat/lon/altitude grid. '''
+    # Maximum number of candidate pairs evaluated in one go. This limits the
+    # size of the temporary arrays for dense traffic.
+    maxpairs = 1 << 21
+
+    def detect(self, ownship, intruder, rpz, hpz, dtlookahead):
+        ''' Conflict detection between ownship (traf) and intruder (traf/adsb).'''
+        if ownship.ntraf < 2:
+            return mergeblocks(ownship.ntraf, [])
+        return mergeblocks(ownship.ntraf, [self.detectrows(
+            ownship, intruder, rpz, hpz, dtlookahead)])
+
+    def detectrows(self, ownship, intruder, rpz, hpz, dtlookahead, rows=None):
+        ''' Conflict detection for ownship rows start:end, with rows given
+            as (start, end) tuple, or all ownship rows when rows is None.
+            Returns the unsorted conflict and LoS pairs and conflict data. '''
+        blocks = [pairdetect(ownship, intruder, rpz, hpz, dtlookahead, own, intr)
+                  for own, intr in self.candidates(ownship, intruder, rpz, hpz,
+                                                   dtlookahead, rows)]
+        if not blocks:
+            return emptypairs(), emptypairs(), tuple(np.array([]) for _ in range(5))
+        confidx, losidx, confdata = zip(*blocks)
+        return tuple(np.concatenate(v) for v in zip(*confidx)), \
+            tuple(np.concatenate(v) for v in zip(*losidx)), \
+            tuple(np.concatenate(v) for v in zip(*confdata))
+
+    def candidates(self, ownship, intruder, rpz, hpz, dtlookahead, rows=None):
+        ''' Generator of blocks of candidate (ownship, intruder) index pairs,
+            taken from neighbouring grid cells. When rows is given as a
+            (start, end) tuple, only ownship rows start:end are considered. '''
+        start, end = rows or (0, ownship.ntraf)
+        if end <= start:
+            return
+        tlook = max(0.0, np.max(dtlookahead))
+        rpzmax, hpzmax = np.max(rpz), np.max(hpz)
+
+        # Horizontal cell size [m]: PZ radius plus the maximum distance two
+        # aircraft can close in within the lookahead time
+        vclose = np.max(ownship.gs) + np.max(intruder.gs) + VMARGIN
+        dcell = rpzmax + tlook * vclose + DMARGIN
+        # Vertical cell size [m]: PZ height plus maximum vertical closure
+        ownvs, intvs = np.abs(ownship.vs), np.abs(intruder.vs)
+        hcell = hpzmax + tlook * (np.max(ownvs) + np.max(intvs) + VMARGIN) + DMARGIN
+
+        # Latitude cells: angular distance is never less than dlat
+        dlatcell = np.degrees(dcell / REARTH)
+        latmin = min(np.min(ownship.lat), np.min(intruder.lat))
+        # Longitude cells: scaled with the smallest cosine of latitude in the
+        # traffic, which is a lower bound for the mean-latitude cosine of a pair
+        latmax = max(np.max(np.abs(ownship.lat)), np.max(np.abs(intruder.lat)))
+        coslat = np.cos(np.radians(min(90.0, latmax)))
+        nlon = int(360.0 * coslat / np.degrees(dcell / REARTH)) if coslat > 0.0 else 0
+        # With less than three longitude bins neighbours wrap onto themselves:
+        # use a single bin in that case
+        nlon = nlon if nlon >= 3 else 1
+        altmin = min(np.min(ownship.alt), np.min(intruder.alt))
+
+        # Integer cell coordinates. Rows (ownship) use the ownship position
+        # horizontally, but the intruder altitude, and columns the reverse,
+        # in line with the indexing of dalt in StateBased.
+        def cells(lat, lon, alt):
+            ilat = ((lat - latmin) / dlatcell).astype(np.int64) + 1
+            ilon = (((lon + 180.0) % 360.0) * (nlon / 360.0)).astype(np.int64) % nlon
+            ialt = ((alt - altmin) / hcell).astype(np.int64) + 1
+            return ilat, ilon, ialt
+
+        rlat, rlon, ralt = cells(ownship.lat[start:end], ownship.lon[start:end],
+                                 intruder.alt[start:end])
+        clat, clon, calt = cells(intruder.lat, intruder.lon, ownship.alt)
+        # Pad lat and alt ranges with one cell on each side, so neighbour
+        # offsets never alias into another row
+        nlat = max(rlat.max(), clat.max()) + 2
+        nalt = max(ralt.max(), calt.max()) + 2
+
+        # Sorted cell keys of all intruders
+        ckey = (clon * nlat + clat) * nalt + calt
+        corder = np.argsort(ckey, kind='stable')
+        ckey = ckey[corder]
+
+        # Find the range of intruders in each neighbouring cell of each ownship
+        lonoffsets = (-1, 0, 1) if nlon > 1 else (0,)
+        lo, hi = [], []
+        for dlon in lonoffsets:
+            for dlat in (-1, 0, 1):
+                for dalt in (-1, 0, 1):
+                    key = (((rlon + dlon) % nlon) * nlat + rlat + dlat) * nalt + ralt + dalt
+                    lo.append(np.searchsorted(ckey, key, 'left'))
+                    hi.append(np.searchsorted(ckey, key, 'right'))
+        lo = np.array(lo)
+        cnt = np.array(hi) - lo
+
+        # Split ownship rows in blocks of limited candidate pair count
+        rowcnt = np.cumsum(cnt.sum(axis=0))
+        bounds = np.searchsorted(rowcnt, np.arange(self.maxpairs, rowcnt[-1], self.maxpairs))
+        for bstart, bend in zip(np.r_[0, bounds], np.r_[bounds, end - start]):
+            if bend <= bstart:
+                continue
+            blo, bcnt = lo[:, bstart:bend].ravel(), cnt[:, bstart:bend].ravel()
+            total = bcnt.sum()
+            own = np.repeat(np.tile(np.arange(start + bstart, start + bend), len(lo)), bcnt)
+            # Ragged ranges lo[k]:lo[k]+cnt[k] into the sorted intruder list
+            pos = np.repeat(blo - np.cumsum(bcnt) + bcnt, bcnt) + np.arange(total)
+            intr = corder[pos]
+            # Skip ownship-ownship combinations
+            sel = own != intr
+            own, intr = own[sel], intr[sel]
+
+            # Cheap pre-selection with the closing bounds of each pair,
+            # indexed as dalt[i,j] and du[i,j] in StateBased
+            dalt = np.abs(ownship.alt[intr] - intruder.alt[own])
+            sel = dalt < hpzmax + tlook * (ownvs[intr] + intvs[own] + VMARGIN) + DMARGIN
+            own, intr = own[sel], intr[sel]
+            dlat = np.abs(intruder.lat[intr] - ownship.lat[own])
+            dlon = np.abs((intruder.lon[intr] - ownship.lon[own] + 180) % 360 - 180)
+            dmin = np.radians(np.maximum(dlat, dlon * coslat)) * REARTH
+            sel = dmin < rpzmax + tlook * (ownship.gs[intr] + intruder.gs[own] + VMARGIN) + DMARGIN
+            yield own[sel], intr[sel]
+
+
+def pairdetect(ownship, intruder, rpz, hpz, dtlookahead, own, intr):
+    ''' Evaluate the state-based conflict geometry for a list of ownship and
+        intruder index pairs. Element-wise equivalent to the matrix
+        computations in StateBased.detect. '''
+    i, j = own, intr
+
+    # Horizontal conflict ------------------------------------------------------
+    qdr, dist = geo.kwikqdrdist(ownship.lat[i], ownship.lon[i],
+                                intruder.lat[j], intruder.lon[j])
+    dist = dist * nm
+
+    # Calculate horizontal closest point of approach (CPA)
+    qdrrad = np.radians(qdr)
+    dx = dist * np.sin(qdrrad)  # is pos j rel to i
+    dy = dist * np.cos(qdrrad)  # is pos j rel to i
+
+    # Relative velocity, indexed as du[i,j] in StateBased
+    owntrkrad = np.radians(ownship.trk)
+    inttrkrad = np.radians(intruder.trk)
+    du = (ownship.gs * np.sin(owntrkrad))[j] - (intruder.gs * np.sin(inttrkrad))[i]
+    dv = (ownship.gs * np.cos(owntrkrad))[j] - (intruder.gs * np.cos(inttrkrad))[i]
+
+    dv2 = du * du + dv * dv
+    dv2 = np.where(np.abs(dv2) < 1e-6, 1e-6, dv2)  # limit lower absolute value
+    vrel = np.sqrt(dv2)
+
+    tcpa = -(du * dx + dv * dy) / dv2
+
+    # Calculate distance^2 at CPA (minimum distance^2)
+    dcpa2 = np.abs(dist * dist - tcpa * tcpa * dv2)
+
+    # Check for horizontal conflict
+    # RPZ can differ per aircraft, get the largest value per aircraft pair
+    rpzpair = np.maximum(rpz[i], rpz[j])
+    R2 = rpzpair * rpzpair
+    swhorconf = dcpa2 < R2  # conflict or not
+
+    # Calculate times of entering and leaving horizontal conflict
+    dxinhor = np.sqrt(np.maximum(0., R2 - dcpa2))  # half the distance travelled inzide zone
+    dtinhor = dxinhor / vrel
+
+    tinhor = np.where(swhorconf, tcpa - dtinhor, 1e8)  # Set very large if no conf
+    touthor = np.where(swhorconf, tcpa + dtinhor, -1e8)  # set very large if no conf
+
+    # Vertical conflict --------------------------------------------------------
+    # Vertical crossing of disk (-dh,+dh)
+    dalt = ownship.alt[j] - intruder.alt[i]
+    dvs = ownship.vs[j] - intruder.vs[i]
+    dvs = np.where(np.abs(dvs) < 1e-6, 1e-6, dvs)  # prevent division by zero
+
+    # hPZ can differ per aircraft, get the largest value per aircraft pair
+    hpzpair = np.maximum(hpz[i], hpz[j])
+    tcrosshi = (dalt + hpzpair) / -dvs
+    tcrosslo = (dalt - hpzpair) / -dvs
+    tinver = np.minimum(tcrosshi, tcrosslo)
+    toutver = np.maximum(tcrosshi, tcrosslo)
+
+    # Combine vertical and horizontal conflict----------------------------------
+    tinconf = np.maximum(tinver, tinhor)
+    toutconf = np.minimum(toutver, touthor)
+
+    swconfl = swhorconf * (tinconf <= toutconf) * (toutconf > 0.0) * \
+        (tinconf < dtlookahead[i])
+    swlos = (dist < rpzpair) * (np.abs(dalt) < hpzpair)
+
+    return (own[swconfl], intr[swconfl]), (own[swlos], intr[swlos]), \
+        (qdr[swconfl], dist[swconfl], np.sqrt(dcpa2[swconfl]), tcpa[swconfl],
+         tinconf[swconfl])
+
+
+def mergeblocks(ntraf, blocks):
+    ''' Merge the conflict and LoS pairs and conflict data of a list of
+        detectrows() results into the outputs of detect(). '''
+    inconf = np.zeros(ntraf, dtype=bool)
+    tcpamax = np.zeros(ntraf)
+    if not blocks:
+        return emptypairs(), emptypairs(), inconf, tcpamax, np.array([]), \
+            np.array([]), np.array([]), np.array([]), np.array([])
+
+    # Sort pairs in row-major order, equal to the order of
+    # np.where(swconfl) for the full conflict matrix in StateBased
+    confidx, losidx, confdata = zip(*blocks)
+    cown, cint = (np.concatenate(v) for v in zip(*confidx))
+    lown, lint = (np.concatenate(v) for v in zip(*losidx))
+    corder = np.lexsort((cint, cown))
+    lorder = np.lexsort((lint, lown))
+    cown, cint = cown[corder], cint[corder]
+    lown, lint = lown[lorder], lint[lorder]
+    qdr, dist, dcpa, tcpa, tinconf = \
+        (np.concatenate(v)[corder] for v in zip(*confdata))
+
+    # Ownship conflict flag and max tCPA
+    inconf[cown] = True
+    np.maximum.at(tcpamax, cown, tcpa)
+
+    return (cown, cint), (lown, lint), inconf, tcpamax, \
+        qdr, dist, dcpa, tcpa, tinconf
@@ -91,72 +91,52 @@ class MVP(ConflictResolution):
             # Do NOT swtich off self.swresohoriz if value == OFF
             self.swresovert = False
 
-    def applyprio(self, dv_mvp, dv1, dv2, vs1, vs2):
-        ''' Apply the desired priority setting to the resolution '''
+    def applyprio(self, dv_mvp, vs1, vs2):
+        ''' Apply the desired priority setting to the resolution vectors of
+            all conflict pairs. Returns the (modified) resolution vectors, and
+            a mask of the pairs in which the ownship resolves the conflict. '''
+        # Aircraft 1 is cruising, and aircraft 2 is climbing/descending
+        cruise1 = (np.abs(vs1) < 0.1) & (np.abs(vs2) > 0.1)
+        # Aircraft 2 is cruising, and aircraft 1 is climbing/descending
+        cruise2 = (np.abs(vs2) < 0.1) & (np.abs(vs1) > 0.1)
 
         # Primary Free Flight prio rules (no priority)
         if self.priocode == 'FF1':
             # since cooperative, the vertical resolution component can be halved, and then dv_mvp can be added
             dv_mvp[2] = dv_mvp[2] / 2.0
-            dv1 = dv1 - dv_mvp
-            dv2 = dv2 + dv_mvp
+            ownreso = np.ones(len(vs1), dtype=bool)
 
         # Secondary Free Flight (Cruising aircraft has priority, combined resolutions)
-        if self.priocode == 'FF2':
+        elif self.priocode == 'FF2':
             # since cooperative, the vertical resolution component can be halved, and then dv_mvp can be added
-            dv_mvp[2] = dv_mvp[2]/2.0
+            dv_mvp[2] = dv_mvp[2] / 2.0
             # If aircraft 1 is cruising, and aircraft 2 is climbing/descending -> aircraft 2 solves conflict
-            if abs(vs1) < 0.1 and abs(vs2) > 0.1:
-                dv2 = dv2 + dv_mvp
-            # If aircraft 2 is cruising, and aircraft 1 is climbing -> aircraft 1 solves conflict
-            elif abs(vs2) < 0.1 and abs(vs1) > 0.1:
-                dv1 = dv1 - dv_mvp
-            else:  # both are climbing/descending/cruising -> both aircraft solves the conflict
-                dv1 = dv1 - dv_mvp
-                dv2 = dv2 + dv_mvp
+            # Otherwise aircraft 1 solves the conflict, on its own or together with aircraft 2
+            ownreso = ~cruise1
 
         # Tertiary Free Flight (Climbing/descending aircraft have priority and crusing solves with horizontal resolutions)
         elif self.priocode == 'FF3':
-            # If aircraft 1 is cruising, and aircraft 2 is climbing/descending -> aircraft 1 solves conflict horizontally
-            if abs(vs1) < 0.1 and abs(vs2) > 0.1:
-                dv_mvp[2] = 0.0
-                dv1 = dv1 - dv_mvp
-            # If aircraft 2 is cruising, and aircraft 1 is climbing -> aircraft 2 solves conflict horizontally
-            elif abs(vs2) < 0.1 and abs(vs1) > 0.1:
-                dv_mvp[2] = 0.0
-                dv2 = dv2 + dv_mvp
-            else:  # both are climbing/descending/cruising -> both aircraft solves the conflict, combined
-                dv_mvp[2] = dv_mvp[2]/2.0
-                dv1 = dv1 - dv_mvp
-                dv2 = dv2 + dv_mvp
+            # If one of the aircraft is cruising, and the other is climbing/descending -> the cruising
+            # aircraft solves the conflict horizontally. Otherwise both aircraft solve the conflict, combined
+            dv_mvp[2] = np.where(cruise1 | cruise2, 0.0, dv_mvp[2] / 2.0)
+            ownreso = ~cruise2
 
         # Primary Layers (Cruising aircraft has priority and clmibing/descending solves. All conflicts solved horizontally)
         elif self.priocode == 'LAY1':
             dv_mvp[2] = 0.0
             # If aircraft 1 is cruising, and aircraft 2 is climbing/descending -> aircraft 2 solves conflict horizontally
-            if abs(vs1) < 0.1 and abs(vs2) > 0.1:
-                dv2 = dv2 + dv_mvp
-            # If aircraft 2 is cruising, and aircraft 1 is climbing -> aircraft 1 solves conflict horizontally
-            elif abs(vs2) < 0.1 and abs(vs1) > 0.1:
-                dv1 = dv1 - dv_mvp
-            else:  # both are climbing/descending/cruising -> both aircraft solves the conflict horizontally
-                dv1 = dv1 - dv_mvp
-                dv2 = dv2 + dv_mvp
+            ownreso = ~cruise1
 
         # Secondary Layers (Climbing/descending aircraft has priority and cruising solves. All conflicts solved horizontally)
         elif self.priocode == 'LAY2':
             dv_mvp[2] = 0.0
-            # If aircraft 1 is cruising, and aircraft 2 is climbing/descending -> aircraft 1 solves conflict horizontally
-            if abs(vs1) < 0.1 and abs(vs2) > 0.1:
-                dv1 = dv1 - dv_mvp
             # If aircraft 2 is cruising, and aircraft 1 is climbing -> aircraft 2 solves conflict horizontally
-            elif abs(vs2) < 0.1 and abs(vs1) > 0.1:
-                dv2 = dv2 + dv_mvp
-            else:  # both are climbing/descending/cruising -> both aircraft solves the conflic horizontally
-                dv1 = dv1 - dv_mvp
-                dv2 = dv2 + dv_mvp
+            ownreso = ~cruise2
+
+        else:
+            ownreso = np.zeros(len(vs1), dtype=bool)
 
-        return dv1, dv2
+        return dv_mvp, ownreso
 
 
     def resolve(self, conf, ownship, intruder):
@@ -167,34 +147,30 @@ class MVP(ConflictResolution):
         # Initialize an array to store time needed to resolve vertically
         timesolveV = np.ones(ownship.ntraf) * 1e9
 
-        # Call MVP function to resolve conflicts-----------------------------------
-        for ((ac1, ac2), qdr, dist, tcpa, tLOS) in zip(conf.confpairs, conf.qdr, conf.dist, conf.tcpa, conf.tLOS):
-            idx1 = ownship.id.index(ac1)
-            idx2 = intruder.id.index(ac2)
+        # Call MVP function to resolve all conflict pairs at once------------------
+        # Because ADSB is ON, this is done for each aircraft separately
+        idx1, idx2 = conf.confidx
+        dv_mvp, tsolV = self.MVP(ownship, intruder, conf, conf.qdr, conf.dist,
+                                 conf.tcpa, conf.tLOS, idx1, idx2)
+        np.fmin.at(timesolveV, idx1, tsolV)
 
-            # If A/C indexes are found, then apply MVP on this conflict pair
-            # Because ADSB is ON, this is done for each aircraft separately
-            if idx1 >-1 and idx2 > -1:
-                dv_mvp, tsolV = self.MVP(ownship, intruder, conf, qdr, dist, tcpa, tLOS, idx1, idx2)
-                if tsolV < timesolveV[idx1]:
-                    timesolveV[idx1] = tsolV
-
-                # Use priority rules if activated
-                if self.swprio:
-                    dv[idx1], _ = self.applyprio(dv_mvp, dv[idx1], dv[idx2], ownship.vs[idx1], intruder.vs[idx2])
-                else:
-                    # since cooperative, the vertical resolution component can be halved, and then dv_mvp can be added
-                    dv_mvp[2] = 0.5 * dv_mvp[2]
-                    dv[idx1] = dv[idx1] - dv_mvp
+        # Use priority rules if activated
+        if self.swprio:
+            dv_mvp, ownreso = self.applyprio(dv_mvp, ownship.vs[idx1], intruder.vs[idx2])
+        else:
+            # since cooperative, the vertical resolution component can be halved, and then dv_mvp can be added
+            dv_mvp[2] = 0.5 * dv_mvp[2]
+            ownreso = np.ones(len(idx1), dtype=bool)
 
-                # Check the noreso aircraft. Nobody avoids noreso aircraft.
-                # But noreso aircraft will avoid other aircraft
-                if self.noresoac[idx2]:
-                    dv[idx1] = dv[idx1] + dv_mvp
+        # Sum the resolutions per ownship, in the order of the conflict pairs.
+        # Check the noreso aircraft. Nobody avoids noreso aircraft.
+        # But noreso aircraft will avoid other aircraft
+        sel = np.column_stack((ownreso, self.noresoac[idx2])).ravel()
+        np.add.at(dv, np.repeat(idx1, 2)[sel],
+                  np.stack((-dv_mvp.T, dv_mvp.T), axis=1).reshape(-1, 3)[sel])
 
-                # Check the resooff aircraft. These aircraft will not do resolutions.
-                if self.resooffac[idx1]:
-                    dv[idx1] = 0.0
+        # Check the resooff aircraft. These aircraft will not do resolutions.
+        dv[self.resooffac] = 0.0
 
 
         # Determine new speed and limit resolution direction for all aicraft-------
@@ -265,11 +241,12 @@ class MVP(ConflictResolution):
         return newtrack, newgscapped, vscapped, alt
 
     def MVP(self, ownship, intruder, conf, qdr, dist, tcpa, tLOS, idx1, idx2):
-        """Modified Voltage Potential (MVP) resolution method"""
+        """Modified Voltage Potential (MVP) resolution method, for arrays of
+           conflict pairs"""
         # Preliminary calculations-------------------------------------------------
         # Determine largest RPZ and HPZ of the conflict pair, use lookahead of ownship
-        rpz_m = np.max(conf.rpz[[idx1, idx2]] * self.resofach)
-        hpz_m = np.max(conf.hpz[[idx1, idx2]] * self.resofacv)
+        rpz_m = np.maximum(conf.rpz[idx1] * self.resofach, conf.rpz[idx2] * self.resofach)
+        hpz_m = np.maximum(conf.hpz[idx1] * self.resofacv, conf.hpz[idx2] * self.resofacv)
         dtlook = conf.dtlookahead[idx1]
         # Convert qdr from degrees to radians
         qdr = np.radians(qdr)
@@ -296,43 +273,44 @@ class MVP(ConflictResolution):
 
         # Exception handlers for head-on conflicts
         # This is done to prevent division by zero in the next step
-        if dabsH <= 10.:
-            dabsH = 10.
-            dcpa[0] = drel[1] / dist * dabsH
-            dcpa[1] = -drel[0] / dist * dabsH
+        headon = dabsH <= 10.
+        dabsH[headon] = 10.
+        dcpa[0, headon] = drel[1, headon] / dist[headon] * 10.
+        dcpa[1, headon] = -drel[0, headon] / dist[headon] * 10.
 
         # If intruder is outside the ownship PZ, then apply extra factor
         # to make sure that resolution does not graze IPZ
-        if rpz_m < dist and dabsH < dist:
-            # Compute the resolution velocity vector in horizontal direction.
-            # abs(tcpa) because it bcomes negative during intrusion.
-            erratum = np.cos(np.arcsin(rpz_m / dist)-np.arcsin(dabsH / dist))
-            dv1 = ((rpz_m / erratum - dabsH) * dcpa[0]) / (abs(tcpa) * dabsH)
-            dv2 = ((rpz_m / erratum - dabsH) * dcpa[1]) / (abs(tcpa) * dabsH)
-        else:
-            dv1 = (iH * dcpa[0]) / (abs(tcpa) * dabsH)
-            dv2 = (iH * dcpa[1]) / (abs(tcpa) * dabsH)
+        graze = (rpz_m < dist) & (dabsH < dist)
+        # Compute the resolution velocity vector in horizontal direction.
+        # abs(tcpa) because it bcomes negative during intrusion.
+        iH[graze] = rpz_m[graze] / np.cos(np.arcsin(rpz_m[graze] / dist[graze]) -
+                                          np.arcsin(dabsH[graze] / dist[graze])) - dabsH[graze]
+        dv1 = (iH * dcpa[0]) / (np.abs(tcpa) * dabsH)
+        dv2 = (iH * dcpa[1]) / (np.abs(tcpa) * dabsH)
 
         # Vertical resolution------------------------------------------------------
 
         # Compute the  vertical intrusion
         # Amount of vertical intrusion dependent on vertical relative velocity
-        iV = hpz_m if abs(vrel[2]) > 0.0 else hpz_m - abs(drel[2])
+        vertical = np.abs(vrel[2]) > 0.0
+        iV = np.where(vertical, hpz_m, hpz_m - np.abs(drel[2]))
 
         # Get the time to solve the conflict vertically - tsolveV
-        tsolV = abs(drel[2] / vrel[2]) if abs(vrel[2]) > 0.0 else tLOS
+        tsolV = np.array(tLOS, dtype=float)
+        tsolV[vertical] = np.abs(drel[2, vertical] / vrel[2, vertical])
 
         # If the time to solve the conflict vertically is longer than the look-ahead time,
         # because the the relative vertical speed is very small, then solve the intrusion
         # within tinconf
-        if tsolV > dtlook:
-            tsolV = tLOS
-            iV    = hpz_m
+        slow = tsolV > dtlook
+        tsolV[slow] = tLOS[slow]
+        iV[slow] = hpz_m[slow]
 
         # Compute the resolution velocity vector in the vertical direction
         # The direction of the vertical resolution is such that the aircraft with
         # higher climb/decent rate reduces their climb/decent rate
-        dv3 = np.where(abs(vrel[2]) > 0.0, (iV / tsolV) * (-vrel[2] / abs(vrel[2])), (iV / tsolV))
+        dv3 = iV / tsolV
+        dv3[vertical] *= -vrel[2, vertical] / np.abs(vrel[2, vertical])
 
         # It is necessary to cap dv3 to prevent that a vertical conflict
         # is solved in 1 timestep, leading to a vertical separation that is too
@@ -0,0 +1,125 @@
+''' Parallel grid-based state-based conflict detection.
+
+    The ownship rows are partitioned over a pool of worker processes, which
+    each run the grid-based detection of StateBasedGrid for their rows. The
+    traffic state is passed to the workers through a shared-memory buffer,
+    so that only the row ranges and the (small) detection results are sent
+    between processes each step. The outputs are identical to those of
+    StateBasedGrid.
+'''
+import atexit
+import os
+import weakref
+from multiprocessing import get_context, shared_memory
+from types import SimpleNamespace
+import numpy as np
+
+import bluesky as bs
+from bluesky.network.sharedstate import attach
+from bluesky.stack import command
+from bluesky.traffic.asas.gridbased import StateBasedGrid, mergeblocks
+
+
+# Number of worker processes. Zero uses one worker per cpu core.
+bs.settings.set_variable_defaults(asas_nworkers=0)
+
+# State arrays copied to shared memory, per ownship/intruder
+STATEVARS = ('lat', 'lon', 'alt', 'trk', 'gs', 'vs')
+# Number of rows of the shared state buffer: ownship and intruder state,
+# and the per-aircraft rpz, hpz and dtlookahead
+NROWS = 2 * len(STATEVARS) + 3
+
+# Detection objects with a worker pool, which is stopped at exit
+instances = weakref.WeakSet()
+
+
+@atexit.register
+def closepools():
+    ''' Stop the worker pools of all parallel detection objects. '''
+    for cd in list(instances):
+        cd.closepool()
+
+
+class StateBasedParallel(StateBasedGrid):
+    ''' Grid-based state-based conflict detection, with the ownship rows
+        divided over a pool of worker processes. '''
+    # Below this number of aircraft detection is done in this process
+    minparallel = 2000
+    # Number of row ranges per worker, to balance the load between workers
+    chunksperworker = 4
+
+    def __init__(self):
+        super().__init__()
+        self.nworkers = bs.settings.asas_nworkers or os.cpu_count()
+        self.pool = None
+        self.shm = None
+
+    def closepool(self):
+        ''' Stop the worker processes and release the shared memory. '''
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    @command(name='CDWORKERS')
+    def setnworkers(self, nworkers: int = -1):
+        ''' Set the number of worker processes for parallel conflict detection.
+            Zero uses one worker per cpu core. '''
+        if nworkers < 0:
+            return True, f'CDWORKERS [n]\nCurrent number of CD workers: {self.nworkers}'
+        self.closepool()
+        self.nworkers = nworkers or os.cpu_count()
+        return True, f'Using {self.nworkers} worker processes for conflict detection'
+
+    def detect(self, ownship, intruder, rpz, hpz, dtlookahead):
+        ''' Conflict detection between ownship (traf) and intruder (traf/adsb).'''
+        ntraf = ownship.ntraf
+        if ntraf < max(2, self.minparallel) or self.nworkers < 2:
+            return super().detect(ownship, intruder, rpz, hpz, dtlookahead)
+
+        # Copy the state to the shared buffer, growing it when necessary
+        if self.pool is None:
+            self.pool = get_context('spawn').Pool(self.nworkers)
+            instances.add(self)
+        if self.shm is None or self.shm.size < NROWS * ntraf * 8:
+            if self.shm is not None:
+                self.shm.close()
+                self.shm.unlink()
+            self.shm = shared_memory.SharedMemory(create=True, size=NROWS * 2 * ntraf * 8)
+        capacity = self.shm.size // (NROWS * 8)
+        state = np.ndarray((NROWS, capacity), buffer=self.shm.buf)
+        for i, name in enumerate(STATEVARS):
+            state[i, :ntraf] = getattr(ownship, name)
+            state[len(STATEVARS) + i, :ntraf] = getattr(intruder, name)
+        state[-3:, :ntraf] = rpz, hpz, dtlookahead
+
+        # Divide the ownship rows in ranges, and detect in the workers
+        bounds = np.linspace(0, ntraf, self.nworkers * self.chunksperworker + 1).astype(int)
+        tasks = [(self.shm.name, capacity, ntraf, self.maxpairs, (start, end))
+                 for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+        return mergeblocks(ntraf, self.pool.starmap(detectrows, tasks))
+
+
+# Shared memory buffer attached to in a worker process
+workershm = None
+
+
+def detectrows(shmname, capacity, ntraf, maxpairs, rows):
+    ''' Worker function: grid-based detection for ownship rows start:end,
+        with the traffic state taken from shared memory buffer shmname. '''
+    global workershm
+    if workershm is None or workershm.name != shmname:
+        if workershm is not None:
+            workershm.close()
+        workershm = attach(shmname)
+    state = np.ndarray((NROWS, capacity), buffer=workershm.buf)[:, :ntraf]
+    nvars = len(STATEVARS)
+    ownship = SimpleNamespace(ntraf=ntraf, **dict(zip(STATEVARS, state[:nvars])))
+    intruder = SimpleNamespace(ntraf=ntraf, **dict(zip(STATEVARS, state[nvars:2 * nvars])))
+    cd = object.__new__(StateBasedGrid)
+    cd.maxpairs = maxpairs
+    return cd.detectrows(ownship, intruder, *state[-3:], rows)
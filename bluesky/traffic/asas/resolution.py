@@ -101,7 +101,7 @@ class ConflictResolution(Entity, replaceable=True):
         ''' Perform an update step of the Conflict Resolution implementation. '''
         if ConflictResolution.selected() is not ConflictResolution:
             # Only perform CR when an actual method is selected
-            if conf.confpairs:
+            if len(conf.confidx[0]):
                 self.trk, self.tas, self.vs, self.alt = self.resolve(conf, ownship, intruder)
             self.resumenav(conf, ownship, intruder)
 
@@ -5,93 +5,97 @@ KL204 ATALT FL100 KL204 SPD 350
 import numpy as np
 import bluesky as bs
 from bluesky import stack
+from bluesky.core import TrafficArrays
 from bluesky.tools.geo import qdrdist
 
 # Enumerated condtion types
 alttype, spdtype, postype = 0, 1, 2
 
-
-class Condition():
+# Data per condition
+conddtype = np.dtype([
+    ('acidx', int),       # Index of aircraft of condition
+    ('member', int),      # Ensemble member of the aircraft (0 if none)
+    ('condtype', int),    # Condition type (0=alt,1=spd,2=pos)
+    ('target', float),    # Target value (alt,speed,distance[nm])
+    ('lastdif', float),   # Difference during last update
+    ('lat', float),       # Reference position for postype [deg]
+    ('lon', float)])
+
+
+class Condition(TrafficArrays):
+    ''' Conditional commands. The conditions are stored in arrays with the
+        index of their aircraft, which are kept up to date when aircraft
+        are deleted, so that all conditions are evaluated in one vectorised
+        pass per update. '''
     def __init__(self):
-
+        super().__init__()
         self.ncond = 0  # Number of conditions
-
-        self.id       = []                         # Id of aircraft of condition
-        self.condtype = np.array([],dtype=int)     # Condition type (0=alt,1=spd)
-        self.target   = np.array([],dtype=float)   # Target value (alt,speed,distance[nm])
-        self.lastdif  = np.array([],dtype=float)   # Difference during last update
-        self.posdata  = []                         # Data for postype: tuples lat[deg],lon[deg] of ref position
-        self.cmd      = []                         # Commands to be issued
+        self.data = np.zeros(16, dtype=conddtype)  # Condition data, with spare capacity
+        self.cmd = []   # Commands to be issued
+
+    @property
+    def conditions(self):
+        ''' The data of the current conditions. '''
+        return self.data[:self.ncond]
+
+    def reset(self):
+        ''' Remove all conditions. '''
+        super().reset()
+        self.ncond = 0
+        self.data = np.zeros(16, dtype=conddtype)
+        self.cmd = []
+
+    def delete(self, idx):
+        ''' Remove the conditions of deleted aircraft, and update the aircraft
+            indices of the remaining conditions. '''
+        super().delete(idx)
+        if self.ncond == 0:
+            return
+        delidx = np.sort(np.atleast_1d(idx))
+        cond = self.conditions
+        keep = ~np.isin(cond['acidx'], delidx)
+        cond['acidx'] -= np.searchsorted(delidx, cond['acidx'])
+        self.compact(keep)
+
+    def compact(self, keep):
+        ''' Keep only the conditions for which keep is True. '''
+        nkeep = np.count_nonzero(keep)
+        if nkeep < self.ncond:
+            self.data[:nkeep] = self.conditions[keep]
+            self.cmd = [cmd for cmd, k in zip(self.cmd, keep) if k]
+            self.ncond = nkeep
 
     def update(self):
-        if self.ncond==0:
+        if self.ncond == 0:
             return
 
-        # Update indices based on list of id's
-        acidxlst = np.array(bs.traf.id2idx(self.id))
-        if len(acidxlst)>0:
-            idelcond = sorted(list(np.where(acidxlst<0)[0]))
-            for i in idelcond[::-1]:
-                del (self.id[i])
-                self.condtype = np.delete(self.condtype, i)
-                self.target = np.delete(self.target, i)
-                self.lastdif = np.delete(self.lastdif, i)
-                del self.posdata[i]
-                del self.cmd[i]
-
-            self.ncond = len(self.id)
-            if self.ncond==0:
-                return
-            acidxlst = np.array(bs.traf.id2idx(self.id))
-
-        # Check condition types
-        actdist = np.ones(self.ncond)*999e9  # Invalid number which never triggers anything is extremely large
-        for j in range(self.ncond):
-            if self.condtype[j] == postype:
-                qdr,dist = qdrdist(bs.traf.lat[acidxlst[j]],bs.traf.lon[acidxlst[j]],self.posdata[j][0],self.posdata[j][1])
-                actdist[j] = dist # [nm]
-
-        # Get relevant actual value using index list as index to numpy arrays
-        self.actual = (self.condtype == alttype) * bs.traf.alt[acidxlst] + \
-                      (self.condtype == spdtype) * bs.traf.cas[acidxlst] + \
-                      (self.condtype == postype) * actdist
+        cond = self.conditions
+        acidx = cond['acidx']
 
-        # Compare sign of actual difference with sign of last difference
-        actdif       = self.target - self.actual
+        # Get relevant actual value of each condition
+        actual = np.where(cond['condtype'] == alttype, bs.traf.alt[acidx], bs.traf.cas[acidx])
+        ipos = np.flatnonzero(cond['condtype'] == postype)
+        if len(ipos):
+            _, actual[ipos] = qdrdist(bs.traf.lat[acidx[ipos]], bs.traf.lon[acidx[ipos]],
+                                      cond['lat'][ipos], cond['lon'][ipos])  # [nm]
 
-        # Make sorted arrya of indices of true conditions and their conditional commands
-        idxtrue      = sorted(list(np.where(actdif*self.lastdif <= 0.0)[0]))# Sign changed
-        self.lastdif = actdif
-        if idxtrue==None or len(idxtrue)==0:
+        # Compare sign of actual difference with sign of last difference
+        actdif = cond['target'] - actual
+        istrue = actdif * cond['lastdif'] <= 0.0  # Sign changed
+        cond['lastdif'] = actdif
+        if not istrue.any():
             return
 
-
-        # Execute commands found to have true condition
-        for i in idxtrue:
-            if i>=0:
-                stack.stack(self.cmd[i])
-                # debug
-                # stack.stack(" ECHO Conditional command issued: "+self.cmd[i])
-
-        # Delete executed commands to clean up arrays and lists
-        # from highest index to lowest for consistency
-        for i in idxtrue[::-1]:
-            if i>=0:
-                del self.id[i]
-                self.condtype = np.delete(self.condtype,i)
-                self.target   = np.delete(self.target,i)
-                self.lastdif  = np.delete(self.lastdif,i)
-                del self.posdata[i]
-                del self.cmd[i]
-
-        # Adjust number of conditions
-        self.ncond = len(self.id)
-
-        if self.ncond!=len(self.cmd):
-            print ("self.ncond=",self.ncond)
-            print ("self.cmd=",self.cmd)
-            print ("traffic/conditional.py: self.delcondition: invalid condition array size")
-        return
+        # Execute commands found to have true condition, and remove them.
+        # Commands of ensemble members are stacked in their member's context
+        itrue = np.flatnonzero(istrue)
+        members = cond['member'][itrue]
+        if members.any():
+            for i, k in zip(itrue, members):
+                bs.sim.ensemble.stack(k, self.cmd[i])
+        else:
+            stack.stack(*(self.cmd[i] for i in itrue))
+        self.compact(~istrue)
 
     def ataltcmd(self,acidx,targalt,cmdtxt):
         actalt = bs.traf.alt[acidx]
@@ -99,7 +103,7 @@ class Condition():
         return True
 
     def atspdcmd(self, acidx, targspd, cmdtxt):
-        actspd = bs.traf.tas[acidx]
+        actspd = bs.traf.cas[acidx]
         self.addcondition(acidx, spdtype, targspd, actspd,cmdtxt)
         return True
 
@@ -109,35 +113,15 @@ class Condition():
         return True
 
     def addcondition(self,acidx, icondtype, target, actual, cmdtxt,latlon=None):
-        #print ("addcondition:", acidx, icondtype, target, actual, cmdtxt, latlon)
+        # Double the capacity of the condition data when it is full
+        if self.ncond == len(self.data):
+            data = np.zeros(2 * len(self.data), dtype=conddtype)
+            data[:self.ncond] = self.data
+            self.data = data
 
         # Add condition to arrays
-        self.id.append(bs.traf.id[acidx])
-
-        self.condtype = np.append(self.condtype,icondtype)
-        self.target   = np.append(self.target,target)
-        self.lastdif  = np.append(self.lastdif,target - actual)
-
-        self.posdata.append(latlon)
+        lat, lon = latlon or (np.nan, np.nan)
+        self.data[self.ncond] = (acidx, bs.traf.member[acidx], icondtype,
+                                 target, target - actual, lat, lon)
         self.cmd.append(cmdtxt)
-
-        self.ncond = self.ncond+1
-        #print("addcondition: self.ncond",self.ncond)
-        return
-
-    def renameac(self,oldid,newid):
-        # Continonal commands are stored per id (ac name)
-        # When renamed, call this method to update list
-        # rename ids in list of ids
-        # Call this if RENAME command is implemented
-        if self.id.count(old.id) == 0:
-            return
-        for i in range(len(self.id)):
-            if self.id[i] == oldid:
-                self.id[i] = newid
-        return
-
-
-
-
-
+        self.ncond += 1
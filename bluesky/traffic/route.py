@@ -42,6 +42,8 @@ class Route(Replaceable):
         Route._routes[acid] = self
         # Aircraft id (callsign) of the aircraft to which this route belongs
         self.acid = acid
+        # Ensemble member of the aircraft, in whose context waypoint commands run
+        self.member = bs.traf.curmember
         self.nwp = 0
 
        # Waypoint data
@@ -95,7 +97,7 @@ class Route(Replaceable):
         fmt_ = "{:0" + str(len_) + "d}"
 
         # Avoid using call sign without number
-        if bs.traf.id.count(name_) > 0:
+        if name_ in bs.traf.ididx:
             appi = 1
             name_ = name_+fmt_.format(appi)
 
@@ -604,15 +606,16 @@ class Route(Replaceable):
 
                     # IF command starts with aircraft id, it is not missing
                     cmd = args[1].upper()
-                    if not(cmd in bs.traf.id):
+                    if bs.traf.id2idx(cmd) < 0:
                         # Look up arg types
                         try:
                             cmdobj = Command.cmddict.get(cmd)
 
                             # Command found, check arguments
-                            argtypes = cmdobj.annotations
+                            argtypes = [param.annotation for param in cmdobj.params]
 
-                            if argtypes[0]=="acid" and not (args[2].upper() in bs.traf.id):
+                            if argtypes and argtypes[0]=="acid" and \
+                                    (len(args) < 3 or bs.traf.id2idx(args[2]) < 0):
                                 # missing acid, so add ownship acid
                                 acrte.wpstack[wpidx].append(acid+" "+" ".join(args[1:]))
                             else:
@@ -1112,6 +1115,9 @@ class Route(Replaceable):
                nextqdr, swlastwp
 
     def runactwpstack(self):
+        if self.member:
+            bs.sim.ensemble.stack(self.member, *self.wpstack[self.iactwp])
+            return
         for cmdline in self.wpstack[self.iactwp]:
             stack.stack(cmdline)
             #debug
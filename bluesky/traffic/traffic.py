@@ -10,8 +10,9 @@ from random import randint
 import numpy as np
 
 import bluesky as bs
-from bluesky.core import Entity, timed_function
+from bluesky.core import Entity, timed_function, profiler
 from bluesky.stack import refdata
+from bluesky.stack.argparser import argparsers, re_splitargs, ArgumentError
 from bluesky.stack.recorder import savecmd
 from bluesky.tools import geo
 from bluesky.tools.misc import latlon2txt
@@ -84,10 +85,18 @@ class Traffic(Entity):
         # Default commands issued for an aircraft after creation
         self.crecmdlist = []
 
+        # Callsign to index map, kept up to date on create, delete and reset
+        self.ididx = dict()
+
+        # Ensemble member in whose context aircraft are created and
+        # callsigns are looked up (0 outside ensemble runs)
+        self.curmember = 0
+
         with self.settrafarrays():
             # Aircraft Info
             self.id      = []  # identifier (string)
             self.type    = []  # aircaft type (string)
+            self.member  = np.array([], dtype=int)  # ensemble member (0 if none)
 
             # Positions
             self.lat     = np.array([])  # latitude [deg]
@@ -168,6 +177,8 @@ class Traffic(Entity):
         # This ensures that the traffic arrays (which size is dynamic)
         # are all reset as well, so all lat,lon,sdp etc but also objects adsb
         super().reset()
+        self.ididx.clear()
+        self.curmember = 0
 
         # reset performance model
         self.perf.reset()
@@ -203,15 +214,22 @@ class Traffic(Entity):
 
 
     def cre(self, acid, actype="B744", aclat=52., aclon=4., achdg=None, acalt=0, acspd=0):
-        """ Create one or more aircraft. """
+        """ Create one or more aircraft.
+
+            All arguments can be single values, or sequences/arrays with one
+            value per aircraft. Creating many aircraft with a single call is
+            much faster than creating them one by one. """
         # Determine number of aircraft to create from array length of acid
         n = 1 if isinstance(acid, str) else len(acid)
 
         if isinstance(acid, str):
             # Check if not already exist
-            if self.id.count(acid.upper()) > 0:
+            acid = self.memberid(acid)
+            if acid.upper() in self.ididx:
                 return False, acid + " already exists."  # already exists do nothing
             acid = n * [acid]
+        elif self.curmember:
+            acid = [self.memberid(acidi) for acidi in acid]
 
         # Adjust the size of all traffic arrays
         super().create(n)
@@ -220,21 +238,21 @@ class Traffic(Entity):
         if isinstance(actype, str):
             actype = n * [actype]
 
-        if isinstance(aclat, (float, int)):
-            aclat = np.array(n * [aclat])
+        achdg = (refdata.hdg or 0.0) if achdg is None else achdg
 
-        if isinstance(aclon, (float, int)):
-            aclon = np.array(n * [aclon])
+        # Make arrays of all numerical arguments
+        aclat, aclon, achdg, acalt, acspd = [np.broadcast_to(v, n).astype(float)
+                                             for v in (aclat, aclon, achdg, acalt, acspd)]
 
         # Limit longitude to [-180.0, 180.0]
         aclon[aclon > 180.0] -= 360.0
         aclon[aclon < -180.0] += 360.0
 
-        achdg = (refdata.hdg or 0.0) if achdg is None else achdg
-
         # Aircraft Info
         self.id[-n:]   = acid
+        self.ididx.update(zip(acid, range(self.ntraf - n, self.ntraf)))
         self.type[-n:] = actype
+        self.member[-n:] = self.curmember
 
         # Positions
         self.lat[-n:]  = aclat
@@ -302,6 +320,46 @@ class Traffic(Entity):
                  bs.stack.stack(self.id[j]+" "+cmdtxt)
 
 
+    def crebulk(self, acdata):
+        """ CREBULK acid,type,lat,lon,hdg,alt,spd,[acid,type,lat,lon,hdg,alt,spd,...]
+
+            Create multiple aircraft with one command. All aircraft are
+            created in one go, which is much faster than separate CRE
+            commands when loading large numbers of aircraft. """
+        parsers = [argparsers[argtype] for argtype in
+                   ('txt', 'txt', 'latlon', 'hdg', 'alt', 'spd')]
+        # Parse the data per aircraft, to keep the strings passed to the
+        # argument parsers short. An aircraft takes at most seven arguments.
+        tokens = [m.group() for m in re_splitargs.finditer(acdata) if m.group()]
+        args = []
+        pos = 0
+        try:
+            while pos < len(tokens):
+                window = tokens[pos:pos + 7]
+                acargs = ''.join(window)
+                for parser in parsers:
+                    *values, acargs = parser.parse(acargs)
+                    args.extend(values)
+                # Skip the arguments used by this aircraft
+                ntok, rest = len(window), len(acargs)
+                while rest > 0:
+                    ntok -= 1
+                    rest -= len(window[ntok])
+                pos += max(1, ntok)
+        except (ValueError, ArgumentError) as e:
+            return False, f'CREBULK: error in aircraft {len(args) // 7 + 1}: {e}'
+        if not args or len(args) % 7:
+            return False, 'CREBULK: incomplete aircraft data, expected ' + \
+                'acid,type,lat,lon,hdg,alt,spd for each aircraft'
+
+        acid = args[0::7]
+        duplicates = set(acid).intersection(self.ididx)
+        if len(set(acid)) < len(acid) or duplicates:
+            return False, 'CREBULK: aircraft ' + \
+                (', '.join(duplicates) or 'callsigns') + ' not unique'
+        return self.cre(acid, args[1::7], *(np.array(args[i::7], dtype=float)
+                                            for i in range(2, 7)))
+
     def creconfs(self, acid, actype, targetidx, dpsi, dcpa, tlosh, dH=None, tlosv=None, spd=None):
         ''' Create an aircraft in conflict with target aircraft.
 
@@ -382,12 +440,25 @@ class Traffic(Entity):
         # (which will use list in reverse order to avoid index confusion)
         if isinstance(idx, Collection):
             idx = np.sort(idx)
+            if len(idx) == 0:
+                return True
+            first = idx[0]
+            delids = [self.id[i] for i in idx]
+        else:
+            first = idx
+            delids = [self.id[idx]]
 
         # Call the actual delete function
         super().delete(idx)
 
         # Update number of aircraft
         self.ntraf = len(self.lat)
+
+        # Remove deleted callsigns from the index map, and renumber the
+        # aircraft after the first deleted one
+        for acid in delids:
+            self.ididx.pop(acid, None)
+        self.ididx.update(zip(self.id[first:], range(first, self.ntraf)))
         return True
 
     def update(self):
@@ -399,40 +470,51 @@ class Traffic(Entity):
         self.p, self.rho, self.Temp = vatmos(self.alt)
 
         #---------- ADSB Update -------------------------------
-        self.adsb.update()
+        with profiler.section('adsb'):
+            self.adsb.update()
 
         #---------- Fly the Aircraft --------------------------
-        self.ap.update()  # Autopilot logic
-        self.update_asas()  # Airborne Separation Assurance
-        self.aporasas.update()   # Decide to use autopilot or ASAS for commands
+        with profiler.section('ap'):
+            self.ap.update()  # Autopilot logic
+        with profiler.section('asas'):
+            self.update_asas()  # Airborne Separation Assurance
+        with profiler.section('aporasas'):
+            self.aporasas.update()   # Decide to use autopilot or ASAS for commands
 
         #---------- Performance Update ------------------------
-        self.perf.update()
+        with profiler.section('perf'):
+            self.perf.update()
 
-        #---------- Limit commanded speeds based on performance ------------------------------
-        self.aporasas.tas, self.aporasas.vs, self.aporasas.alt = \
-            self.perf.limits(self.aporasas.tas, self.aporasas.vs,
-                             self.aporasas.alt, self.ax)
+            #---------- Limit commanded speeds based on performance ------------------------------
+            self.aporasas.tas, self.aporasas.vs, self.aporasas.alt = \
+                self.perf.limits(self.aporasas.tas, self.aporasas.vs,
+                                 self.aporasas.alt, self.ax)
 
         #---------- Kinematics --------------------------------
-        self.update_airspeed()
-        self.update_groundspeed()
-        self.update_pos()
+        with profiler.section('kinematics'):
+            self.update_airspeed()
+            self.update_groundspeed()
+            self.update_pos()
 
         #---------- Simulate Turbulence -----------------------
-        self.turbulence.update()
+        with profiler.section('turbulence'):
+            self.turbulence.update()
 
         # Check whether new traffic state triggers conditional commands
-        self.cond.update()
+        with profiler.section('cond'):
+            self.cond.update()
 
         #---------- Aftermath ---------------------------------
-        self.trails.update()
+        with profiler.section('trails'):
+            self.trails.update()
 
     @timed_function(name='asas', dt=bs.settings.asas_dt, manual=True)
     def update_asas(self):
         # Conflict detection and resolution
-        self.cd.update(self, self)
-        self.cr.update(self.cd, self, self)
+        with profiler.section('cd'):
+            self.cd.update(self, self)
+        with profiler.section('cr'):
+            self.cr.update(self.cd, self, self)
 
     def update_airspeed(self):
         # Compute horizontal acceleration
@@ -510,18 +592,22 @@ class Traffic(Entity):
         """Find index of aircraft id"""
         if not isinstance(acid, str):
             # id2idx is called for multiple id's
-            # Fast way of finding indices of all ACID's in a given list
-            tmp = dict((v, i) for i, v in enumerate(self.id))
-            return [tmp.get(acidi, -1) for acidi in acid]
+            return [self.id2idx(acidi) for acidi in acid] if self.curmember \
+                else [self.ididx.get(acidi, -1) for acidi in acid]
         else:
              # Catch last created id (* or # symbol)
             if acid in ('#', '*'):
                 return self.ntraf - 1
 
-            try:
-                return self.id.index(acid.upper())
-            except:
-                return -1
+            acid = acid.upper()
+            if self.curmember:
+                # In an ensemble member, callsigns refer to its own aircraft first
+                return self.ididx.get(self.memberid(acid), self.ididx.get(acid, -1))
+            return self.ididx.get(acid, -1)
+
+    def memberid(self, acid):
+        """Return the callsign of acid in the current ensemble member"""
+        return f'{acid}_{self.curmember}' if self.curmember else acid
 
     def setnoise(self, noise=None):
         """Noise (turbulence, ADBS-transmission noise, ADSB-truncated effect)"""
@@ -60,7 +60,7 @@ class ConsoleClient(Client):
     def stream(self, name, data, sender_id):
 
         if name == b'SIMINFO' and ConsoleUI.instance is not None:
-            speed, simdt, simt, simutc, ntraf, state, scenname = data
+            speed, simdt, simt, simutc, ntraf, state, scenname = data[:7]
             simt = tim2txt(simt)[:-3]
             self.setNodeInfo(sender_id, simt, scenname)
             if sender_id == bs.net.actnode():
@@ -756,13 +756,13 @@ class Screen:
 
 
             # Draw conflicts: line from a/c to closest point of approach
-            nconf = len(bs.traf.cd.confpairs_unique)
-            n2conf = len(bs.traf.cd.confpairs)
+            nconf = len(bs.traf.cd.confidx_unique[0])
+            n2conf = len(bs.traf.cd.confidx[0])
 
             if nconf>0:
 
                 for j in range(n2conf):
-                    i = bs.traf.id2idx(bs.traf.cd.confpairs[j][0])
+                    i = bs.traf.cd.confidx[0][j]
                     if i>=0 and i<bs.traf.ntraf and (i in trafsel):
                         latcpa, loncpa = geo.kwikpos(bs.traf.lat[i], bs.traf.lon[i], \
                                                     bs.traf.trk[i], bs.traf.cd.tcpamax[j] * bs.traf.gs[i] / nm)
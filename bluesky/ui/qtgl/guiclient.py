@@ -9,6 +9,7 @@ from bluesky.ui import palette
 from bluesky.ui.polytools import PolygonSet
 from bluesky.ui.qtgl.customevents import ACDataEvent, RouteDataEvent
 from bluesky.network.client import Client
+from bluesky.network.deltacodec import DeltaDecoder
 from bluesky.core import Signal
 from bluesky.tools.aero import ft
 
@@ -19,7 +20,10 @@ ACTNODE_TOPICS = [b'ACDATA', b'PLOT*', b'ROUTEDATA*']
 
 class GuiClient(Client):
     def __init__(self):
-        super().__init__(ACTNODE_TOPICS)
+        super().__init__(list(ACTNODE_TOPICS))
+        # Aircraft data is either sent to all clients, or filtered on the
+        # view of this client
+        self.acttopics.append(b'ACDATA' + self.client_id)
         self.nodedata = dict()
         self.ref_nodedata = nodeData()
         self.discovery_timer = None
@@ -49,7 +53,13 @@ class GuiClient(Client):
         ''' Guiclient stream handler. '''
         changed = ''
         actdata = self.get_nodedata(sender_id)
-        if name == b'ACDATA':
+        if name.startswith(b'ACDATA'):
+            name = b'ACDATA'
+            # Delta-encoded data is skipped until the next keyframe when frames are missed
+            if 'delta' in data:
+                data = actdata.acdecoder.decode(data)
+                if data is None:
+                    return
             actdata.setacdata(data)
             changed = name.decode('utf8')
         elif name.startswith(b'ROUTEDATA'):
@@ -137,6 +147,7 @@ class nodeData:
 
         self.naircraft = 0
         self.acdata = ACDataEvent()
+        self.acdecoder = DeltaDecoder()
         self.routedata = RouteDataEvent()
 
         # Per-scenario data
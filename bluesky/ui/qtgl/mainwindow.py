@@ -295,7 +295,7 @@ class MainWindow(QMainWindow):
 
     def on_simstream_received(self, streamname, data, sender_id):
         if streamname == b'SIMINFO':
-            speed, simdt, simt, simutc, ntraf, state, scenname = data
+            speed, simdt, simt, simutc, ntraf, state, scenname = data[:7]
             simt = tim2txt(simt)[:-3]
             self.setNodeInfo(sender_id, simt, scenname)
             if sender_id == bs.net.actnode():
@@ -0,0 +1,89 @@
+""" Scaling benchmark of conflict detection: StateBased (full ntraf x ntraf
+    matrices) versus StateBasedGrid (grid-binned candidate pairs), and
+    StateBasedParallel (grid-binned, divided over NWORKERS processes).
+
+    Random traffic is generated in a fixed 20x20 degree area, with aircraft
+    distributed over a number of flight levels. Run from the BlueSky root
+    folder:
+
+        python utils/Benchmarks/cd_scaling.py [n1 n2 ...]
+
+    The full-matrix method is only timed up to MAXFULL aircraft, because of
+    its memory use.
+"""
+import sys
+import os
+import time
+from types import SimpleNamespace
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bluesky.tools.aero import nm, ft
+from bluesky.traffic.asas.statebased import StateBased
+from bluesky.traffic.asas.gridbased import StateBasedGrid
+from bluesky.traffic.asas.parallel import StateBasedParallel
+
+MAXFULL = 5000
+REPEAT = 3
+NWORKERS = os.cpu_count()
+
+
+def make_traffic(n, seed=42):
+    ''' Random traffic state in a 20x20 deg area around 50N. '''
+    rng = np.random.default_rng(seed)
+    return SimpleNamespace(
+        ntraf=n,
+        id=['AC%05d' % i for i in range(n)],
+        lat=50.0 + rng.uniform(-10.0, 10.0, n),
+        lon=5.0 + rng.uniform(-10.0, 10.0, n),
+        alt=(rng.integers(0, 20, n) * 1000 + 20000) * ft,
+        trk=rng.uniform(0, 360, n),
+        gs=rng.uniform(200, 250, n),
+        vs=np.where(rng.random(n) < 0.1, rng.uniform(-10, 10, n), 0.0))
+
+
+def timeit(cd, traf):
+    ''' Return best-of-REPEAT wall time and the conflict pairs, as a tuple
+        of ownship and intruder index arrays. '''
+    n = traf.ntraf
+    args = (traf, traf, np.full(n, 5 * nm), np.full(n, 1000 * ft), np.full(n, 300.0))
+    best = np.inf
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        res = cd.detect(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, res[0]
+
+
+def samepairs(pairs, ref):
+    ''' True when both methods found the same conflict pairs. '''
+    return all(np.array_equal(p, r) for p, r in zip(pairs, ref))
+
+
+def main(sizes):
+    # Parallel detection with a pool that is kept over all sizes
+    cdpar = object.__new__(StateBasedParallel)
+    cdpar.nworkers, cdpar.minparallel = NWORKERS, 0
+    cdpar.pool = cdpar.shm = None
+
+    print(f'{"ntraf":>8} {"nconf":>8} {"StateBased [s]":>16} {"StateBasedGrid [s]":>20} '
+          f'{"speedup":>8} {"parallel [s]":>14} {"speedup":>8}')
+    for n in sizes:
+        traf = make_traffic(n)
+        tgrid, confpairs = timeit(object.__new__(StateBasedGrid), traf)
+        nconf = len(confpairs[0])
+        tpar, confpairs_par = timeit(cdpar, traf)
+        assert samepairs(confpairs_par, confpairs)
+        partxt = f'{tpar:14.4f} {tgrid / tpar:8.1f}'
+        if n <= MAXFULL:
+            tfull, confpairs_full = timeit(object.__new__(StateBased), traf)
+            assert samepairs(confpairs, confpairs_full)
+            print(f'{n:8d} {nconf:8d} {tfull:16.4f} {tgrid:20.4f} {tfull / tgrid:8.1f} {partxt}')
+        else:
+            print(f'{n:8d} {nconf:8d} {"-":>16} {tgrid:20.4f} {"-":>8} {partxt}')
+    cdpar.closepool()
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [1000, 2000, 5000, 10000, 20000])
@@ -0,0 +1,73 @@
+""" Micro-benchmark of the geo function backends: NumPy (geo), JIT-compiled
+    with Numba (jitgeo) and the C++ extension (cgeo). Backends that are not
+    available are skipped.
+
+    The pairwise functions are timed with n positions, the matrix functions
+    with sqrt(n) x sqrt(n) combinations. Run from the BlueSky root folder:
+
+        python utils/Benchmarks/geo_backends.py [n1 n2 ...]
+"""
+import sys
+import os
+import time
+import importlib
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+REPEAT = 5
+FUNCTIONS = ['rwgs84', 'qdrdist', 'latlondist', 'qdrpos', 'kwikqdrdist',
+             'qdrdist_matrix', 'kwikqdrdist_matrix']
+
+
+def load_backends():
+    ''' Return a dict with the available geo modules. '''
+    backends = dict()
+    for name in ('geo', 'jitgeo', 'cgeo'):
+        try:
+            backends[name] = importlib.import_module('bluesky.tools.' + name)
+        except ImportError:
+            pass
+    return backends
+
+
+def make_args(fname, n, seed=42):
+    ''' Random arguments for function fname with n points. '''
+    rng = np.random.default_rng(seed)
+    if fname.endswith('_matrix'):
+        m = int(np.sqrt(n))
+        return [np.asmatrix(rng.uniform(-80, 80, m)), np.asmatrix(rng.uniform(-180, 180, m)),
+                np.asmatrix(rng.uniform(-80, 80, m)), np.asmatrix(rng.uniform(-180, 180, m))]
+    if fname == 'rwgs84':
+        return [rng.uniform(-80, 80, n)]
+    if fname == 'qdrpos':
+        return [rng.uniform(-80, 80, n), rng.uniform(-180, 180, n),
+                rng.uniform(0, 360, n), rng.uniform(0, 500, n)]
+    return [rng.uniform(-80, 80, n), rng.uniform(-180, 180, n),
+            rng.uniform(-80, 80, n), rng.uniform(-180, 180, n)]
+
+
+def timeit(fun, args):
+    ''' Return best-of-REPEAT wall time of fun(*args). '''
+    fun(*args)  # Warm-up, includes JIT compilation
+    best = np.inf
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        fun(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(sizes):
+    backends = load_backends()
+    names = list(backends)
+    print(f'{"function":>20} {"n":>8}' + ''.join(f' {name + " [ms]":>12}' for name in names))
+    for fname in FUNCTIONS:
+        for n in sizes:
+            args = make_args(fname, n)
+            times = [timeit(getattr(mod, fname), args) * 1e3 for mod in backends.values()]
+            print(f'{fname:>20} {n:8d}' + ''.join(f' {t:12.3f}' for t in times))
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000, 100000])
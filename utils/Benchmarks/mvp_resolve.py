@@ -0,0 +1,47 @@
+""" Benchmark of MVP conflict resolution: the vectorised MVP implementation
+    versus the original implementation that resolves one conflict pair at a
+    time (kept as LoopMVP in the MVP tests).
+
+    High-density random traffic is generated in a small area, so that the
+    number of conflict pairs grows quadratically with the number of
+    aircraft. Run from the BlueSky root folder:
+
+        python utils/Benchmarks/mvp_resolve.py [n1 n2 ...]
+"""
+import sys
+import os
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bluesky.traffic.asas.mvp import MVP
+from bluesky.test.traffic.test_mvp import LoopMVP, make_conflicts, make_reso
+
+REPEAT = 3
+
+
+def timeit(cls, traf, conf):
+    ''' Return best-of-REPEAT wall time and the resolution outputs. '''
+    reso = make_reso(cls, traf.ntraf, seed=1, swresohoriz=False)
+    best = np.inf
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        res = reso.resolve(conf, traf, traf)
+        best = min(best, time.perf_counter() - t0)
+    return best, res
+
+
+def main(sizes):
+    print(f'{"ntraf":>8} {"nconf":>8} {"loop [s]":>10} {"vectorised [s]":>16} {"speedup":>8}')
+    for n in sizes:
+        traf, conf = make_conflicts(n, 42, spread=0.5)
+        tloop, ref = timeit(LoopMVP, traf, conf)
+        tvec, res = timeit(MVP, traf, conf)
+        for r, v in zip(ref, res):
+            assert np.array_equal(r, v)
+        print(f'{n:8d} {len(conf.confpairs):8d} {tloop:10.4f} {tvec:16.4f} {tloop / tvec:8.1f}')
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [250, 500, 1000, 2000])
@@ -0,0 +1,212 @@
+""" Headless benchmark of the complete simulation step, for tracking
+    performance regressions between releases.
+
+    Parametric scenarios are generated with a fixed seed, and each scenario is
+    run in a fresh detached (no gui, no network) simulation process. Per
+    scenario the steps per second of wall time, the wall time per subsystem
+    (from the step profiler) and the peak memory use are reported. Results
+    are written as JSON. Run from the BlueSky root folder:
+
+        python utils/Benchmarks/sim_benchmark.py [options]
+
+    Scenario parameters (each option can be given a list of values; all
+    combinations are run):
+    - ntraf:    number of aircraft
+    - density:  number of aircraft per 10000 square nautical miles
+    - confrate: fraction of aircraft created in conflict with another aircraft
+    - nwpts:    number of waypoints in the route of each aircraft
+    - plugins:  comma-separated list of plugins to load, or '-' for none
+
+    Example:
+
+        python utils/Benchmarks/sim_benchmark.py --ntraf 500 2000 --confrate 0 0.2 -o bench.json
+
+    The exit status is 1 when any of the cases failed.
+"""
+import sys
+import os
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, ROOT)
+
+# Centre of the generated traffic area
+LAT0, LON0 = 52.0, 4.0
+# Distance between waypoints [nm]
+WPTDIST = 30.0
+
+
+def make_traffic(ntraf, density, confrate, nwpts, seed):
+    ''' Create the traffic of a benchmark scenario in the running simulation. '''
+    import bluesky as bs
+    from bluesky.tools.aero import ft, kts
+
+    rng = np.random.default_rng(seed)
+    nconf = int(confrate * ntraf) // 2
+
+    # Random traffic in a square area that gives the requested density
+    nfree = ntraf - nconf
+    side = np.sqrt(ntraf / density * 1e4)
+    lat = LAT0 + rng.uniform(-0.5, 0.5, nfree) * side / 60.0
+    lon = LON0 + rng.uniform(-0.5, 0.5, nfree) * side / 60.0 / np.cos(np.radians(LAT0))
+    hdg = rng.uniform(0.0, 360.0, nfree)
+    alt = rng.integers(20, 40, nfree) * 1000.0 * ft
+    spd = rng.uniform(250.0, 300.0, nfree) * kts
+    acid = [f'BM{i:05d}' for i in range(nfree)]
+    bs.traf.cre(acid, 'A320', lat, lon, hdg, alt, spd)
+
+    # Routes along the initial heading of each aircraft
+    for i in range(nwpts):
+        dist = (i + 1) * WPTDIST / 60.0
+        wplat = lat + dist * np.cos(np.radians(hdg))
+        wplon = lon + dist * np.sin(np.radians(hdg)) / np.cos(np.radians(lat))
+        for acidx in range(nfree):
+            bs.stack.stack(f'ADDWPT {acid[acidx]} {wplat[acidx]:.6f} {wplon[acidx]:.6f}')
+    bs.stack.simstack.process()
+
+    # Intruders in conflict with the first nconf aircraft
+    dpsi = rng.uniform(20.0, 340.0, nconf)
+    dcpa = rng.uniform(0.0, 4.0, nconf)
+    tlos = rng.uniform(60.0, 240.0, nconf)
+    for i in range(nconf):
+        bs.traf.creconfs(f'BC{i:05d}', 'A320', i, dpsi[i], dcpa[i], tlos[i])
+
+
+def runcase(case, configfile=None):
+    ''' Run one benchmark scenario in this process, and return its results. '''
+    import resource
+    import random
+    import bluesky as bs
+    from bluesky.core import profiler
+
+    bs.init(mode='sim', detached=True, configfile=configfile)
+    random.seed(case['seed'])
+    np.random.seed(case['seed'])
+    for name in case['plugins']:
+        bs.stack.stack(f'PLUGINS LOAD {name}')
+    bs.stack.stack(f'CDMETHOD {case["cdmethod"]}')
+    bs.stack.simstack.process()
+
+    t0 = time.perf_counter()
+    make_traffic(case['ntraf'], case['density'], case['confrate'],
+                 case['nwpts'], case['seed'])
+    tsetup = time.perf_counter() - t0
+
+    bs.sim.op()
+    bs.sim.fastforward()
+
+    # Warm-up, and start profiling after it
+    while bs.sim.simt < case['warmup']:
+        bs.sim.step()
+    profiler.start()
+    nsteps = 0
+    t0 = time.perf_counter()
+    tend = bs.sim.simt + case['duration']
+    while bs.sim.simt < tend:
+        bs.sim.step()
+        nsteps += 1
+    twall = time.perf_counter() - t0
+    profiler.stop()
+
+    # ru_maxrss is in kilobytes on Linux, and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peakmem = maxrss / 1024.0 ** (2 if sys.platform == 'darwin' else 1)
+
+    return dict(case,
+                ntraf_end=bs.traf.ntraf,
+                nconf_tot=len(bs.traf.cd.confpairs_all),
+                nlos_tot=len(bs.traf.cd.lospairs_all),
+                setup_time=tsetup,
+                wall_time=twall,
+                nsteps=nsteps,
+                steps_per_sec=nsteps / twall,
+                realtime_factor=case['duration'] / twall,
+                peak_memory_mb=peakmem,
+                subsystems={path: dict(calls=stat.ncalls, total=stat.total,
+                                       mean=stat.total / stat.ncalls, max=stat.tmax)
+                            for path, stat in sorted(profiler.stats.items())})
+
+
+def gitversion():
+    ''' Return the git commit of the BlueSky tree, if available. '''
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless BlueSky simulation benchmark')
+    parser.add_argument('--ntraf', type=int, nargs='+', default=[100, 1000, 3000])
+    parser.add_argument('--density', type=float, nargs='+', default=[10.0])
+    parser.add_argument('--confrate', type=float, nargs='+', default=[0.1])
+    parser.add_argument('--nwpts', type=int, nargs='+', default=[0])
+    parser.add_argument('--plugins', nargs='+', default=['-'])
+    parser.add_argument('--cdmethod', default='STATEBASED')
+    parser.add_argument('--duration', type=float, default=60.0,
+                        help='Measured simulation time [s]')
+    parser.add_argument('--warmup', type=float, default=5.0,
+                        help='Simulation time [s] before measuring')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--config', default=None, help='BlueSky config file')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Output JSON file (default: stdout)')
+    parser.add_argument('--case', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Run a single case in this process, and pass the results to the parent
+    if args.case:
+        result = runcase(json.loads(args.case), args.config)
+        print('BENCHMARK_RESULT ' + json.dumps(result))
+        return
+
+    results = []
+    for ntraf, density, confrate, nwpts, plugins in itertools.product(
+            args.ntraf, args.density, args.confrate, args.nwpts, args.plugins):
+        case = dict(ntraf=ntraf, density=density, confrate=confrate, nwpts=nwpts,
+                    plugins=[] if plugins == '-' else plugins.split(','),
+                    cdmethod=args.cdmethod, duration=args.duration,
+                    warmup=args.warmup, seed=args.seed)
+        cmd = [sys.executable, __file__, '--case', json.dumps(case)]
+        if args.config:
+            cmd += ['--config', args.config]
+        proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+        lines = [l for l in proc.stdout.splitlines() if l.startswith('BENCHMARK_RESULT ')]
+        if proc.returncode or not lines:
+            print(f'Case {case} failed:\n{proc.stderr}', file=sys.stderr)
+            results.append(dict(case, error=proc.stderr.strip().splitlines()[-1:]))
+            continue
+        result = json.loads(lines[-1].split(' ', 1)[1])
+        print(f'ntraf={ntraf} density={density} confrate={confrate} nwpts={nwpts} '
+              f'plugins={plugins}: {result["steps_per_sec"]:.1f} steps/s, '
+              f'{result["peak_memory_mb"]:.0f} MB', file=sys.stderr)
+        results.append(result)
+
+    report = dict(version=gitversion(),
+                  date=datetime.now().isoformat(timespec='seconds'),
+                  platform=platform.platform(),
+                  python=platform.python_version(),
+                  numpy=np.__version__,
+                  cpu_count=os.cpu_count(),
+                  results=results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    # Let scripts and CI notice failed cases
+    if any('error' in result for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()